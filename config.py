@@ -44,13 +44,107 @@ DB_CONFIG_NO_DB["autocommit"] = True  # Specific for staging init
 # For staging with database
 DB_CONFIG_STAGING = {**DB_CONFIG_BASE, "database": "bonbanh_staging"}
 
+# ===========================
+# Staging Load Configuration
+# ===========================
+# "procedure": gọi sp_transform_row từng dòng (cách cũ)
+# "bulk": LOAD DATA LOCAL INFILE vào bảng landing + 1 câu INSERT ... SELECT (sp_transform_landing)
+#         Cần bật local_infile ở cả 2 phía: server (SET GLOBAL local_infile = ON / my.cnf) và client
+#         (load_to_staging mở connection với allow_local_infile=True). Thiếu 1 trong 2 → tự chuyển sang
+#         multi-row INSERT (chậm hơn LOAD DATA nhưng vẫn nhanh hơn "procedure")
+# "python": parse giá / km / ngày / lượt xem bằng pandas (staging_transform.py) rồi upsert theo lô
+STAGING_LOAD_MODE = "bulk"
+STAGING_BULK_INSERT_BATCH = 1000   # Số dòng mỗi multi-row INSERT (landing khi không có LOAD DATA LOCAL / upsert chế độ python)
+STAGING_CSV_CHUNK_ROWS = 20000     # Chế độ procedure / python: đọc CSV theo từng khối N dòng, commit 1 lần / khối
+STAGING_WRITER_QUEUE_CHUNKS = 2    # Số khối tối đa chờ mỗi luồng ghi DB (giới hạn bộ nhớ khi MySQL chậm hơn đọc file)
+STAGING_PARALLEL_WORKERS = 4       # Số partition theo hash(link_xe) = số luồng ghi / connection song song (1 = tuần tự)
+STAGING_PARTITION_RETRIES = 3      # Số lần thử lại 1 khối của partition khi lỗi kết nối / deadlock / lock wait
+STAGING_LATENCY_SAMPLE_ROWS = 2000 # Migration staging đổi → đo upsert N dòng đầu CSV hôm nay trước / sau (rollback)
+
+# ===========================
+# Data Warehouse Load Configuration
+# ===========================
+# True: chỉ load các dòng staging có updated_at > watermark lần trước (bonbanh_control.etl_watermark)
+# False: load lại toàn bộ staging (fact vẫn upsert theo link_hash, không nhân bản)
+DW_LOAD_INCREMENTAL = True
+# Grain của fact_danh_sach_xe (khoá UNIQUE link_hash + snapshot_date = ngày load):
+# "listing": 1 dòng / tin, bản cũ bị xoá khi tin được load lại
+# "daily": giữ 1 dòng / tin / ngày có thay đổi (is_current = 1 cho bản mới nhất, data mart chỉ đọc bản này)
+DW_FACT_GRAIN = "listing"
+# "procedure": sp_load_dw (INSERT ... SELECT trong MySQL)
+# "python": dw_python_loader.py - map business_key → surrogate_key nạp sẵn trong RAM, fact tra key không cần join
+DW_LOAD_MODE = "procedure"
+DW_DIM_CACHE_MB = 256      # Tổng RAM cho các map dimension; dimension không vừa → tra DB theo lô
+DW_PY_PAGE_ROWS = 20000    # Chế độ python: đọc staging theo trang N dòng (theo id); thành viên dimension của
+                           # 1 trang (~N × 6 × 580 byte) được trừ vào DW_DIM_CACHE_MB
+# Chế độ procedure: 6 dimension chạy song song (sp_load_dim_*, mỗi cái 1 connection), commit khi tất cả
+# thành công, sau đó sp_load_fact + watermark trong 1 transaction. False = sp_load_dw tuần tự
+DW_PARALLEL_DIMENSIONS = True
+# Fact partition theo ngày: partition ngày của các tháng đã cũ hơn N ngày được gộp thành 1 partition / tháng
+# (None = giữ partition ngày mãi mãi)
+DW_DAY_PARTITION_DAYS = 35
+
+# ===========================
+# Data Mart Configuration
+# ===========================
+# None: tổng hợp mọi tin (bản mới nhất). N: chỉ các tin được load trong N ngày gần nhất
+# (lọc theo snapshot_date → chỉ đọc các partition tương ứng của fact)
+DATAMART_WINDOW_DAYS = None
+
+# "incremental": chỉ gộp các dòng fact mới (theo loaded_at) vào data mart; "full": TRUNCATE + rebuild mỗi lần
+# (lần đầu / chưa có watermark / dùng DATAMART_WINDOW_DAYS → luôn rebuild toàn bộ)
+DATAMART_REFRESH_MODE = "incremental"
+
+# ===========================
+# Crawler Configuration
+# ===========================
+CRAWL_BASE_URL = os.environ.get("BONBANH_BASE_URL", "https://bonbanh.com")  # Đổi sang server fixture khi test local
+CRAWL_MAX_WORKERS = 4        # Số luồng tải trang chi tiết song song (1 = tuần tự như cũ)
+# Mọi request đều tới cùng 1 host → trần request/giây của host là trần của cả crawl:
+# để bằng số luồng (~1 request/giây/luồng như time.sleep(1) cũ) thì CRAWL_MAX_WORKERS mới có tác dụng
+CRAWL_RATE_PER_HOST = 4.0    # Token bucket: số request/giây tối đa cho mỗi host (<= 0 = không giới hạn)
+CRAWL_BURST_PER_HOST = 4     # Số request tối đa được gửi dồn cùng lúc cho mỗi host
+CRAWL_MAX_RETRIES = 4        # Số lần thử lại khi gặp 429/5xx/lỗi mạng
+CRAWL_BACKOFF_BASE = 1.0     # Backoff luỹ thừa có jitter: random(0, base * 2^lần thử) giây...
+CRAWL_BACKOFF_MAX = 60.0     # ...tối đa N giây (kể cả khi server gửi Retry-After lớn hơn)
+CRAWL_BREAKER_THRESHOLD = 5  # Số lỗi liên tiếp trên 1 host trước khi tạm dừng host đó (0 = tắt)
+CRAWL_BREAKER_COOLDOWN = 60  # Thời gian tạm dừng host (giây)
+CRAWL_CACHE_ENABLED = True   # Cache HTTP trên đĩa + conditional GET (ETag / Last-Modified)
+CRAWL_CACHE_DIR = "data/http_cache"
+CRAWL_CACHE_MAX_MB = 500     # Vượt ngưỡng → xoá bớt entry ít dùng nhất
+CRAWL_SEEN_INDEX_ENABLED = True        # Bỏ qua trang chi tiết của tin đã thấy và không đổi
+CRAWL_SEEN_INDEX_FILE = "data/seen_listings.sqlite"
+CRAWL_SEEN_REFRESH_DAYS = 7            # Chi tiết cũ hơn N ngày vẫn tải lại (0 = không bao giờ)
+CRAWL_MAX_PAGES = 1000                 # Giới hạn trên số trang danh sách /oto/page,N/
+CRAWL_STOP_AFTER_SEEN_PAGES = 3        # Dừng sau N trang liên tiếp toàn tin đã thấy (0 = không dừng)
+CRAWL_CHECKPOINT_FILE_PATTERN = "data/crawl_checkpoint_{today}.json"
+CRAWL_PARSE_PROCESSES = max(1, (os.cpu_count() or 2) - 1)  # Số tiến trình parse HTML (0 = parse ngay trong luồng fetch)
+CRAWL_PIPELINE_MAX_INFLIGHT = 64       # Số tin tối đa đang nằm trong pipeline (backpressure)
+CRAWL_CSV_FLUSH_ROWS = 200            # Writer CSV: flush khi buffer đủ N dòng...
+CRAWL_CSV_FLUSH_SECONDS = 5.0         # ...hoặc sau N giây kể từ lần flush trước
+CRAWL_ARCHIVE_ENABLED = False         # Lưu mọi trang HTML đã tải vào kho nén để parse lại (get_data.py reparse)
+CRAWL_ARCHIVE_DIR = "data/archive"
+CRAWL_PARSER = "lxml"                  # "lxml" (nhanh) | "bs4" (BeautifulSoup html.parser - bản gốc)
+
 # ===========================
 # File Paths
 # ===========================
+# Thứ tự cột của file CSV raw (crawler ghi, staging đọc) - định nghĩa duy nhất
+CSV_COLUMNS = [
+    "Loại xe + Năm SX", "Tên xe", "Giá xe_raw", "Nơi bán", "Liên hệ", "Link xe",
+    "Ngày đăng", "Lượt xem", "Số Km đã đi:", "Tình trạng:", "Xuất xứ:", "Kiểu dáng:",
+    "Động cơ:", "Màu ngoại thất:", "Màu nội thất:", "Số chỗ ngồi:", "Số cửa:", "Năm sản xuất:"
+]
+
 # Staging
 STAGING_CSV_FILE_PATTERN = "data/bonbanh_raw_{today}.csv"  # Use .format(today=datetime.now().strftime("%Y-%m-%d"))
 STAGING_SQL_SCHEMA_FILE = "staging/bonbanh_staging.sql"
 STAGING_SQL_SP_FILE = "staging/transform.sql"
+STAGING_SQL_BULK_FILE = "staging/bulk_transform.sql"
+STAGING_SQL_MIGRATE_FILE = "staging/migrate_xe_bonbanh.sql"
+
+# Control DB (watermark, schema_migrations)
+CONTROL_SQL_SCHEMA_FILE = "control/control_setup.sql"
 
 # Data Warehouse
 DW_SQL_SCHEMA_FILE = "dataWarehouse/db_dw_setup.sql"
@@ -64,4 +158,8 @@ DATAMART_SQL_SCHEMA_FILE = "dataMart/db_datamart_setup.sql"
 # ===========================
 STAGING_DB_NAME = "bonbanh_staging"
 DW_DB_NAME = "bonbanh_datawarehouse"
-DATAMART_DB_NAME = "bonbanh_datamart"
\ No newline at end of file
+DATAMART_DB_NAME = "bonbanh_datamart"
+CONTROL_DB_NAME = "bonbanh_control"
+
+# Chạy lại mọi file SQL dù checksum không đổi (db_migrations.py)
+DB_MIGRATIONS_FORCE = False
\ No newline at end of file
@@ -0,0 +1,14 @@
+CREATE DATABASE IF NOT EXISTS bonbanh_control
+CHARACTER SET utf8mb4
+COLLATE utf8mb4_unicode_ci;
+
+USE bonbanh_control;
+
+-- ===== WATERMARK: mốc đã load xong của từng bước incremental =====
+-- vd: name = 'dw_fact' → updated_at lớn nhất của bonbanh_staging.xe_bonbanh đã đưa vào DW
+CREATE TABLE IF NOT EXISTS etl_watermark (
+    name VARCHAR(100) PRIMARY KEY,
+    watermark_ts DATETIME NULL,
+    rows_loaded INT DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+) ENGINE=InnoDB;
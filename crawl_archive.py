@@ -0,0 +1,104 @@
+import os
+import glob
+import gzip
+import threading
+from datetime import datetime
+
+
+# ===========================
+# Kho lưu HTML thô đã tải (giống WARC):
+# - Mỗi ngày 1 file segment bonbanh_<ngày>.html.gz, mỗi trang là 1 gzip member độc lập
+#   (nên đọc lại được từng trang theo offset mà không phải giải nén cả file)
+# - File index bonbanh_<ngày>.idx (TSV): offset, length, kind (list|detail), url
+# ===========================
+class HtmlArchive:
+    def __init__(self, archive_dir, day):
+        os.makedirs(archive_dir, exist_ok=True)
+        self.segment_path = os.path.join(archive_dir, f"bonbanh_{day}.html.gz")
+        self.index_path = os.path.join(archive_dir, f"bonbanh_{day}.idx")
+        self._segment = open(self.segment_path, "ab")
+        self._index = open(self.index_path, "a", encoding="utf-8")
+        self._lock = threading.Lock()
+
+    def append(self, kind, url, html):
+        header = f"URL: {url}\r\nKind: {kind}\r\nDate: {datetime.now().isoformat(timespec='seconds')}\r\n\r\n"
+        record = gzip.compress((header + html).encode("utf-8"))
+        with self._lock:
+            offset = self._segment.tell()
+            self._segment.write(record)
+            self._segment.flush()
+            self._index.write(f"{offset}\t{len(record)}\t{kind}\t{url}\n")
+            self._index.flush()
+
+    def close(self):
+        with self._lock:
+            self._segment.close()
+            self._index.close()
+
+
+def read_index(index_path):
+    """Trả về list (offset, length, kind, url) theo thứ tự ghi."""
+    entries = []
+    with open(index_path, "r", encoding="utf-8") as f:
+        for line in f:
+            parts = line.rstrip("\n").split("\t", 3)
+            if len(parts) == 4:
+                entries.append((int(parts[0]), int(parts[1]), parts[2], parts[3]))
+    return entries
+
+
+def read_record(segment, offset, length):
+    """Đọc 1 trang từ segment đang mở (chế độ nhị phân), bỏ phần header."""
+    segment.seek(offset)
+    data = gzip.decompress(segment.read(length)).decode("utf-8")
+    return data.split("\r\n\r\n", 1)[1]
+
+
+# ===========================
+# Đọc lại kho để parse lại 1 ngày (không cần mạng):
+# - Trang danh sách: lấy từ segment của ngày đó, theo thứ tự ghi (bản ghi sau cùng của mỗi URL)
+# - Trang chi tiết: ưu tiên ngày đó, nếu không có (tin được dùng lại từ chỉ mục tin đã thấy)
+#   thì tìm trong các ngày trước gần nhất
+# ===========================
+class ArchiveReader:
+    def __init__(self, archive_dir, day):
+        self.archive_dir = archive_dir
+        self.day = day
+        self._segments = {}
+        self._details = {}  # url -> (segment_path, offset, length)
+        self._list_pages = []
+
+        index_paths = sorted(
+            p for p in glob.glob(os.path.join(archive_dir, "bonbanh_*.idx"))
+            if os.path.basename(p)[len("bonbanh_"):-len(".idx")] <= day
+        )
+        for index_path in index_paths:  # ngày cũ trước → ngày mới ghi đè
+            segment_path = index_path[:-len(".idx")] + ".html.gz"
+            is_day = index_path.endswith(f"bonbanh_{day}.idx")
+            list_pages = {}
+            for offset, length, kind, url in read_index(index_path):
+                if kind == "detail":
+                    self._details[url] = (segment_path, offset, length)
+                elif is_day:
+                    list_pages.pop(url, None)
+                    list_pages[url] = (segment_path, offset, length)
+            if is_day:
+                self._list_pages = list(list_pages.values())
+
+    def _read(self, location):
+        segment_path, offset, length = location
+        if segment_path not in self._segments:
+            self._segments[segment_path] = open(segment_path, "rb")
+        return read_record(self._segments[segment_path], offset, length)
+
+    def list_pages(self):
+        for location in self._list_pages:
+            yield self._read(location)
+
+    def detail(self, url):
+        location = self._details.get(url)
+        return self._read(location) if location else None
+
+    def close(self):
+        for segment in self._segments.values():
+            segment.close()
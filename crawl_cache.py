@@ -0,0 +1,103 @@
+import os
+import json
+import hashlib
+import threading
+
+
+# ===========================
+# Cache HTTP trên đĩa cho crawler:
+# - Key theo URL (sha1), mỗi URL 1 file JSON: body + ETag + Last-Modified
+# - Lần sau gửi If-None-Match / If-Modified-Since, server trả 304 → dùng lại body
+# - Vượt CRAWL_CACHE_MAX_MB → xoá các entry ít dùng nhất (theo mtime)
+# ===========================
+class ResponseCache:
+    def __init__(self, cache_dir, max_bytes):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.stats = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+        self._sizes = {
+            name: os.path.getsize(os.path.join(cache_dir, name))
+            for name in os.listdir(cache_dir) if name.endswith(".json")
+        }
+        self._total = sum(self._sizes.values())
+
+    def _name(self, url):
+        return hashlib.sha1(url.encode("utf-8")).hexdigest() + ".json"
+
+    def get(self, url):
+        path = os.path.join(self.cache_dir, self._name(url))
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            with self._lock:
+                self.stats["misses"] += 1
+            return None
+
+    @staticmethod
+    def conditional_headers(entry):
+        headers = {}
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def hit(self, url):
+        """Server trả 304: đánh dấu entry vừa được dùng (cho LRU)."""
+        path = os.path.join(self.cache_dir, self._name(url))
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        with self._lock:
+            self.stats["hits"] += 1
+
+    def store(self, url, resp):
+        """Lưu response 200 (miss đã được đếm trong get; 200 sau khi revalidate không tính là miss)."""
+        etag = resp.headers.get("ETag")
+        last_modified = resp.headers.get("Last-Modified")
+        if not etag and not last_modified:
+            return  # Không có validator → không revalidate được, bỏ qua
+
+        name = self._name(url)
+        path = os.path.join(self.cache_dir, name)
+        data = json.dumps({
+            "url": url,
+            "etag": etag,
+            "last_modified": last_modified,
+            "body": resp.text,
+        }, ensure_ascii=False).encode("utf-8")
+
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+        with self._lock:
+            self._total += len(data) - self._sizes.get(name, 0)
+            self._sizes[name] = len(data)
+            self.stats["stores"] += 1
+            if self._total > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        """Xoá entry cũ nhất tới khi tổng dung lượng còn ~90% giới hạn (gọi khi đang giữ lock)."""
+        target = int(self.max_bytes * 0.9)
+        entries = []
+        for name in self._sizes:
+            try:
+                entries.append((os.path.getmtime(os.path.join(self.cache_dir, name)), name))
+            except OSError:
+                entries.append((0, name))
+        for _, name in sorted(entries):
+            if self._total <= target:
+                break
+            try:
+                os.remove(os.path.join(self.cache_dir, name))
+            except OSError:
+                pass
+            self._total -= self._sizes.pop(name)
+            self.stats["evictions"] += 1
@@ -0,0 +1,219 @@
+import re
+import logging
+from bs4 import BeautifulSoup
+from lxml import etree
+import config
+
+# Dùng chung logger với get_data.py để lỗi parse vẫn ghi vào log crawl
+logger = logging.getLogger("GetDataLogger")
+
+BASE_URL = config.CRAWL_BASE_URL
+
+RE_NGAY_DANG = re.compile(r"Đăng\s+ngày\s+(\d{1,2}/\d{1,2}/\d{4})")
+RE_LUOT_XEM = re.compile(r"Xem\s+(\d+)\s+lượt")
+
+
+# ===========================
+# Backend lxml: parser C + XPath biên dịch sẵn 1 lần, mỗi selector chỉ chạy 1 lần / phần tử
+# Kết quả phải giống hệt backend BeautifulSoup (html.parser) bên dưới
+# ===========================
+def _has_class(name):
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {name} ')"
+
+_HTML_PARSER = etree.HTMLParser(encoding="utf-8")
+
+X_CAR_ITEMS = etree.XPath(f"//*[{_has_class('car-item')}]")
+X_FIRST_A = etree.XPath("(.//a)[1]")
+X_CB1 = etree.XPath(f"(.//*[{_has_class('cb1')}])[1]")
+X_FIRST_B = etree.XPath("(.//b)[1]")
+X_CB2_B = etree.XPath(f"(.//*[{_has_class('cb2')}]//b)[1]")
+X_CB3_B = etree.XPath(f"(.//*[{_has_class('cb3')}]//b)[1]")
+X_CB4_B = etree.XPath(f"(.//*[{_has_class('cb4')}]//b)[1]")
+X_CB7 = etree.XPath(f"(.//*[{_has_class('cb7')}])[1]")
+
+X_NOTES = etree.XPath(f"(//div[{_has_class('notes')}])[1]")
+X_DETAIL_ROWS = etree.XPath(f"//div[@id='mail_parent'][{_has_class('row')}]")
+X_FIRST_LABEL = etree.XPath("(.//label)[1]")
+X_FIRST_INP = etree.XPath(f"(.//span[{_has_class('inp')}])[1]")
+
+# BeautifulSoup.get_text() bỏ qua comment và nội dung các thẻ này
+_SKIP_TEXT_TAGS = {"script", "style", "template", "rt", "rp"}
+
+def _strings(el):
+    if el.text:
+        yield el.text
+    for child in el:
+        if isinstance(child.tag, str) and child.tag not in _SKIP_TEXT_TAGS:
+            yield from _strings(child)
+        if child.tail:
+            yield child.tail
+
+def _text(el, sep=""):
+    """Tương đương Tag.get_text(sep, strip=True) của BeautifulSoup."""
+    return sep.join(s for s in (t.strip() for t in _strings(el)) if s)
+
+def _first_text(xpath, el, sep=""):
+    found = xpath(el)
+    return _text(found[0], sep) if found else ""
+
+def _first_content(el):
+    """Tương đương tag.contents[0].strip() (chuỗi đầu tiên nằm trước mọi thẻ con)."""
+    if el.text is not None:
+        return el.text.strip()
+    if len(el) == 0:
+        return ""
+    first = el[0]
+    if isinstance(first.tag, str):
+        # contents[0] là Tag → BeautifulSoup ném lỗi, giữ nguyên hành vi (bỏ qua tin này)
+        raise TypeError("contents[0] của .cb1 là thẻ, không phải chuỗi")
+    return (first.text or "").strip()
+
+def _parse_html(html):
+    return etree.HTML(html.encode("utf-8"), _HTML_PARSER)
+
+def parse_list_page_lxml(html):
+    root = _parse_html(html) if html and html.strip() else None
+    if root is None:
+        return []
+    cars = []
+    for item in X_CAR_ITEMS(root):
+        try:
+            link = ""
+            a_tags = X_FIRST_A(item)
+            href = a_tags[0].get("href") if a_tags else None
+            if href:
+                href = href.strip()
+                if not href.startswith("/"):
+                    href = "/" + href
+                link = BASE_URL + href
+
+            cb1 = X_CB1(item)
+            loai_xe = nam_sx = ""
+            if cb1:
+                loai_xe = _first_content(cb1[0])
+                nam_sx = _first_text(X_FIRST_B, cb1[0])
+            info = f"{loai_xe} - {nam_sx}".strip(" -")
+
+            cars.append({
+                "Loại xe + Năm SX": info,
+                "Tên xe": _first_text(X_CB2_B, item),
+                "Giá xe_raw": _first_text(X_CB3_B, item),
+                "Nơi bán": _first_text(X_CB4_B, item),
+                "Liên hệ": _first_text(X_CB7, item, " "),
+                "Link xe": link,
+            })
+
+        except Exception as e:
+            logger.exception("Lỗi parse list item: %s", e)
+            continue
+
+    return cars
+
+def parse_detail_html_lxml(html):
+    root = _parse_html(html) if html and html.strip() else None
+
+    notes_text = ""
+    details = {}
+    if root is not None:
+        notes_text = _first_text(X_NOTES, root)
+        for row in X_DETAIL_ROWS(root):
+            label = X_FIRST_LABEL(row)
+            value = X_FIRST_INP(row)
+            if label and value:
+                details[_text(label[0])] = _text(value[0])
+
+    ngay_dang = ""
+    luot_xem = ""
+    if notes_text:
+        m1 = RE_NGAY_DANG.search(notes_text)
+        if m1:
+            ngay_dang = m1.group(1)
+        m2 = RE_LUOT_XEM.search(notes_text)
+        if m2:
+            luot_xem = m2.group(1)
+
+    data = {"Ngày đăng": ngay_dang, "Lượt xem": luot_xem}
+    data.update(details)
+    return data
+
+
+# ===========================
+# Backend BeautifulSoup (html.parser) - bản gốc, giữ lại làm chuẩn đối chiếu
+# ===========================
+def parse_list_page_bs4(html):
+    soup = BeautifulSoup(html, "html.parser")
+    cars = []
+    for item in soup.select(".car-item"):
+        try:
+            a_tag = item.select_one("a")
+            link = ""
+            if a_tag and a_tag.get("href"):
+                href = a_tag["href"].strip()
+                if not href.startswith("/"):
+                    href = "/" + href
+                link = BASE_URL + href
+
+            cb1 = item.select_one(".cb1")
+            loai_xe = cb1.contents[0].strip() if cb1 and cb1.contents else ""
+            nam_sx = cb1.select_one("b").get_text(strip=True) if cb1 and cb1.select_one("b") else ""
+            info = f"{loai_xe} - {nam_sx}".strip(" -")
+
+            ten_xe = item.select_one(".cb2 b").get_text(strip=True) if item.select_one(".cb2 b") else ""
+            gia = item.select_one(".cb3 b").get_text(strip=True) if item.select_one(".cb3 b") else ""
+            noi_ban = item.select_one(".cb4 b").get_text(strip=True) if item.select_one(".cb4 b") else ""
+            lien_he = item.select_one(".cb7").get_text(" ", strip=True) if item.select_one(".cb7") else ""
+
+            cars.append({
+                "Loại xe + Năm SX": info,
+                "Tên xe": ten_xe,
+                "Giá xe_raw": gia,
+                "Nơi bán": noi_ban,
+                "Liên hệ": lien_he,
+                "Link xe": link,
+            })
+
+        except Exception as e:
+            logger.exception("Lỗi parse list item: %s", e)
+            continue
+
+    return cars
+
+def parse_detail_html_bs4(html):
+    soup = BeautifulSoup(html, "html.parser")
+
+    notes = soup.find("div", class_="notes")
+    notes_text = notes.get_text(strip=True) if notes else ""
+
+    ngay_dang = ""
+    luot_xem = ""
+
+    if notes_text:
+        m1 = RE_NGAY_DANG.search(notes_text)
+        if m1:
+            ngay_dang = m1.group(1)
+        m2 = RE_LUOT_XEM.search(notes_text)
+        if m2:
+            luot_xem = m2.group(1)
+
+    details = {}
+    for row in soup.select("div#mail_parent.row"):
+        label = row.find("label")
+        value = row.find("span", class_="inp")
+        if label and value:
+            details[label.get_text(strip=True)] = value.get_text(strip=True)
+
+    data = {"Ngày đăng": ngay_dang, "Lượt xem": luot_xem}
+    data.update(details)
+
+    return data
+
+
+# ===========================
+# Chọn backend theo config.CRAWL_PARSER ("lxml" | "bs4")
+# ===========================
+if config.CRAWL_PARSER == "bs4":
+    parse_list_page = parse_list_page_bs4
+    parse_detail_html = parse_detail_html_bs4
+else:
+    parse_list_page = parse_list_page_lxml
+    parse_detail_html = parse_detail_html_lxml
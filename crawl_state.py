@@ -0,0 +1,158 @@
+import os
+import csv
+import glob
+import json
+import sqlite3
+import hashlib
+import threading
+from datetime import datetime, timedelta
+
+
+# Các cột lấy từ trang danh sách - dùng để tính fingerprint của 1 tin đăng
+LIST_FIELDS = ["Loại xe + Năm SX", "Tên xe", "Giá xe_raw", "Nơi bán", "Liên hệ", "Link xe"]
+
+
+def listing_fingerprint(car):
+    raw = "\x1f".join(car.get(k) or "" for k in LIST_FIELDS)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+# ===========================
+# Chỉ mục các tin đã thấy (SQLite, key = Link xe):
+# - Lưu fingerprint các cột trang danh sách + các trường chi tiết đã parse
+# - Tin có cùng link + cùng fingerprint → dùng lại chi tiết, không tải lại trang chi tiết
+# - Chi tiết cũ hơn refresh_days ngày vẫn tải lại (để cập nhật Lượt xem, ...)
+# ===========================
+class SeenIndex:
+    def __init__(self, db_path, refresh_days=7):
+        self.db_path = db_path
+        self.refresh_days = refresh_days
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS seen_listing (
+                link TEXT PRIMARY KEY,
+                fingerprint TEXT NOT NULL,
+                detail_json TEXT NOT NULL,
+                fetched_at TEXT NOT NULL
+            )
+        """)
+        self._conn.commit()
+
+    def count(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM seen_listing").fetchone()[0]
+
+    def lookup(self, car):
+        """Trả về dict chi tiết đã lưu nếu tin không đổi, ngược lại None."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT fingerprint, detail_json, fetched_at FROM seen_listing WHERE link = ?",
+                (car.get("Link xe", ""),)
+            ).fetchone()
+        if not row or row[0] != listing_fingerprint(car):
+            return None
+        if self.refresh_days and datetime.fromisoformat(row[2]) < datetime.now() - timedelta(days=self.refresh_days):
+            return None
+        return json.loads(row[1])
+
+    def remember(self, car, detail_data, fetched_at=None):
+        fetched_at = fetched_at or datetime.now().isoformat(timespec="seconds")
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO seen_listing (link, fingerprint, detail_json, fetched_at) VALUES (?, ?, ?, ?)",
+                (car.get("Link xe", ""), listing_fingerprint(car),
+                 json.dumps(detail_data, ensure_ascii=False), fetched_at)
+            )
+            self._conn.commit()
+
+    def seed_from_csv(self, pattern, exclude=None):
+        """Nạp chỉ mục từ các file data/bonbanh_raw_*.csv cũ (file mới hơn ghi đè file cũ hơn)."""
+        count = 0
+        for path in sorted(glob.glob(pattern)):
+            if exclude and os.path.abspath(path) == os.path.abspath(exclude):
+                continue
+            fetched_at = datetime.fromtimestamp(os.path.getmtime(path)).isoformat(timespec="seconds")
+            with open(path, "r", encoding="utf-8-sig", newline="") as f:
+                rows = [
+                    (row["Link xe"], listing_fingerprint(row),
+                     json.dumps({k: v for k, v in row.items() if k not in LIST_FIELDS}, ensure_ascii=False),
+                     fetched_at)
+                    for row in csv.DictReader(f) if row.get("Link xe")
+                ]
+            with self._lock:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO seen_listing (link, fingerprint, detail_json, fetched_at) VALUES (?, ?, ?, ?)",
+                    rows
+                )
+                self._conn.commit()
+            count += len(rows)
+        return count
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+# ===========================
+# Frontier duyệt các trang /oto/page,N/ có checkpoint để chạy tiếp khi bị ngắt:
+# - File checkpoint (JSON) lưu: trang cuối đã xong, trang đang làm + các tin chưa lấy chi tiết
+# - Ghi checkpoint sau mỗi batch (1 trang danh sách), ghi ra file tạm rồi os.replace
+# - Dừng khi gặp trang rỗng hoặc stop_after_seen_pages trang liên tiếp toàn tin đã thấy
+# ===========================
+class CrawlFrontier:
+    def __init__(self, path, max_pages, stop_after_seen_pages=0):
+        self.path = path
+        self.max_pages = max_pages
+        self.stop_after_seen_pages = stop_after_seen_pages
+        self.state = {"last_page_done": 0, "current_page": None, "pending": [], "seen_streak": 0}
+        self.resumed = False
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                self.state.update(json.load(f))
+            self.resumed = True
+
+    @property
+    def pending(self):
+        return self.state["pending"]
+
+    @property
+    def current_page(self):
+        return self.state["current_page"]
+
+    def _save(self):
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.state, f, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+
+    def pages(self):
+        page = self.state["last_page_done"] + 1
+        while page <= self.max_pages and not self.should_stop():
+            yield page
+            page += 1
+
+    def should_stop(self):
+        return bool(self.stop_after_seen_pages) and self.state["seen_streak"] >= self.stop_after_seen_pages
+
+    def start_batch(self, page, cars):
+        """Lưu danh sách tin của trang trước khi tải chi tiết."""
+        self.state["current_page"] = page
+        self.state["pending"] = cars
+        self._save()
+
+    def finish_batch(self, page, all_seen):
+        """Trang đã ghi xong CSV: cập nhật trang cuối + chuỗi trang toàn tin đã thấy."""
+        self.state["last_page_done"] = page
+        self.state["current_page"] = None
+        self.state["pending"] = []
+        self.state["seen_streak"] = self.state["seen_streak"] + 1 if all_seen else 0
+        self._save()
+
+    def complete(self):
+        """Crawl xong: xoá checkpoint để lần chạy sau bắt đầu lại từ trang 1."""
+        if os.path.exists(self.path):
+            os.remove(self.path)
@@ -0,0 +1,174 @@
+import time
+import random
+import logging
+import threading
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+from urllib.parse import urlparse
+import requests
+
+# Dùng chung logger với get_data.py
+logger = logging.getLogger("GetDataLogger")
+
+
+# ===========================
+# Giới hạn tốc độ theo host (token bucket) - thay cho time.sleep(1) cố định
+# ===========================
+class HostRateLimiter:
+    """Mỗi host có một bucket: nạp `rate` token/giây, chứa tối đa `burst` token.
+    Mỗi request lấy 1 token, hết token thì chờ tới khi được nạp lại."""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._buckets = {}  # host -> (số token còn lại, thời điểm nạp gần nhất)
+        self._lock = threading.Lock()
+
+    def acquire(self, url):
+        if self.rate <= 0:
+            return
+        host = urlparse(url).netloc
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                tokens, last = self._buckets.get(host, (self.burst, now))
+                tokens = min(self.burst, tokens + (now - last) * self.rate)
+                if tokens >= 1:
+                    self._buckets[host] = (tokens - 1, now)
+                    return
+                self._buckets[host] = (tokens, now)
+                wait = (1 - tokens) / self.rate
+            time.sleep(wait)
+
+
+# ===========================
+# Lớp request thích ứng cho crawler:
+# - Retry có giới hạn, backoff luỹ thừa + jitter, tôn trọng header Retry-After
+# - Giới hạn số request đồng thời mỗi host theo AIMD: thành công → tăng dần,
+#   429/503/lỗi mạng → giảm một nửa (tự hạ tốc độ khi site bắt đầu từ chối)
+# - Circuit breaker: quá breaker_threshold lỗi liên tiếp → tạm dừng host breaker_cooldown giây
+# ===========================
+class _HostState:
+    def __init__(self, limit):
+        self.limit = float(limit)
+        self.inflight = 0
+        self.failures = 0
+        self.open_until = 0.0
+
+
+class AdaptiveRequester:
+    RETRY_STATUS = {429, 500, 502, 503, 504}
+    THROTTLE_STATUS = {429, 503}
+
+    def __init__(self, session, rate_limiter, max_retries, backoff_base, backoff_max,
+                 min_concurrency, max_concurrency, breaker_threshold, breaker_cooldown):
+        self.session = session
+        self.rate_limiter = rate_limiter
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.min_concurrency = max(1, min_concurrency)
+        self.max_concurrency = max(self.min_concurrency, max_concurrency)
+        self.breaker_threshold = breaker_threshold
+        self.breaker_cooldown = breaker_cooldown
+        self.stats = {"requests": 0, "ok": 0, "retries": 0, "throttled": 0, "failed": 0, "breaker_opens": 0}
+        self._started = time.monotonic()
+        self._hosts = {}
+        self._cond = threading.Condition()
+
+    def _acquire(self, host):
+        with self._cond:
+            state = self._hosts.setdefault(host, _HostState(self.max_concurrency))
+            while True:
+                now = time.monotonic()
+                if state.open_until > now:
+                    self._cond.wait(state.open_until - now)
+                elif state.inflight < int(state.limit):
+                    state.inflight += 1
+                    return state
+                else:
+                    self._cond.wait()
+
+    def _release(self, host, state, outcome):
+        """outcome: "ok" | "throttled" (429/503) | "error" (5xx khác, lỗi mạng)."""
+        with self._cond:
+            state.inflight -= 1
+            self.stats["requests"] += 1
+            if outcome == "ok":
+                state.failures = 0
+                state.limit = min(self.max_concurrency, state.limit + 1.0 / state.limit)
+            else:
+                if outcome == "throttled":
+                    self.stats["throttled"] += 1
+                state.limit = max(self.min_concurrency, state.limit / 2)
+                state.failures += 1
+                if self.breaker_threshold and state.failures >= self.breaker_threshold:
+                    state.open_until = time.monotonic() + self.breaker_cooldown
+                    state.failures = 0
+                    self.stats["breaker_opens"] += 1
+                    logger.warning("Circuit breaker: tạm dừng host %s trong %ds", host, self.breaker_cooldown)
+            self._cond.notify_all()
+
+    @staticmethod
+    def _retry_after(resp):
+        """Số giây chờ theo header Retry-After (dạng số giây hoặc HTTP-date), None nếu không có."""
+        value = resp.headers.get("Retry-After") if resp is not None else None
+        if not value:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        try:
+            return max(0.0, (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+        except (TypeError, ValueError):
+            return None
+
+    def get(self, url, headers=None, timeout=15):
+        host = urlparse(url).netloc
+        for attempt in range(self.max_retries + 1):
+            state = self._acquire(host)
+            resp = error = None
+            outcome = "error"
+            # Slot đồng thời luôn được trả lại (kể cả lỗi không retry được / exception lạ),
+            # nếu không inflight không bao giờ giảm và mọi luồng kẹt trong _acquire
+            try:
+                self.rate_limiter.acquire(url)
+                resp = self.session.get(url, headers=headers, timeout=timeout)
+                if resp.status_code not in self.RETRY_STATUS:
+                    outcome = "ok"
+                elif resp.status_code in self.THROTTLE_STATUS:
+                    outcome = "throttled"
+            except requests.RequestException as e:
+                error = e
+            finally:
+                self._release(host, state, outcome)
+
+            if outcome == "ok":
+                with self._cond:
+                    self.stats["ok"] += 1
+                return resp
+
+            if attempt == self.max_retries:
+                break
+
+            delay = self._retry_after(resp)
+            if delay is None:
+                delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+            delay = min(delay, self.backoff_max)
+            with self._cond:
+                self.stats["retries"] += 1
+            logger.warning("Thử lại %s sau %.1fs (lần %d/%d, %s)", url, delay, attempt + 1, self.max_retries,
+                           error or f"HTTP {resp.status_code}")
+            time.sleep(delay)
+
+        with self._cond:
+            self.stats["failed"] += 1
+        if error is not None:
+            raise error
+        resp.raise_for_status()
+        return resp
+
+    def requests_per_second(self):
+        elapsed = time.monotonic() - self._started
+        return self.stats["ok"] / elapsed if elapsed > 0 else 0.0
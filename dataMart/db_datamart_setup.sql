@@ -14,7 +14,10 @@ CREATE TABLE IF NOT EXISTS agg_price_by_make (
     avg_price DECIMAL(18,2),
     min_price DECIMAL(18,2),
     max_price DECIMAL(18,2),
+    price_count INT NOT NULL DEFAULT 0,       -- Số tin có giá (mẫu số của avg_price, cộng dồn được)
+    price_sum DECIMAL(24,0) NOT NULL DEFAULT 0,
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    UNIQUE KEY ux_make (ten_xe, nam_san_xuat),
     INDEX (ten_xe),
     INDEX (nam_san_xuat)
 ) ENGINE=InnoDB;
@@ -25,7 +28,10 @@ CREATE TABLE IF NOT EXISTS agg_count_by_location (
     noi_ban VARCHAR(255),
     listings_count INT,
     avg_price DECIMAL(18,2),
+    price_count INT NOT NULL DEFAULT 0,
+    price_sum DECIMAL(24,0) NOT NULL DEFAULT 0,
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    UNIQUE KEY ux_location (noi_ban),
     INDEX (noi_ban)
 ) ENGINE=InnoDB;
 
@@ -36,7 +42,9 @@ CREATE TABLE IF NOT EXISTS agg_views_by_day (
     total_listings INT,
     total_views BIGINT,
     avg_views_per_listing DECIMAL(12,2),
+    ngay_key DATE AS (IFNULL(ngay, '1000-01-01')) STORED,   -- Gộp cả nhóm ngày NULL khi cập nhật incremental
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    UNIQUE KEY ux_day (ngay_key),
     INDEX (ngay)
 ) ENGINE=InnoDB;
 
@@ -48,7 +56,10 @@ CREATE TABLE IF NOT EXISTS agg_price_bucket (
     bucket_max BIGINT, -- NULL nếu không giới hạn trên
     listings_count INT,
     avg_price DECIMAL(18,2),
+    price_count INT NOT NULL DEFAULT 0,
+    price_sum DECIMAL(24,0) NOT NULL DEFAULT 0,
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    UNIQUE KEY ux_bucket (bucket_label),
     INDEX (bucket_label)
 ) ENGINE=InnoDB;
 
@@ -66,3 +77,42 @@ CREATE TABLE IF NOT EXISTS top_listings_by_views (
     INDEX (luot_xem),
     INDEX (ngay_dang)
 ) ENGINE=InnoDB;
+
+-- 6) Trạng thái refresh incremental: phần đóng góp hiện tại của mỗi tin vào các bảng tổng hợp
+--    (tin đổi → trừ phần cũ, cộng phần mới; min/max và top N tính lại từ bảng này)
+CREATE TABLE IF NOT EXISTS mart_listing_state (
+    link_hash BINARY(16) PRIMARY KEY,
+    fact_id BIGINT,
+    snapshot_date DATE,
+    ten_xe VARCHAR(512),
+    nam_san_xuat INT,
+    noi_ban VARCHAR(255),
+    ngay DATE,
+    bucket_label VARCHAR(64),
+    gia_xe BIGINT,
+    luot_xem INT,
+    loaded_at TIMESTAMP NULL,
+    INDEX idx_state_make (ten_xe, nam_san_xuat),
+    INDEX idx_state_views (luot_xem)
+) ENGINE=InnoDB;
+
+-- ===== MIGRATION: data mart cũ (chỉ rebuild toàn bộ) → thêm cột cộng dồn + khoá nhóm cho refresh incremental
+--       (chạy lại: lỗi cột / index đã tồn tại được bỏ qua; giá trị được điền ở lần rebuild toàn bộ đầu tiên) =====
+ALTER TABLE agg_price_by_make
+    ADD COLUMN price_count INT NOT NULL DEFAULT 0 AFTER max_price,
+    ADD COLUMN price_sum DECIMAL(24,0) NOT NULL DEFAULT 0 AFTER price_count;
+ALTER TABLE agg_price_by_make ADD UNIQUE KEY ux_make (ten_xe, nam_san_xuat);
+
+ALTER TABLE agg_count_by_location
+    ADD COLUMN price_count INT NOT NULL DEFAULT 0 AFTER avg_price,
+    ADD COLUMN price_sum DECIMAL(24,0) NOT NULL DEFAULT 0 AFTER price_count;
+ALTER TABLE agg_count_by_location ADD UNIQUE KEY ux_location (noi_ban);
+
+ALTER TABLE agg_views_by_day
+    ADD COLUMN ngay_key DATE AS (IFNULL(ngay, '1000-01-01')) STORED AFTER avg_views_per_listing;
+ALTER TABLE agg_views_by_day ADD UNIQUE KEY ux_day (ngay_key);
+
+ALTER TABLE agg_price_bucket
+    ADD COLUMN price_count INT NOT NULL DEFAULT 0 AFTER avg_price,
+    ADD COLUMN price_sum DECIMAL(24,0) NOT NULL DEFAULT 0 AFTER price_count;
+ALTER TABLE agg_price_bucket ADD UNIQUE KEY ux_bucket (bucket_label);
@@ -5,58 +5,67 @@ COLLATE utf8mb4_unicode_ci;
 USE bonbanh_datawarehouse;
 
 -- ===== DIMENSIONS =====
+-- SCD Type 2: mỗi business_key có nhiều phiên bản, is_current = 1 cho bản đang dùng.
+-- attr_hash = UNHEX(MD5(các thuộc tính đã chuẩn hoá nối bằng CHAR(31))) → thuộc tính không đổi thì không ghi gì
+-- Chỉ thuộc tính của mẫu xe; động cơ / màu ngoại thất / màu nội thất là của từng tin → nằm ở fact
 CREATE TABLE IF NOT EXISTS dim_mau_xe (
     surrogate_key BIGINT AUTO_INCREMENT PRIMARY KEY,
-    business_key VARCHAR(64) UNIQUE,
+    business_key BINARY(16) NOT NULL,   -- UNHEX(MD5(ten_xe + '_' + nam_san_xuat))
     ten_xe VARCHAR(512),
     loai_xe_nam_sx VARCHAR(255),
     nam_san_xuat INT,
-    dong_co VARCHAR(128),
-    mau_ngoai_that VARCHAR(128),
-    mau_noi_that VARCHAR(128),
     so_cho_ngoi INT,
     so_cua INT,
-    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+    attr_hash BINARY(16),
+    valid_from DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    valid_to DATETIME NOT NULL DEFAULT '9999-12-31 00:00:00',
+    is_current TINYINT(1) NOT NULL DEFAULT 1,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    INDEX idx_mau_xe_current (business_key, is_current)
 ) ENGINE=InnoDB;
 
 CREATE TABLE IF NOT EXISTS dim_vi_tri (
     surrogate_key BIGINT AUTO_INCREMENT PRIMARY KEY,
-    business_key VARCHAR(64) UNIQUE,
+    business_key BINARY(16) UNIQUE,   -- UNHEX(MD5(...)) của thuộc tính nguồn
     noi_ban VARCHAR(255),
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
 ) ENGINE=InnoDB;
 
 CREATE TABLE IF NOT EXISTS dim_nguoi_ban (
     surrogate_key BIGINT AUTO_INCREMENT PRIMARY KEY,
-    business_key VARCHAR(64) UNIQUE,
+    business_key BINARY(16) UNIQUE,   -- UNHEX(MD5(...)) của thuộc tính nguồn
     lien_he VARCHAR(255),
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
 ) ENGINE=InnoDB;
 
 CREATE TABLE IF NOT EXISTS dim_xuat_xu (
     surrogate_key BIGINT AUTO_INCREMENT PRIMARY KEY,
-    business_key VARCHAR(64) UNIQUE,
+    business_key BINARY(16) UNIQUE,   -- UNHEX(MD5(...)) của thuộc tính nguồn
     xuat_xu VARCHAR(255),
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
 ) ENGINE=InnoDB;
 
 CREATE TABLE IF NOT EXISTS dim_tinh_trang (
     surrogate_key BIGINT AUTO_INCREMENT PRIMARY KEY,
-    business_key VARCHAR(64) UNIQUE,
+    business_key BINARY(16) UNIQUE,   -- UNHEX(MD5(...)) của thuộc tính nguồn
     tinh_trang VARCHAR(255),
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
 ) ENGINE=InnoDB;
 
 CREATE TABLE IF NOT EXISTS dim_kieu_dang (
     surrogate_key BIGINT AUTO_INCREMENT PRIMARY KEY,
-    business_key VARCHAR(64) UNIQUE,
+    business_key BINARY(16) UNIQUE,   -- UNHEX(MD5(...)) của thuộc tính nguồn
     kieu_dang VARCHAR(255),
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
 ) ENGINE=InnoDB;
 
 -- ===== FACT TABLE =====
+-- Partition theo ngày load (snapshot_date, nằm trong mọi khoá UNIQUE): dw_partitions.py tách pmax thành
+-- partition từng ngày khi load → load lại 1 ngày = TRUNCATE PARTITION, data mart lọc theo ngày chỉ đọc
+-- các partition cần. InnoDB không cho khoá ngoại trên bảng partition → tính toàn vẹn do ETL đảm bảo
+-- (surrogate_key luôn lấy từ dimension), giữ index trên các cột *_sk / ngay_dang cho join của data mart.
 CREATE TABLE IF NOT EXISTS fact_danh_sach_xe (
-    id BIGINT AUTO_INCREMENT PRIMARY KEY,
+    id BIGINT AUTO_INCREMENT,
     mau_xe_sk BIGINT,
     vi_tri_sk BIGINT,
     nguoi_ban_sk BIGINT,
@@ -67,9 +76,299 @@ CREATE TABLE IF NOT EXISTS fact_danh_sach_xe (
     so_km BIGINT,
     ngay_dang DATE,
     luot_xem INT,
+    dong_co VARCHAR(128),
+    mau_ngoai_that VARCHAR(128),
+    mau_noi_that VARCHAR(128),
     link_xe VARCHAR(1024),
+    link_hash BINARY(16),   -- = bonbanh_staging.xe_bonbanh.link_hash, khoá nối giữa các tầng
+    snapshot_date DATE NOT NULL,             -- Ngày load (grain: 1 dòng / tin / ngày)
+    is_current TINYINT(1) NOT NULL DEFAULT 1, -- 1 = bản mới nhất của tin (data mart chỉ đọc các dòng này)
     loaded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    FOREIGN KEY (mau_xe_sk) REFERENCES dim_mau_xe(surrogate_key),
-    FOREIGN KEY (vi_tri_sk) REFERENCES dim_vi_tri(surrogate_key),
-    FOREIGN KEY (nguoi_ban_sk) REFERENCES dim_nguoi_ban(surrogate_key)
+    PRIMARY KEY (id, snapshot_date),
+    UNIQUE KEY ux_fact_listing_snapshot (link_hash, snapshot_date),   -- load lại cùng ngày = upsert, không nhân bản
+    INDEX idx_fact_current (is_current),
+    INDEX idx_fact_mau_xe_sk (mau_xe_sk),
+    INDEX idx_fact_vi_tri_sk (vi_tri_sk),
+    INDEX idx_fact_nguoi_ban_sk (nguoi_ban_sk),
+    INDEX idx_fact_ngay_dang (ngay_dang),
+    INDEX idx_fact_loaded_at (loaded_at)       -- Data mart incremental đọc fact theo loaded_at
+) ENGINE=InnoDB
+PARTITION BY RANGE COLUMNS (snapshot_date) (
+    PARTITION pmax VALUES LESS THAN (MAXVALUE)
+);
+
+-- Tập tin (link_hash) của 1 ngày đang load lại (load_to_dw.py --reload-day): ghi trước TRUNCATE PARTITION,
+-- xoá khi load lại xong → lần load lại lỗi giữa chừng chạy lại vẫn biết ngày đó có những tin nào
+CREATE TABLE IF NOT EXISTS fact_reload_links (
+    snapshot_date DATE NOT NULL,
+    link_hash BINARY(16) NOT NULL,
+    PRIMARY KEY (snapshot_date, link_hash)
 ) ENGINE=InnoDB;
+
+-- ===== MIGRATION: fact cũ chưa có link_hash → thêm cột + index, tính lại từ link_xe;
+--       chưa có khoá UNIQUE(link_hash) → bỏ bản trùng rồi thêm khoá;
+--       chưa có snapshot_date → thêm cột + is_current, khoá UNIQUE(link_hash, snapshot_date) =====
+DROP PROCEDURE IF EXISTS sp_migrate_fact_link_hash;
+DELIMITER $$
+
+CREATE PROCEDURE sp_migrate_fact_link_hash()
+BEGIN
+    IF NOT EXISTS (
+        SELECT 1 FROM information_schema.COLUMNS
+        WHERE TABLE_SCHEMA = 'bonbanh_datawarehouse'
+          AND TABLE_NAME = 'fact_danh_sach_xe'
+          AND COLUMN_NAME = 'link_hash'
+    ) THEN
+        ALTER TABLE fact_danh_sach_xe
+            ADD COLUMN link_hash BINARY(16) AFTER link_xe,
+            ADD INDEX idx_fact_link_hash (link_hash);
+        UPDATE fact_danh_sach_xe SET link_hash = UNHEX(MD5(LOWER(TRIM(link_xe))));
+    END IF;
+
+    -- Fact cũ (mỗi lần load nối thêm toàn bộ staging) → giữ dòng mới nhất của mỗi tin, khoá UNIQUE
+    IF NOT EXISTS (
+        SELECT 1 FROM information_schema.STATISTICS
+        WHERE TABLE_SCHEMA = 'bonbanh_datawarehouse'
+          AND TABLE_NAME = 'fact_danh_sach_xe'
+          AND INDEX_NAME IN ('ux_fact_link_hash', 'ux_fact_listing_snapshot')
+    ) THEN
+        DELETE f FROM fact_danh_sach_xe f
+        JOIN fact_danh_sach_xe newer ON newer.link_hash = f.link_hash AND newer.id > f.id;
+
+        ALTER TABLE fact_danh_sach_xe
+            ADD UNIQUE KEY ux_fact_link_hash (link_hash),
+            DROP INDEX idx_fact_link_hash;
+    END IF;
+
+    -- Grain (tin, ngày): snapshot_date lấy theo ngày load cũ, mọi dòng hiện có đều là bản mới nhất
+    IF NOT EXISTS (
+        SELECT 1 FROM information_schema.COLUMNS
+        WHERE TABLE_SCHEMA = 'bonbanh_datawarehouse'
+          AND TABLE_NAME = 'fact_danh_sach_xe'
+          AND COLUMN_NAME = 'snapshot_date'
+    ) THEN
+        ALTER TABLE fact_danh_sach_xe
+            ADD COLUMN snapshot_date DATE NULL AFTER link_hash,
+            ADD COLUMN is_current TINYINT(1) NOT NULL DEFAULT 1 AFTER snapshot_date;
+        UPDATE fact_danh_sach_xe SET snapshot_date = DATE(IFNULL(loaded_at, CURRENT_TIMESTAMP));
+        ALTER TABLE fact_danh_sach_xe MODIFY COLUMN snapshot_date DATE NOT NULL;
+    END IF;
+
+    IF NOT EXISTS (
+        SELECT 1 FROM information_schema.STATISTICS
+        WHERE TABLE_SCHEMA = 'bonbanh_datawarehouse'
+          AND TABLE_NAME = 'fact_danh_sach_xe'
+          AND INDEX_NAME = 'ux_fact_listing_snapshot'
+    ) THEN
+        DELETE f FROM fact_danh_sach_xe f
+        JOIN fact_danh_sach_xe newer
+          ON newer.link_hash = f.link_hash AND newer.snapshot_date = f.snapshot_date AND newer.id > f.id;
+
+        ALTER TABLE fact_danh_sach_xe
+            ADD UNIQUE KEY ux_fact_listing_snapshot (link_hash, snapshot_date),
+            ADD INDEX idx_fact_current (is_current),
+            DROP INDEX ux_fact_link_hash;
+    END IF;
+END$$
+DELIMITER ;
+
+CALL sp_migrate_fact_link_hash();
+DROP PROCEDURE IF EXISTS sp_migrate_fact_link_hash;
+
+-- ===== MIGRATION: fact chưa partition → bỏ khoá ngoại, index cho cột join, PK (id, snapshot_date),
+--       PARTITION BY RANGE COLUMNS (snapshot_date) với 1 partition pmax (lịch sử nằm hết trong pmax,
+--       dw_partitions.py tách dần theo ngày) =====
+DROP PROCEDURE IF EXISTS sp_migrate_fact_index;
+DROP PROCEDURE IF EXISTS sp_migrate_fact_partitions;
+DELIMITER $$
+
+CREATE PROCEDURE sp_migrate_fact_index(IN p_column VARCHAR(64))
+BEGIN
+    -- Đã có index bắt đầu bằng cột này (vd: index tự tạo theo khoá ngoại cũ) → giữ nguyên
+    IF NOT EXISTS (
+        SELECT 1 FROM information_schema.STATISTICS
+        WHERE TABLE_SCHEMA = 'bonbanh_datawarehouse'
+          AND TABLE_NAME = 'fact_danh_sach_xe'
+          AND COLUMN_NAME = p_column
+          AND SEQ_IN_INDEX = 1
+    ) THEN
+        SET @sql = CONCAT('ALTER TABLE fact_danh_sach_xe ADD INDEX idx_fact_', p_column, ' (', p_column, ')');
+        PREPARE stmt FROM @sql; EXECUTE stmt; DEALLOCATE PREPARE stmt;
+    END IF;
+END$$
+
+CREATE PROCEDURE sp_migrate_fact_partitions()
+BEGIN
+    IF NOT EXISTS (
+        SELECT 1 FROM information_schema.PARTITIONS
+        WHERE TABLE_SCHEMA = 'bonbanh_datawarehouse'
+          AND TABLE_NAME = 'fact_danh_sach_xe'
+          AND PARTITION_NAME IS NOT NULL
+    ) THEN
+        SET @drops = NULL;
+        SELECT GROUP_CONCAT(CONCAT('DROP FOREIGN KEY `', CONSTRAINT_NAME, '`') SEPARATOR ', ') INTO @drops
+        FROM information_schema.TABLE_CONSTRAINTS
+        WHERE TABLE_SCHEMA = 'bonbanh_datawarehouse'
+          AND TABLE_NAME = 'fact_danh_sach_xe'
+          AND CONSTRAINT_TYPE = 'FOREIGN KEY';
+        IF @drops IS NOT NULL THEN
+            SET @sql = CONCAT('ALTER TABLE fact_danh_sach_xe ', @drops);
+            PREPARE stmt FROM @sql; EXECUTE stmt; DEALLOCATE PREPARE stmt;
+        END IF;
+
+        CALL sp_migrate_fact_index('mau_xe_sk');
+        CALL sp_migrate_fact_index('vi_tri_sk');
+        CALL sp_migrate_fact_index('nguoi_ban_sk');
+        CALL sp_migrate_fact_index('ngay_dang');
+
+        ALTER TABLE fact_danh_sach_xe DROP PRIMARY KEY, ADD PRIMARY KEY (id, snapshot_date);
+        ALTER TABLE fact_danh_sach_xe
+            PARTITION BY RANGE COLUMNS (snapshot_date) (PARTITION pmax VALUES LESS THAN (MAXVALUE));
+    END IF;
+END$$
+DELIMITER ;
+
+CALL sp_migrate_fact_partitions();
+DROP PROCEDURE IF EXISTS sp_migrate_fact_partitions;
+DROP PROCEDURE IF EXISTS sp_migrate_fact_index;
+
+-- Index cho refresh incremental của data mart (đã có → lỗi 1061 được bỏ qua)
+ALTER TABLE fact_danh_sach_xe ADD INDEX idx_fact_loaded_at (loaded_at);
+
+-- ===== MIGRATION: business_key VARCHAR(64) (MD5 hex) → BINARY(16) (UNHEX) =====
+--   Thêm cột mới + backfill UNHEX → bỏ cột cũ (kèm index) → đổi tên cột mới, thêm lại UNIQUE
+--   Key cũ và mới cùng 1 giá trị MD5 → surrogate_key / khoá ngoại trong fact giữ nguyên
+DROP PROCEDURE IF EXISTS sp_migrate_dim_business_key;
+DROP PROCEDURE IF EXISTS sp_migrate_business_keys;
+DELIMITER $$
+
+CREATE PROCEDURE sp_migrate_dim_business_key(IN p_table VARCHAR(64))
+BEGIN
+    IF EXISTS (
+        SELECT 1 FROM information_schema.COLUMNS
+        WHERE TABLE_SCHEMA = 'bonbanh_datawarehouse'
+          AND TABLE_NAME = p_table
+          AND COLUMN_NAME = 'business_key'
+          AND DATA_TYPE = 'varchar'
+    ) THEN
+        SET @sql = CONCAT('ALTER TABLE ', p_table, ' ADD COLUMN business_key_bin BINARY(16) AFTER business_key');
+        PREPARE stmt FROM @sql; EXECUTE stmt; DEALLOCATE PREPARE stmt;
+
+        SET @sql = CONCAT('UPDATE ', p_table, ' SET business_key_bin = UNHEX(business_key)');
+        PREPARE stmt FROM @sql; EXECUTE stmt; DEALLOCATE PREPARE stmt;
+
+        SET @sql = CONCAT('ALTER TABLE ', p_table, ' DROP COLUMN business_key');
+        PREPARE stmt FROM @sql; EXECUTE stmt; DEALLOCATE PREPARE stmt;
+
+        SET @sql = CONCAT('ALTER TABLE ', p_table,
+                          ' CHANGE COLUMN business_key_bin business_key BINARY(16),',
+                          ' ADD UNIQUE KEY business_key (business_key)');
+        PREPARE stmt FROM @sql; EXECUTE stmt; DEALLOCATE PREPARE stmt;
+    END IF;
+END$$
+
+CREATE PROCEDURE sp_migrate_business_keys()
+BEGIN
+    CALL sp_migrate_dim_business_key('dim_mau_xe');
+    CALL sp_migrate_dim_business_key('dim_vi_tri');
+    CALL sp_migrate_dim_business_key('dim_nguoi_ban');
+    CALL sp_migrate_dim_business_key('dim_xuat_xu');
+    CALL sp_migrate_dim_business_key('dim_tinh_trang');
+    CALL sp_migrate_dim_business_key('dim_kieu_dang');
+END$$
+DELIMITER ;
+
+CALL sp_migrate_business_keys();
+DROP PROCEDURE IF EXISTS sp_migrate_business_keys;
+DROP PROCEDURE IF EXISTS sp_migrate_dim_business_key;
+
+-- ===== MIGRATION: dim_mau_xe ghi đè (business_key UNIQUE) → SCD Type 2 =====
+--   Mỗi dòng hiện có thành phiên bản hiện tại (valid_from = updated_at), attr_hash tính từ thuộc tính
+--   đang lưu (cùng công thức với sp_merge_dim_mau_xe) → lần load sau chỉ ghi các mẫu xe thực sự đổi
+DROP PROCEDURE IF EXISTS sp_migrate_dim_mau_xe_scd2;
+DELIMITER $$
+
+CREATE PROCEDURE sp_migrate_dim_mau_xe_scd2()
+BEGIN
+    IF NOT EXISTS (
+        SELECT 1 FROM information_schema.COLUMNS
+        WHERE TABLE_SCHEMA = 'bonbanh_datawarehouse'
+          AND TABLE_NAME = 'dim_mau_xe'
+          AND COLUMN_NAME = 'attr_hash'
+    ) THEN
+        ALTER TABLE dim_mau_xe
+            ADD COLUMN attr_hash BINARY(16) AFTER so_cua,
+            ADD COLUMN valid_from DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP AFTER attr_hash,
+            ADD COLUMN valid_to DATETIME NOT NULL DEFAULT '9999-12-31 00:00:00' AFTER valid_from,
+            ADD COLUMN is_current TINYINT(1) NOT NULL DEFAULT 1 AFTER valid_to,
+            ADD INDEX idx_mau_xe_current (business_key, is_current);
+
+        UPDATE dim_mau_xe
+        SET attr_hash = UNHEX(MD5(CONCAT_WS(CHAR(31),
+                IFNULL(ten_xe, ''), IFNULL(loai_xe_nam_sx, ''), IFNULL(nam_san_xuat, ''),
+                IFNULL(so_cho_ngoi, ''), IFNULL(so_cua, '')))),
+            valid_from = IFNULL(updated_at, CURRENT_TIMESTAMP);
+    END IF;
+
+    IF EXISTS (
+        SELECT 1 FROM information_schema.STATISTICS
+        WHERE TABLE_SCHEMA = 'bonbanh_datawarehouse'
+          AND TABLE_NAME = 'dim_mau_xe'
+          AND INDEX_NAME = 'business_key'
+    ) THEN
+        ALTER TABLE dim_mau_xe DROP INDEX business_key, MODIFY COLUMN business_key BINARY(16) NOT NULL;
+    END IF;
+END$$
+DELIMITER ;
+
+CALL sp_migrate_dim_mau_xe_scd2();
+DROP PROCEDURE IF EXISTS sp_migrate_dim_mau_xe_scd2;
+
+-- ===== MIGRATION: động cơ / màu ngoại thất / màu nội thất từ dim_mau_xe → fact =====
+--   Các cột này khác nhau giữa các tin cùng mẫu xe (lấy từ dòng staging cuối) → mỗi lần load mẫu xe
+--   lại sinh phiên bản SCD2 mới. Fact cũ lấy giá trị từ phiên bản dim_mau_xe nó trỏ tới, attr_hash
+--   tính lại chỉ từ thuộc tính mẫu xe (cùng công thức với sp_merge_dim_mau_xe) rồi bỏ cột khỏi dimension
+DROP PROCEDURE IF EXISTS sp_migrate_listing_attributes;
+DELIMITER $$
+
+CREATE PROCEDURE sp_migrate_listing_attributes()
+BEGIN
+    IF NOT EXISTS (
+        SELECT 1 FROM information_schema.COLUMNS
+        WHERE TABLE_SCHEMA = 'bonbanh_datawarehouse'
+          AND TABLE_NAME = 'fact_danh_sach_xe'
+          AND COLUMN_NAME = 'mau_ngoai_that'
+    ) THEN
+        ALTER TABLE fact_danh_sach_xe
+            ADD COLUMN dong_co VARCHAR(128) AFTER luot_xem,
+            ADD COLUMN mau_ngoai_that VARCHAR(128) AFTER dong_co,
+            ADD COLUMN mau_noi_that VARCHAR(128) AFTER mau_ngoai_that;
+
+        UPDATE fact_danh_sach_xe f
+        JOIN dim_mau_xe d ON d.surrogate_key = f.mau_xe_sk
+        SET f.dong_co = d.dong_co,
+            f.mau_ngoai_that = d.mau_ngoai_that,
+            f.mau_noi_that = d.mau_noi_that;
+    END IF;
+
+    IF EXISTS (
+        SELECT 1 FROM information_schema.COLUMNS
+        WHERE TABLE_SCHEMA = 'bonbanh_datawarehouse'
+          AND TABLE_NAME = 'dim_mau_xe'
+          AND COLUMN_NAME = 'mau_ngoai_that'
+    ) THEN
+        UPDATE dim_mau_xe
+        SET attr_hash = UNHEX(MD5(CONCAT_WS(CHAR(31),
+                IFNULL(ten_xe, ''), IFNULL(loai_xe_nam_sx, ''), IFNULL(nam_san_xuat, ''),
+                IFNULL(so_cho_ngoi, ''), IFNULL(so_cua, ''))));
+
+        ALTER TABLE dim_mau_xe
+            DROP COLUMN dong_co,
+            DROP COLUMN mau_ngoai_that,
+            DROP COLUMN mau_noi_that;
+    END IF;
+END$$
+DELIMITER ;
+
+CALL sp_migrate_listing_attributes();
+DROP PROCEDURE IF EXISTS sp_migrate_listing_attributes;
@@ -1,146 +1,364 @@
 DROP PROCEDURE IF EXISTS sp_load_dw;
 DELIMITER $$
 
-CREATE PROCEDURE sp_load_dw()
+-- ========================
+--  LOAD STAGING → DW theo tập (set-based), thay cho cursor từng dòng
+--  - Mỗi dimension: 1 câu INSERT ... SELECT theo business key BINARY(16) = UNHEX(MD5(...))
+--    (cùng chuỗi nguồn như bản cũ; dw_python_loader.py tính y hệt bằng hashlib.md5().digest())
+--    + thuộc tính lấy từ dòng staging cuối cùng (id lớn nhất) của key đó
+--      = kết quả cũ: cursor duyệt theo id, dòng sau ON DUPLICATE KEY UPDATE ghi đè dòng trước
+--    + key mới được cấp surrogate_key theo thứ tự xuất hiện đầu tiên (MIN(id))
+--    + dim_mau_xe là SCD Type 2 (xem sp_merge_dim_mau_xe): chỉ ghi khi attr_hash của mẫu xe đổi
+--      (động cơ / màu khác nhau giữa các tin cùng mẫu → cột của fact, không nằm trong attr_hash)
+--  - Fact: 1 câu INSERT ... SELECT join staging với 6 dimension qua business key
+--    (dim_mau_xe: phiên bản is_current = 1 tại thời điểm load)
+--  - Cột số: NULLIF trước CAST để chuỗi rỗng → NULL (không sinh warning / lỗi strict mode)
+--  - Incremental: chỉ xử lý dòng staging có p_since < updated_at <= p_until
+--    (p_since NULL = toàn bộ; p_since = p_until của lần trước nên dòng ở mốc không bị load lại - với grain
+--     'daily' mỗi lần load lại là 1 snapshot mới dù tin không đổi. Pipeline chạy staging xong mới tới DW
+--     nên không có dòng nào được ghi cùng giây với p_until sau khi đọc MAX(updated_at))
+--  - Fact: 1 dòng / (tin, p_snapshot_date) (UNIQUE link_hash, snapshot_date) → chạy lại cùng ngày là upsert
+--    + Bản cũ hơn của tin vừa load → is_current = 0
+--    + p_grain = 'listing': xoá luôn các bản cũ (fact = 1 dòng / tin)
+--      p_grain = 'daily'  : giữ lại (lịch sử theo ngày của các tin có thay đổi)
+--  - Mỗi dimension là 1 procedure riêng (sp_load_dim_*, số dòng ảnh hưởng → @dim_rows) để load_to_dw
+--    chạy song song trên nhiều connection; sp_load_fact chạy sau khi mọi dimension đã commit.
+--    sp_load_dw = gọi tuần tự tất cả (1 connection)
+--  - sp_reload_fact_day: load lại 1 ngày snapshot theo đúng tập tin của partition ngày đó (grain 'daily')
+-- ========================
+
+DROP PROCEDURE IF EXISTS sp_merge_dim_mau_xe$$
+CREATE PROCEDURE sp_merge_dim_mau_xe(IN p_since DATETIME, IN p_until DATETIME, IN p_versioned BOOLEAN)
+BEGIN
+    /* DIM MẪU XE - SCD Type 2 theo attr_hash (chỉ thuộc tính của mẫu xe; động cơ / màu là của từng tin → fact):
+       - key mới → thêm phiên bản hiện tại
+       - key có attr_hash khác bản hiện tại → đóng bản cũ (valid_to, is_current = 0) + thêm bản mới
+         (p_versioned = FALSE: load lại 1 ngày cũ → giữ nguyên bản hiện tại, không tạo phiên bản từ dữ liệu cũ)
+       - attr_hash trùng → không ghi gì */
+    DECLARE v_now DATETIME DEFAULT NOW();
+    DECLARE v_closed INT DEFAULT 0;
+
+    DROP TEMPORARY TABLE IF EXISTS tmp_dim_mau_xe_src;
+    CREATE TEMPORARY TABLE tmp_dim_mau_xe_src (
+        bk BINARY(16) PRIMARY KEY,
+        first_id BIGINT,
+        ten_xe VARCHAR(512),
+        loai_xe_nam_sx VARCHAR(255),
+        nam_san_xuat INT,
+        so_cho_ngoi INT,
+        so_cua INT,
+        attr_hash BINARY(16)
+    ) ENGINE=InnoDB;
+
+    INSERT INTO tmp_dim_mau_xe_src (
+        bk, first_id, ten_xe, loai_xe_nam_sx, nam_san_xuat, so_cho_ngoi, so_cua
+    )
+    SELECT
+        k.bk,
+        k.first_id,
+        s.ten_xe,
+        s.loai_xe_nam_sx,
+        CAST(NULLIF(REGEXP_REPLACE(s.nam_san_xuat, '[^0-9]', ''), '') AS UNSIGNED),
+        NULLIF(CAST(NULLIF(REGEXP_REPLACE(s.so_cho_ngoi, '[^0-9]', ''), '') AS UNSIGNED), 0),
+        NULLIF(CAST(NULLIF(REGEXP_REPLACE(s.so_cua, '[^0-9]', ''), '') AS UNSIGNED), 0)
+    FROM (
+        SELECT UNHEX(MD5(CONCAT(IFNULL(ten_xe,''), '_', IFNULL(nam_san_xuat,'')))) AS bk,
+               MIN(id) AS first_id, MAX(id) AS last_id
+        FROM bonbanh_staging.xe_bonbanh
+        WHERE (p_since IS NULL OR updated_at > p_since)
+          AND (p_until IS NULL OR updated_at <= p_until)
+        GROUP BY bk
+    ) k
+    JOIN bonbanh_staging.xe_bonbanh s ON s.id = k.last_id;
+
+    /* Hash trên giá trị đã chuẩn hoá (như sẽ lưu trong dimension); dw_python_loader.attr_hash tính y hệt */
+    UPDATE tmp_dim_mau_xe_src
+    SET attr_hash = UNHEX(MD5(CONCAT_WS(CHAR(31),
+            IFNULL(ten_xe, ''), IFNULL(loai_xe_nam_sx, ''), IFNULL(nam_san_xuat, ''),
+            IFNULL(so_cho_ngoi, ''), IFNULL(so_cua, ''))));
+
+    /* Đóng phiên bản hiện tại của các mẫu xe đổi thuộc tính */
+    UPDATE dim_mau_xe d
+    JOIN tmp_dim_mau_xe_src src ON src.bk = d.business_key AND d.is_current = 1
+    SET d.is_current = 0,
+        d.valid_to = v_now
+    WHERE p_versioned AND NOT (d.attr_hash <=> src.attr_hash);
+
+    SET v_closed = ROW_COUNT();
+
+    /* Phiên bản mới: key chưa có bản hiện tại (key mới + key vừa đóng), theo thứ tự xuất hiện đầu tiên */
+    INSERT INTO dim_mau_xe (
+        business_key, ten_xe, loai_xe_nam_sx, nam_san_xuat, so_cho_ngoi, so_cua,
+        attr_hash, valid_from, valid_to, is_current
+    )
+    SELECT
+        src.bk, src.ten_xe, src.loai_xe_nam_sx, src.nam_san_xuat, src.so_cho_ngoi, src.so_cua,
+        src.attr_hash, v_now, '9999-12-31 00:00:00', 1
+    FROM tmp_dim_mau_xe_src src
+    LEFT JOIN dim_mau_xe d ON d.business_key = src.bk AND d.is_current = 1
+    WHERE d.surrogate_key IS NULL
+    ORDER BY src.first_id;
+
+    SET @dim_rows = v_closed + ROW_COUNT();
+
+    DROP TEMPORARY TABLE IF EXISTS tmp_dim_mau_xe_src;
+END$$
+
+DROP PROCEDURE IF EXISTS sp_load_dim_mau_xe$$
+CREATE PROCEDURE sp_load_dim_mau_xe(IN p_since DATETIME, IN p_until DATETIME)
+BEGIN
+    CALL sp_merge_dim_mau_xe(p_since, p_until, TRUE);
+END$$
+
+DROP PROCEDURE IF EXISTS sp_load_dim_vi_tri$$
+CREATE PROCEDURE sp_load_dim_vi_tri(IN p_since DATETIME, IN p_until DATETIME)
+BEGIN
+    /* DIM VỊ TRÍ */
+    INSERT INTO dim_vi_tri (business_key, noi_ban)
+    SELECT k.bk, s.noi_ban
+    FROM (
+        SELECT UNHEX(MD5(IFNULL(noi_ban,''))) AS bk, MIN(id) AS first_id, MAX(id) AS last_id
+        FROM bonbanh_staging.xe_bonbanh
+        WHERE (p_since IS NULL OR updated_at > p_since)
+          AND (p_until IS NULL OR updated_at <= p_until)
+        GROUP BY bk
+    ) k
+    JOIN bonbanh_staging.xe_bonbanh s ON s.id = k.last_id
+    ORDER BY k.first_id
+    ON DUPLICATE KEY UPDATE noi_ban = VALUES(noi_ban);
+
+    SET @dim_rows = ROW_COUNT();
+END$$
+
+DROP PROCEDURE IF EXISTS sp_load_dim_nguoi_ban$$
+CREATE PROCEDURE sp_load_dim_nguoi_ban(IN p_since DATETIME, IN p_until DATETIME)
+BEGIN
+    /* DIM NGƯỜI BÁN (lien_he cắt 255 ký tự như biến VARCHAR(255) của bản cũ) */
+    INSERT INTO dim_nguoi_ban (business_key, lien_he)
+    SELECT k.bk, LEFT(s.lien_he, 255)
+    FROM (
+        SELECT UNHEX(MD5(IFNULL(LEFT(lien_he, 255),''))) AS bk, MIN(id) AS first_id, MAX(id) AS last_id
+        FROM bonbanh_staging.xe_bonbanh
+        WHERE (p_since IS NULL OR updated_at > p_since)
+          AND (p_until IS NULL OR updated_at <= p_until)
+        GROUP BY bk
+    ) k
+    JOIN bonbanh_staging.xe_bonbanh s ON s.id = k.last_id
+    ORDER BY k.first_id
+    ON DUPLICATE KEY UPDATE lien_he = VALUES(lien_he);
+
+    SET @dim_rows = ROW_COUNT();
+END$$
+
+DROP PROCEDURE IF EXISTS sp_load_dim_xuat_xu$$
+CREATE PROCEDURE sp_load_dim_xuat_xu(IN p_since DATETIME, IN p_until DATETIME)
+BEGIN
+    /* DIM XUẤT XỨ */
+    INSERT INTO dim_xuat_xu (business_key, xuat_xu)
+    SELECT k.bk, s.xuat_xu
+    FROM (
+        SELECT UNHEX(MD5(IFNULL(xuat_xu,''))) AS bk, MIN(id) AS first_id, MAX(id) AS last_id
+        FROM bonbanh_staging.xe_bonbanh
+        WHERE (p_since IS NULL OR updated_at > p_since)
+          AND (p_until IS NULL OR updated_at <= p_until)
+        GROUP BY bk
+    ) k
+    JOIN bonbanh_staging.xe_bonbanh s ON s.id = k.last_id
+    ORDER BY k.first_id
+    ON DUPLICATE KEY UPDATE xuat_xu = VALUES(xuat_xu);
+
+    SET @dim_rows = ROW_COUNT();
+END$$
+
+DROP PROCEDURE IF EXISTS sp_load_dim_tinh_trang$$
+CREATE PROCEDURE sp_load_dim_tinh_trang(IN p_since DATETIME, IN p_until DATETIME)
 BEGIN
-    DECLARE done INT DEFAULT FALSE;
-
-    -- staging columns
-    DECLARE v_ten VARCHAR(512);
-    DECLARE v_loai VARCHAR(255);
-    DECLARE v_namsx VARCHAR(32);
-    DECLARE v_dongco VARCHAR(255);
-    DECLARE v_maungoai VARCHAR(255);
-    DECLARE v_maunoi VARCHAR(255);
-    DECLARE v_cho INT;
-    DECLARE v_cua INT;
-    DECLARE v_noiban VARCHAR(255);
-    DECLARE v_lienhe VARCHAR(255);
-    DECLARE v_xuatxu VARCHAR(255);
-    DECLARE v_tinhtrang VARCHAR(255);
-    DECLARE v_kieudang VARCHAR(255);
-    DECLARE v_gia BIGINT;
-    DECLARE v_km BIGINT;
-    DECLARE v_ngaydang DATE;
-    DECLARE v_luot INT;
-    DECLARE v_link VARCHAR(1024);
-
-    DECLARE cur CURSOR FOR 
-        SELECT 
-            ten_xe,
-            loai_xe_nam_sx,
-            nam_san_xuat,
-            dong_co,
-            mau_ngoai_that,
-            mau_noi_that,
-
-            /* Làm sạch dữ liệu số */
-            NULLIF(CAST(REGEXP_REPLACE(so_cho_ngoi, '[^0-9]', '') AS UNSIGNED), 0) AS so_cho_ngoi,
-            NULLIF(CAST(REGEXP_REPLACE(so_cua, '[^0-9]', '') AS UNSIGNED), 0) AS so_cua,
-            noi_ban,
-            lien_he,
-            xuat_xu,
-            tinh_trang,
-            kieu_dang,
-            NULLIF(CAST(REGEXP_REPLACE(gia_xe_vnd, '[^0-9]', '') AS UNSIGNED), 0) AS gia_xe_vnd,
-            NULLIF(CAST(REGEXP_REPLACE(so_km, '[^0-9]', '') AS UNSIGNED), 0) AS so_km,
-            ngay_dang,
-            NULLIF(CAST(REGEXP_REPLACE(luot_xem, '[^0-9]', '') AS UNSIGNED), 0) AS luot_xem,
-            link_xe
-        FROM bonbanh_staging.xe_bonbanh;
-
-    DECLARE CONTINUE HANDLER FOR NOT FOUND SET done = TRUE;
-
-    OPEN cur;
-
-    read_loop: LOOP
-        FETCH cur INTO v_ten, v_loai, v_namsx, v_dongco, v_maungoai, v_maunoi,
-            v_cho, v_cua, v_noiban, v_lienhe, v_xuatxu, v_tinhtrang, v_kieudang,
-            v_gia, v_km, v_ngaydang, v_luot, v_link;
-
-        IF done THEN 
-            LEAVE read_loop; 
-        END IF;
-
-        /* DIM MAU XE */
-        SET @bk_car = MD5(CONCAT(IFNULL(v_ten,''), '_', IFNULL(v_namsx,'')));
-
-        INSERT INTO dim_mau_xe (
-            business_key, ten_xe, loai_xe_nam_sx, nam_san_xuat,
-            dong_co, mau_ngoai_that, mau_noi_that, so_cho_ngoi, so_cua
-        ) VALUES (
-            @bk_car, v_ten, v_loai, v_namsx, v_dongco, v_maungoai, v_maunoi, v_cho, v_cua
-        )
-        ON DUPLICATE KEY UPDATE
-            ten_xe = VALUES(ten_xe),
-            loai_xe_nam_sx = VALUES(loai_xe_nam_sx),
-            nam_san_xuat = VALUES(nam_san_xuat),
-            dong_co = VALUES(dong_co),
-            mau_ngoai_that = VALUES(mau_ngoai_that),
-            mau_noi_that = VALUES(mau_noi_that),
-            so_cho_ngoi = VALUES(so_cho_ngoi),
-            so_cua = VALUES(so_cua);
-
-        SELECT surrogate_key INTO @sk_car 
-        FROM dim_mau_xe WHERE business_key=@bk_car;
-
-        /* DIM VỊ TRÍ */
-        SET @bk_loc = MD5(IFNULL(v_noiban,''));
-        INSERT INTO dim_vi_tri (business_key, noi_ban)
-        VALUES (@bk_loc, v_noiban)
-        ON DUPLICATE KEY UPDATE noi_ban = VALUES(noi_ban);
-
-        SELECT surrogate_key INTO @sk_loc 
-        FROM dim_vi_tri WHERE business_key=@bk_loc;
-
-        /* DIM NGƯỜI BÁN */
-        SET @bk_seller = MD5(IFNULL(v_lienhe,''));
-        INSERT INTO dim_nguoi_ban (business_key, lien_he)
-        VALUES (@bk_seller, v_lienhe)
-        ON DUPLICATE KEY UPDATE lien_he = VALUES(lien_he);
-
-        SELECT surrogate_key INTO @sk_seller 
-        FROM dim_nguoi_ban WHERE business_key=@bk_seller;
-
-        /* DIM XUẤT XỨ */
-        SET @bk_xx = MD5(IFNULL(v_xuatxu,''));
-        INSERT INTO dim_xuat_xu (business_key, xuat_xu)
-        VALUES (@bk_xx, v_xuatxu)
-        ON DUPLICATE KEY UPDATE xuat_xu = VALUES(xuat_xu);
-
-        SELECT surrogate_key INTO @sk_xx 
-        FROM dim_xuat_xu WHERE business_key=@bk_xx;
-
-        /* DIM TÌNH TRẠNG */
-        SET @bk_cond = MD5(IFNULL(v_tinhtrang,''));
-        INSERT INTO dim_tinh_trang (business_key, tinh_trang)
-        VALUES (@bk_cond, v_tinhtrang)
-        ON DUPLICATE KEY UPDATE tinh_trang = VALUES(tinh_trang);
-
-        SELECT surrogate_key INTO @sk_cond 
-        FROM dim_tinh_trang WHERE business_key=@bk_cond;
-
-        /* DIM KIỂU DÁNG */
-        SET @bk_style = MD5(IFNULL(v_kieudang,''));
-        INSERT INTO dim_kieu_dang (business_key, kieu_dang)
-        VALUES (@bk_style, v_kieudang)
-        ON DUPLICATE KEY UPDATE kieu_dang = VALUES(kieu_dang);
-
-        SELECT surrogate_key INTO @sk_style 
-        FROM dim_kieu_dang WHERE business_key=@bk_style;
-
-        /* FACT TABLE */
-        INSERT INTO fact_danh_sach_xe (
-            mau_xe_sk, vi_tri_sk, nguoi_ban_sk, xuat_xu_sk, tinh_trang_sk, kieu_dang_sk,
-            gia_xe, so_km, ngay_dang, luot_xem, link_xe
-        ) VALUES (
-            @sk_car, @sk_loc, @sk_seller, @sk_xx, @sk_cond, @sk_style,
-            v_gia, v_km, v_ngaydang, v_luot, v_link
-        );
-
-    END LOOP;
-
-    CLOSE cur;
+    /* DIM TÌNH TRẠNG */
+    INSERT INTO dim_tinh_trang (business_key, tinh_trang)
+    SELECT k.bk, s.tinh_trang
+    FROM (
+        SELECT UNHEX(MD5(IFNULL(tinh_trang,''))) AS bk, MIN(id) AS first_id, MAX(id) AS last_id
+        FROM bonbanh_staging.xe_bonbanh
+        WHERE (p_since IS NULL OR updated_at > p_since)
+          AND (p_until IS NULL OR updated_at <= p_until)
+        GROUP BY bk
+    ) k
+    JOIN bonbanh_staging.xe_bonbanh s ON s.id = k.last_id
+    ORDER BY k.first_id
+    ON DUPLICATE KEY UPDATE tinh_trang = VALUES(tinh_trang);
 
+    SET @dim_rows = ROW_COUNT();
+END$$
+
+DROP PROCEDURE IF EXISTS sp_load_dim_kieu_dang$$
+CREATE PROCEDURE sp_load_dim_kieu_dang(IN p_since DATETIME, IN p_until DATETIME)
+BEGIN
+    /* DIM KIỂU DÁNG */
+    INSERT INTO dim_kieu_dang (business_key, kieu_dang)
+    SELECT k.bk, s.kieu_dang
+    FROM (
+        SELECT UNHEX(MD5(IFNULL(kieu_dang,''))) AS bk, MIN(id) AS first_id, MAX(id) AS last_id
+        FROM bonbanh_staging.xe_bonbanh
+        WHERE (p_since IS NULL OR updated_at > p_since)
+          AND (p_until IS NULL OR updated_at <= p_until)
+        GROUP BY bk
+    ) k
+    JOIN bonbanh_staging.xe_bonbanh s ON s.id = k.last_id
+    ORDER BY k.first_id
+    ON DUPLICATE KEY UPDATE kieu_dang = VALUES(kieu_dang);
+
+    SET @dim_rows = ROW_COUNT();
+END$$
+
+DROP PROCEDURE IF EXISTS sp_upsert_fact_delta$$
+CREATE PROCEDURE sp_upsert_fact_delta(IN p_snapshot_date DATE)
+BEGIN
+    /* FACT TABLE: join staging → dimension qua business key (UNIQUE index), upsert theo (link_hash, snapshot_date) */
+    INSERT INTO fact_danh_sach_xe (
+        mau_xe_sk, vi_tri_sk, nguoi_ban_sk, xuat_xu_sk, tinh_trang_sk, kieu_dang_sk,
+        gia_xe, so_km, ngay_dang, luot_xem, dong_co, mau_ngoai_that, mau_noi_that,
+        link_xe, link_hash, snapshot_date, is_current
+    )
+    SELECT
+        dm.surrogate_key,
+        dv.surrogate_key,
+        dn.surrogate_key,
+        dx.surrogate_key,
+        dt.surrogate_key,
+        dk.surrogate_key,
+        NULLIF(s.gia_xe_vnd, 0),
+        NULLIF(s.so_km, 0),
+        s.ngay_dang,
+        NULLIF(s.luot_xem, 0),
+        s.dong_co,
+        s.mau_ngoai_that,
+        s.mau_noi_that,
+        s.link_xe,
+        s.link_hash,
+        p_snapshot_date,
+        1
+    FROM bonbanh_staging.xe_bonbanh s
+    JOIN tmp_dw_delta d ON d.id = s.id
+    LEFT JOIN dim_mau_xe dm
+        ON dm.business_key = UNHEX(MD5(CONCAT(IFNULL(s.ten_xe,''), '_', IFNULL(s.nam_san_xuat,''))))
+       AND dm.is_current = 1
+    LEFT JOIN dim_vi_tri dv ON dv.business_key = UNHEX(MD5(IFNULL(s.noi_ban,'')))
+    LEFT JOIN dim_nguoi_ban dn ON dn.business_key = UNHEX(MD5(IFNULL(LEFT(s.lien_he, 255),'')))
+    LEFT JOIN dim_xuat_xu dx ON dx.business_key = UNHEX(MD5(IFNULL(s.xuat_xu,'')))
+    LEFT JOIN dim_tinh_trang dt ON dt.business_key = UNHEX(MD5(IFNULL(s.tinh_trang,'')))
+    LEFT JOIN dim_kieu_dang dk ON dk.business_key = UNHEX(MD5(IFNULL(s.kieu_dang,'')))
+    ORDER BY s.id
+    ON DUPLICATE KEY UPDATE
+        mau_xe_sk = VALUES(mau_xe_sk),
+        vi_tri_sk = VALUES(vi_tri_sk),
+        nguoi_ban_sk = VALUES(nguoi_ban_sk),
+        xuat_xu_sk = VALUES(xuat_xu_sk),
+        tinh_trang_sk = VALUES(tinh_trang_sk),
+        kieu_dang_sk = VALUES(kieu_dang_sk),
+        gia_xe = VALUES(gia_xe),
+        so_km = VALUES(so_km),
+        ngay_dang = VALUES(ngay_dang),
+        luot_xem = VALUES(luot_xem),
+        dong_co = VALUES(dong_co),
+        mau_ngoai_that = VALUES(mau_ngoai_that),
+        mau_noi_that = VALUES(mau_noi_that),
+        link_xe = VALUES(link_xe),
+        is_current = 1,
+        loaded_at = CURRENT_TIMESTAMP;
+END$$
+
+DROP PROCEDURE IF EXISTS sp_load_fact$$
+CREATE PROCEDURE sp_load_fact(
+    IN p_since DATETIME,
+    IN p_until DATETIME,
+    IN p_snapshot_date DATE,
+    IN p_grain VARCHAR(16)
+)
+BEGIN
+    /* Tập dòng staging cần xử lý lần này */
+    DROP TEMPORARY TABLE IF EXISTS tmp_dw_delta;
+    CREATE TEMPORARY TABLE tmp_dw_delta (id BIGINT PRIMARY KEY) ENGINE=InnoDB;
+
+    INSERT INTO tmp_dw_delta (id)
+    SELECT id FROM bonbanh_staging.xe_bonbanh
+    WHERE (p_since IS NULL OR updated_at > p_since)
+      AND (p_until IS NULL OR updated_at <= p_until);
+
+    SET @dw_delta_rows = ROW_COUNT();
+
+    CALL sp_upsert_fact_delta(p_snapshot_date);
+
+    /* Bản cũ hơn của các tin vừa load (tra theo ux_fact_listing_snapshot, chỉ các tin trong delta):
+       'listing' → xoá thẳng, 'daily' → không còn là bản hiện tại */
+    IF p_grain = 'listing' THEN
+        DELETE f FROM fact_danh_sach_xe f
+        JOIN bonbanh_staging.xe_bonbanh s ON s.link_hash = f.link_hash
+        JOIN tmp_dw_delta d ON d.id = s.id
+        WHERE f.snapshot_date < p_snapshot_date;
+    ELSE
+        UPDATE fact_danh_sach_xe f
+        JOIN bonbanh_staging.xe_bonbanh s ON s.link_hash = f.link_hash
+        JOIN tmp_dw_delta d ON d.id = s.id
+        SET f.is_current = 0
+        WHERE f.snapshot_date < p_snapshot_date AND f.is_current = 1;
+    END IF;
+
+    DROP TEMPORARY TABLE IF EXISTS tmp_dw_delta;
+END$$
+
+DROP PROCEDURE IF EXISTS sp_reload_fact_day$$
+CREATE PROCEDURE sp_reload_fact_day(IN p_snapshot_date DATE)
+BEGIN
+    /* Load lại 1 ngày snapshot (chỉ grain 'daily', load_to_dw.py --reload-day):
+       - fact_reload_links = link_hash của partition ngày đó, load_to_dw ghi trước khi TRUNCATE PARTITION
+       - Tập dòng staging = các tin đó (không theo updated_at: snapshot_date là ngày load, staging chỉ giữ
+         bản mới nhất của tin) → mỗi tin có trong ngày vẫn có lại dòng của ngày đó, giá trị = staging hiện tại
+       - Dimension: load theo khoảng updated_at của các dòng đó, dim_mau_xe không tạo phiên bản SCD2 mới
+         (chỉ thêm mẫu xe chưa có) → load lại ngày cũ không đóng phiên bản hiện tại
+       - is_current của các tin này do load_to_dw tính lại sau (không đóng bản cũ như sp_load_fact) */
+    DECLARE v_since DATETIME;
+    DECLARE v_until DATETIME;
+
+    DROP TEMPORARY TABLE IF EXISTS tmp_dw_delta;
+    CREATE TEMPORARY TABLE tmp_dw_delta (id BIGINT PRIMARY KEY) ENGINE=InnoDB;
+
+    INSERT INTO tmp_dw_delta (id)
+    SELECT s.id
+    FROM bonbanh_staging.xe_bonbanh s
+    JOIN fact_reload_links r ON r.link_hash = s.link_hash AND r.snapshot_date = p_snapshot_date;
+
+    SET @dw_delta_rows = ROW_COUNT();
+
+    SELECT MIN(s.updated_at), MAX(s.updated_at) INTO v_since, v_until
+    FROM bonbanh_staging.xe_bonbanh s
+    JOIN tmp_dw_delta d ON d.id = s.id;
+
+    IF @dw_delta_rows > 0 THEN
+        CALL sp_merge_dim_mau_xe(v_since, v_until, FALSE);
+        CALL sp_load_dim_vi_tri(v_since, v_until);
+        CALL sp_load_dim_nguoi_ban(v_since, v_until);
+        CALL sp_load_dim_xuat_xu(v_since, v_until);
+        CALL sp_load_dim_tinh_trang(v_since, v_until);
+        CALL sp_load_dim_kieu_dang(v_since, v_until);
+        CALL sp_upsert_fact_delta(p_snapshot_date);
+    END IF;
+
+    DROP TEMPORARY TABLE IF EXISTS tmp_dw_delta;
+END$$
+
+CREATE PROCEDURE sp_load_dw(
+    IN p_since DATETIME,
+    IN p_until DATETIME,
+    IN p_snapshot_date DATE,
+    IN p_grain VARCHAR(16)
+)
+BEGIN
+    CALL sp_load_dim_mau_xe(p_since, p_until);
+    CALL sp_load_dim_vi_tri(p_since, p_until);
+    CALL sp_load_dim_nguoi_ban(p_since, p_until);
+    CALL sp_load_dim_xuat_xu(p_since, p_until);
+    CALL sp_load_dim_tinh_trang(p_since, p_until);
+    CALL sp_load_dim_kieu_dang(p_since, p_until);
+    CALL sp_load_fact(p_since, p_until, p_snapshot_date, p_grain);
 END$$
 DELIMITER ;
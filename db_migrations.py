@@ -0,0 +1,198 @@
+import os
+import time
+import hashlib
+import logging
+import mysql.connector
+from mysql.connector import Error
+import config
+
+# ===========================
+# Chạy các file .sql (schema, migration, stored procedure) dùng chung cho mọi bước ETL:
+# - Parse file 1 lần, hỗ trợ DELIMITER (tạo SP / procedure migration)
+# - Lưu checksum sha256 của file đã chạy vào bonbanh_control.schema_migrations
+# - File có checksum không đổi → bỏ qua; mỗi lần khởi động chỉ tốn 1 câu SELECT metadata
+# Muốn chạy lại toàn bộ (vd: đã DROP database bằng tay) → config.DB_MIGRATIONS_FORCE = True
+# hoặc: python db_migrations.py --force
+# ===========================
+
+CONTROL_DB = config.CONTROL_DB_NAME
+
+# Lỗi "đã tồn tại" khi chạy lại DDL trên DB cũ → bỏ qua
+# 1007 DB, 1050 bảng, 1060 cột, 1061 tên index, 1304 procedure, 1826 foreign key
+IGNORED_ERRNOS = {1007, 1050, 1060, 1061, 1304, 1826}
+
+# Thứ tự chạy khi khởi động pipeline (mỗi bước vẫn tự gọi phần của mình)
+CONTROL_SCRIPTS = [config.CONTROL_SQL_SCHEMA_FILE]
+STAGING_SCRIPTS = [
+    config.STAGING_SQL_SCHEMA_FILE,
+    config.STAGING_SQL_MIGRATE_FILE,
+    config.STAGING_SQL_SP_FILE,
+    config.STAGING_SQL_BULK_FILE,
+]
+DW_SCRIPTS = CONTROL_SCRIPTS + [config.DW_SQL_SCHEMA_FILE, config.DW_SQL_PROCEDURE_FILE]
+DATAMART_SCRIPTS = CONTROL_SCRIPTS + [config.DATAMART_SQL_SCHEMA_FILE]
+ALL_SCRIPTS = list(dict.fromkeys(CONTROL_SCRIPTS + STAGING_SCRIPTS + DW_SCRIPTS + DATAMART_SCRIPTS))
+
+
+def strip_sql_comment(line, state=None):
+    """Bỏ comment -- (theo sau là khoảng trắng / hết dòng) và # nằm ngoài chuỗi ở cuối 1 dòng.
+    state: đang trong chuỗi (', ", `) hoặc comment /* */ từ dòng trước (None = không).
+    Trả về (dòng đã bỏ comment, state cho dòng sau)."""
+    i = 0
+    while i < len(line):
+        char = line[i]
+        if state == "/*":
+            if line.startswith("*/", i):
+                state = None
+                i += 1
+        elif state:
+            if char == "\\" and state != "`":
+                i += 1
+            elif char == state:
+                state = None
+        elif char in "'\"`":
+            state = char
+        elif line.startswith("/*", i):
+            state = "/*"
+            i += 1
+        elif char == "#" or (line.startswith("--", i) and line[i + 2:i + 3] in ("", " ", "\t")):
+            return line[:i], state
+        i += 1
+    return line, state
+
+
+def parse_sql_script(sql):
+    """Tách nội dung file .sql thành list câu lệnh, hỗ trợ DELIMITER.
+    Bỏ comment -- / # ngoài chuỗi (cả comment cuối dòng sau delimiter), rồi câu lệnh kết thúc khi
+    1 dòng kết thúc bằng delimiter hiện tại."""
+    statements = []
+    current = []
+    delimiter = ";"
+    state = None
+
+    for line in sql.splitlines():
+        in_text = state is not None
+        line, state = strip_sql_comment(line, state)
+        stripped = line.strip()
+        if not stripped:
+            continue
+        if not in_text and stripped.upper().startswith("DELIMITER"):
+            delimiter = stripped.split()[-1]
+            continue
+        if stripped.endswith(delimiter) and state is None:
+            current.append(stripped[:-len(delimiter)])
+            statement = "\n".join(current).strip()
+            if statement:
+                statements.append(statement)
+            current = []
+        else:
+            current.append(stripped)
+
+    if "\n".join(current).strip():
+        statements.append("\n".join(current).strip())
+    return statements
+
+
+def file_checksum(path):
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def fetch_applied(cursor, scripts):
+    """script → checksum đã chạy. Chưa có DB / bảng control → tạo và trả về rỗng."""
+    try:
+        cursor.execute(
+            f"SELECT script, checksum FROM {CONTROL_DB}.schema_migrations WHERE script IN ({', '.join(['%s'] * len(scripts))})",
+            scripts
+        )
+        return dict(cursor.fetchall())
+    except Error as e:
+        if e.errno not in (1049, 1146):  # Unknown database / table
+            raise
+    cursor.execute(f"CREATE DATABASE IF NOT EXISTS {CONTROL_DB} CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci")
+    cursor.execute(f"""
+        CREATE TABLE IF NOT EXISTS {CONTROL_DB}.schema_migrations (
+            script VARCHAR(255) PRIMARY KEY,
+            checksum CHAR(64) NOT NULL,
+            statements INT NOT NULL,
+            duration_ms INT NOT NULL,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+        ) ENGINE=InnoDB
+    """)
+    return {}
+
+
+def run_script(cursor, path, logger):
+    with open(path, "r", encoding="utf-8") as f:
+        statements = parse_sql_script(f.read())
+    for statement in statements:
+        try:
+            cursor.execute(statement)
+            if cursor.with_rows:
+                cursor.fetchall()
+        except Error as e:
+            if e.errno in IGNORED_ERRNOS:
+                continue
+            logger.error("Lỗi SQL trong %s: %s", path, e)
+            logger.error("   Câu lệnh lỗi: %s...", statement[:200])
+            raise
+    return len(statements)
+
+
+def pending_scripts(scripts):
+    """List file .sql sẽ được apply_scripts chạy (chưa chạy hoặc checksum đổi)."""
+    conn = mysql.connector.connect(**config.DB_CONFIG_NO_DB)
+    cursor = conn.cursor()
+    try:
+        applied = fetch_applied(cursor, scripts)
+        return [path for path in scripts if applied.get(path) != file_checksum(path)]
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def apply_scripts(scripts, logger=None, force=None):
+    """Chạy các file .sql có checksum đổi (hoặc chưa chạy bao giờ), theo thứ tự truyền vào.
+    Trả về list file đã chạy. Lỗi SQL → ném lại, file lỗi không được ghi checksum."""
+    logger = logger or logging.getLogger(__name__)
+    force = config.DB_MIGRATIONS_FORCE if force is None else force
+    missing = [path for path in scripts if not os.path.exists(path)]
+    if missing:
+        raise FileNotFoundError(f"Không tìm thấy file SQL: {', '.join(missing)}")
+
+    conn = mysql.connector.connect(**config.DB_CONFIG_NO_DB)  # autocommit, connection riêng (các file có USE <db>)
+    cursor = conn.cursor()
+    try:
+        applied = fetch_applied(cursor, scripts)
+        ran = []
+        for path in scripts:
+            checksum = file_checksum(path)
+            if not force and applied.get(path) == checksum:
+                continue
+            logger.info("Đang chạy %s (%s)...", path, "chạy lần đầu" if path not in applied else "file đã đổi")
+            started = time.monotonic()
+            count = run_script(cursor, path, logger)
+            duration_ms = int((time.monotonic() - started) * 1000)
+            cursor.execute(f"""
+                INSERT INTO {CONTROL_DB}.schema_migrations (script, checksum, statements, duration_ms)
+                VALUES (%s, %s, %s, %s)
+                ON DUPLICATE KEY UPDATE checksum = VALUES(checksum), statements = VALUES(statements),
+                    duration_ms = VALUES(duration_ms), applied_at = CURRENT_TIMESTAMP
+            """, (path, checksum, count, duration_ms))
+            ran.append(path)
+        if not ran:
+            logger.info("Schema không đổi (%d file SQL đã chạy trước đó).", len(scripts))
+        return ran
+    finally:
+        cursor.close()
+        conn.close()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    parser = argparse.ArgumentParser(description="Chạy các file SQL schema / migration / procedure")
+    parser.add_argument("--force", action="store_true", help="Chạy lại mọi file, bỏ qua checksum")
+    args = parser.parse_args()
+    apply_scripts(ALL_SCRIPTS, logging.getLogger("DbMigrationsLogger"), force=args.force)
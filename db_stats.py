@@ -0,0 +1,106 @@
+import time
+
+# ===========================
+# Thống kê kích thước bảng / index InnoDB (để so sánh trước - sau khi đổi schema)
+# Đọc từ mysql.innodb_index_stats (stat_name = 'size', đơn vị trang) sau ANALYZE TABLE
+# Buffer pool: information_schema.INNODB_BUFFER_PAGE (quét toàn bộ buffer pool → chỉ dùng khi đo,
+# vd: python db_stats.py bonbanh_datawarehouse dim_mau_xe dim_nguoi_ban --buffer-pool)
+# Độ trễ upsert: chạy 1 lô mẫu cố định trong transaction rồi rollback (không để lại dữ liệu)
+# ===========================
+
+def index_sizes(cursor, schema, table):
+    """Trả về list (index_name, số byte) của 1 bảng, PRIMARY = dữ liệu (clustered index)."""
+    cursor.execute(f"ANALYZE TABLE `{schema}`.`{table}`")
+    cursor.fetchall()
+    cursor.execute("""
+        SELECT s.index_name, s.stat_value * @@innodb_page_size
+        FROM mysql.innodb_index_stats s
+        WHERE s.database_name = %s AND s.table_name = %s AND s.stat_name = 'size'
+        ORDER BY s.index_name
+    """, (schema, table))
+    return [(name, int(size)) for name, size in cursor.fetchall()]
+
+
+def log_index_sizes(logger, cursor, schema, table, label=""):
+    try:
+        sizes = index_sizes(cursor, schema, table)
+    except Exception as e:  # Không có quyền đọc bảng mysql.* → chỉ bỏ qua thống kê
+        logger.warning("Không đọc được kích thước index %s.%s: %s", schema, table, e)
+        return
+    for name, size in sizes:
+        logger.info("   [index%s] %s.%s %-20s %10.2f MB", f" {label}" if label else "",
+                    schema, table, name, size / 1024 / 1024)
+
+
+def buffer_pool_sizes(cursor, schema, table):
+    """Trả về list (index_name, số trang, số byte dữ liệu) của 1 bảng đang nằm trong buffer pool."""
+    cursor.execute("""
+        SELECT INDEX_NAME, COUNT(*), SUM(DATA_SIZE)
+        FROM information_schema.INNODB_BUFFER_PAGE
+        WHERE TABLE_NAME = %s AND INDEX_NAME IS NOT NULL
+        GROUP BY INDEX_NAME
+        ORDER BY INDEX_NAME
+    """, (f"`{schema}`.`{table}`",))
+    return [(name, int(pages), int(size or 0)) for name, pages, size in cursor.fetchall()]
+
+
+def log_buffer_pool_sizes(logger, cursor, schema, table, label=""):
+    try:
+        sizes = buffer_pool_sizes(cursor, schema, table)
+    except Exception as e:
+        logger.warning("Không đọc được buffer pool của %s.%s: %s", schema, table, e)
+        return
+    for name, pages, size in sizes:
+        logger.info("   [buffer pool%s] %s.%s %-20s %8d trang %10.2f MB", f" {label}" if label else "",
+                    schema, table, name, pages, size / 1024 / 1024)
+
+
+def time_in_rollback(conn, work, repeat=3):
+    """Chạy work() repeat lần, mỗi lần rollback ngay sau đó; trả về thời gian nhanh nhất (giây).
+    Lần đầu làm nóng buffer pool → lấy min để trước / sau migrate so sánh được với nhau."""
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        try:
+            work()
+        finally:
+            conn.rollback()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def log_upsert_latency(logger, conn, work, rows, label=""):
+    try:
+        seconds = time_in_rollback(conn, work)
+    except Exception as e:
+        logger.warning("Không đo được độ trễ upsert: %s", e)
+        return
+    logger.info("   [upsert%s] %d dòng mẫu trong %.2fs: %.3f ms/dòng (%.0f dòng/s)", f" {label}" if label else "",
+                rows, seconds, seconds * 1000 / max(rows, 1), rows / seconds if seconds > 0 else 0)
+
+
+if __name__ == "__main__":
+    import argparse
+    import logging
+    import mysql.connector
+    import config
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    parser = argparse.ArgumentParser(description="Kích thước index / buffer pool của các bảng InnoDB")
+    parser.add_argument("schema")
+    parser.add_argument("tables", nargs="+")
+    parser.add_argument("--buffer-pool", action="store_true", help="Đo thêm số trang trong buffer pool (chậm)")
+    args = parser.parse_args()
+
+    log = logging.getLogger("DbStatsLogger")
+    conn = mysql.connector.connect(**config.DB_CONFIG_NO_DB)
+    cursor = conn.cursor()
+    try:
+        for table in args.tables:
+            log_index_sizes(log, cursor, args.schema, table)
+            if args.buffer_pool:
+                log_buffer_pool_sizes(log, cursor, args.schema, table)
+    finally:
+        cursor.close()
+        conn.close()
@@ -0,0 +1,120 @@
+import logging
+from datetime import date, timedelta
+import config
+
+logger = logging.getLogger("LoadDWLogger")
+
+# ===========================
+# Partition theo ngày của fact_danh_sach_xe (RANGE COLUMNS(snapshot_date)):
+# - Tạo bảng / migrate chỉ có pmax (VALUES LESS THAN MAXVALUE)
+# - Mỗi lần load tách partition p<YYYYMMDD> = [ngày, ngày + 1) ra khỏi partition đang chứa ngày đó
+#   (phần trước ngày đó, nếu có, thành 1 partition riêng → truncate 1 ngày không đụng lịch sử)
+# - Load lại 1 ngày = TRUNCATE PARTITION p<YYYYMMDD> rồi load staging của ngày đó
+# - Partition ngày của các tháng đã cũ hơn DW_DAY_PARTITION_DAYS ngày được gộp thành 1 partition
+#   p<YYYYMM> / tháng (số partition không tăng mãi); load lại 1 ngày trong tháng đó tách lại ngày đó ra
+# ===========================
+
+FACT_TABLE = "fact_danh_sach_xe"
+
+
+def partition_name(day):
+    return f"p{day:%Y%m%d}"
+
+
+def list_partitions(cursor):
+    """[(tên, cận trên DATE hoặc None = MAXVALUE)] theo thứ tự; bảng chưa partition → []."""
+    cursor.execute("""
+        SELECT PARTITION_NAME, PARTITION_DESCRIPTION
+        FROM information_schema.PARTITIONS
+        WHERE TABLE_SCHEMA = %s AND TABLE_NAME = %s AND PARTITION_NAME IS NOT NULL
+        ORDER BY PARTITION_ORDINAL_POSITION
+    """, (config.DW_DB_NAME, FACT_TABLE))
+    partitions = []
+    for name, description in cursor.fetchall():
+        bound = None if description == "MAXVALUE" else date.fromisoformat(description.strip("'"))
+        partitions.append((name, bound))
+    return partitions
+
+
+def month_partition_name(day):
+    return f"p{day:%Y%m}"
+
+
+def _partition_sql(name, bound):
+    limit = "MAXVALUE" if bound is None else f"'{bound.isoformat()}'"
+    return f"PARTITION {name} VALUES LESS THAN ({limit})"
+
+
+def ensure_day_partition(cursor, day):
+    """Đảm bảo có partition chứa đúng 1 ngày `day`. Trả về tên partition (None nếu fact chưa partition).
+    Là DDL (commit ngầm) → gọi trước khi bắt đầu transaction load."""
+    partitions = list_partitions(cursor)
+    if not partitions:
+        return None
+
+    next_day = day + timedelta(days=1)
+    lower = None
+    for name, bound in partitions:
+        if bound is None or bound > day:
+            break
+        lower = bound
+    if lower == day and bound == next_day:
+        return name
+
+    parts = []
+    if lower is None or lower < day:
+        parts.append((partition_name(day - timedelta(days=1)), day))
+    parts.append((partition_name(day), next_day))
+    if bound is None:
+        parts.append(("pmax", None))
+    elif bound > next_day:
+        parts.append((partition_name(bound - timedelta(days=1)), bound))
+
+    cursor.execute(
+        f"ALTER TABLE {config.DW_DB_NAME}.{FACT_TABLE} REORGANIZE PARTITION {name} INTO ("
+        + ", ".join(_partition_sql(n, b) for n, b in parts) + ")")
+    logger.info("   Partition fact: tách %s → %s", name, ", ".join(n for n, _ in parts))
+    return partition_name(day)
+
+
+def truncate_day_partition(cursor, day):
+    """Xoá toàn bộ fact của 1 ngày snapshot (TRUNCATE PARTITION, không xoá từng dòng)."""
+    name = ensure_day_partition(cursor, day)
+    if name is None:
+        cursor.execute(f"DELETE FROM {config.DW_DB_NAME}.{FACT_TABLE} WHERE snapshot_date = %s", (day,))
+        logger.info("   Fact chưa partition → DELETE %s dòng của ngày %s", f"{cursor.rowcount:,}", day)
+        return
+    cursor.execute(f"ALTER TABLE {config.DW_DB_NAME}.{FACT_TABLE} TRUNCATE PARTITION {name}")
+    logger.info("   TRUNCATE PARTITION %s", name)
+
+
+def plan_month_merges(partitions, today, keep_days):
+    """Các nhóm partition liên tiếp cần gộp: [(tên partition tháng, cận trên, [tên partition cũ])].
+    Partition thuộc tháng của (cận trên - 1 ngày); chỉ gộp tháng đã hết trước ngày (today - keep_days)."""
+    cutoff = (today - timedelta(days=keep_days)).replace(day=1)
+    groups = []
+    for name, bound in partitions:
+        if bound is None or bound > cutoff:
+            break
+        month = month_partition_name(bound - timedelta(days=1))
+        if groups and groups[-1][0] == month:
+            groups[-1][1] = bound
+            groups[-1][2].append(name)
+        else:
+            groups.append([month, bound, [name]])
+    return [(month, bound, names) for month, bound, names in groups if len(names) > 1]
+
+
+def merge_old_day_partitions(cursor, today, keep_days=None):
+    """Gộp partition ngày của các tháng cũ thành partition tháng. Trả về số partition tháng đã tạo.
+    Là DDL (commit ngầm, copy dữ liệu của các partition được gộp) → gọi trước transaction load."""
+    keep_days = config.DW_DAY_PARTITION_DAYS if keep_days is None else keep_days
+    if keep_days is None:
+        return 0
+    merges = plan_month_merges(list_partitions(cursor), today, keep_days)
+    for month, bound, names in merges:
+        cursor.execute(
+            f"ALTER TABLE {config.DW_DB_NAME}.{FACT_TABLE} REORGANIZE PARTITION {', '.join(names)} "
+            f"INTO ({_partition_sql(month, bound)})")
+        logger.info("   Partition fact: gộp %d partition ngày → %s", len(names), month)
+    return len(merges)
@@ -0,0 +1,452 @@
+import re
+import hashlib
+import logging
+from datetime import datetime
+import config
+
+# Dùng chung logger với load_to_dw.py
+logger = logging.getLogger("LoadDWLogger")
+
+# ===========================
+# Load staging → DW từ Python (DW_LOAD_MODE = "python"), cùng kết quả với sp_load_dw:
+# - Mỗi dimension nạp sẵn 1 map business_key (16 byte) → surrogate_key trong RAM
+# - Key chưa có chỉ được INSERT 1 lần / dimension / lô, fact tra surrogate_key hoàn toàn trong RAM
+# - Tổng RAM cho các map giới hạn bởi DW_DIM_CACHE_MB: dimension nhỏ được nạp trước,
+#   dimension không vừa thì tra theo lô (SELECT ... WHERE business_key IN (...)) cho từng lô fact
+# - Thành viên dimension gom theo từng trang staging (DW_PY_PAGE_ROWS), không gom cả khoảng staging:
+#   phần RAM này được trừ khỏi DW_DIM_CACHE_MB trước khi chọn dimension nạp sẵn
+# ===========================
+
+# Ước lượng RAM 1 entry: bytes 16 (~49) + int (~28) + slot dict (~100)
+CACHE_ENTRY_BYTES = 180
+# Ước lượng RAM 1 thành viên / dimension của 1 dòng trong trang: key + tuple thuộc tính (dim_mau_xe
+# ~5 giá trị) + slot dict, cộng 1 entry cache của key đã tra theo lô
+MEMBER_ENTRY_BYTES = 400 + CACHE_ENTRY_BYTES
+
+RE_NON_DIGIT = re.compile(r"[^0-9]")
+
+
+def md5_key(value):
+    """business_key BINARY(16) = UNHEX(MD5(value)) bên SQL."""
+    return hashlib.md5(value.encode("utf-8")).digest()
+
+
+def to_uint(value, zero_as_null=True):
+    """NULLIF(CAST(NULLIF(REGEXP_REPLACE(x, '[^0-9]', ''), '') AS UNSIGNED), 0)."""
+    if value is None:
+        return None
+    digits = RE_NON_DIGIT.sub("", str(value))
+    if not digits:
+        return None
+    number = int(digits)
+    return None if zero_as_null and number == 0 else number
+
+
+def nullif_zero(value):
+    return None if value in (None, 0) else value
+
+
+def attr_hash(values):
+    """attr_hash SCD2 = UNHEX(MD5(CONCAT_WS(CHAR(31), IFNULL(thuộc tính, ''), ...))) bên SQL."""
+    return md5_key("\x1f".join("" if v is None else str(v) for v in values))
+
+
+# Mốc valid_to của phiên bản hiện tại (SCD Type 2)
+OPEN_VALID_TO = datetime(9999, 12, 31)
+
+
+# ===========================
+# Cột staging đọc cho DW (thứ tự = vị trí trong tuple dòng)
+# ===========================
+STAGING_COLUMNS = [
+    "id", "ten_xe", "loai_xe_nam_sx", "nam_san_xuat", "dong_co", "mau_ngoai_that", "mau_noi_that",
+    "so_cho_ngoi", "so_cua", "noi_ban", "lien_he", "xuat_xu", "tinh_trang", "kieu_dang",
+    "gia_xe_vnd", "so_km", "ngay_dang", "luot_xem", "link_xe", "link_hash",
+]
+C = {name: i for i, name in enumerate(STAGING_COLUMNS)}
+
+
+def lien_he_255(row):
+    value = row[C["lien_he"]]
+    return value[:255] if value is not None else None
+
+
+# ===========================
+# Định nghĩa 6 dimension: business key + thuộc tính lấy từ 1 dòng staging (giống sp_load_dw)
+# scd2: dim_mau_xe giữ lịch sử (SCD Type 2, so attr_hash với phiên bản hiện tại; động cơ / màu là của
+# từng tin → cột của fact); các dimension còn lại thuộc tính = chính chuỗi tạo key → chỉ cần thêm key mới
+# ===========================
+class DimensionSpec:
+    def __init__(self, table, fact_column, key_of, columns, values_of, scd2=False):
+        self.table = table
+        self.fact_column = fact_column
+        self.key_of = key_of
+        self.columns = columns
+        self.values_of = values_of
+        self.scd2 = scd2
+
+
+def _simple_dimension(table, fact_column, column, value_of=None):
+    value_of = value_of or (lambda row: row[C[column]])
+    return DimensionSpec(
+        table, fact_column,
+        key_of=lambda row: md5_key(value_of(row) or ""),
+        columns=[column],
+        values_of=lambda row: (value_of(row),),
+    )
+
+
+DIMENSIONS = [
+    DimensionSpec(
+        "dim_mau_xe", "mau_xe_sk",
+        key_of=lambda row: md5_key(f"{row[C['ten_xe']] or ''}_{row[C['nam_san_xuat']] or ''}"),
+        columns=["ten_xe", "loai_xe_nam_sx", "nam_san_xuat", "so_cho_ngoi", "so_cua"],
+        values_of=lambda row: (
+            row[C["ten_xe"]], row[C["loai_xe_nam_sx"]], to_uint(row[C["nam_san_xuat"]], zero_as_null=False),
+            to_uint(row[C["so_cho_ngoi"]]), to_uint(row[C["so_cua"]]),
+        ),
+        scd2=True,
+    ),
+    _simple_dimension("dim_vi_tri", "vi_tri_sk", "noi_ban"),
+    _simple_dimension("dim_nguoi_ban", "nguoi_ban_sk", "lien_he", lien_he_255),
+    _simple_dimension("dim_xuat_xu", "xuat_xu_sk", "xuat_xu"),
+    _simple_dimension("dim_tinh_trang", "tinh_trang_sk", "tinh_trang"),
+    _simple_dimension("dim_kieu_dang", "kieu_dang_sk", "kieu_dang"),
+]
+
+
+# ===========================
+# Map business_key → surrogate_key của 1 dimension (SCD2: phiên bản hiện tại + attr_hash của nó)
+# preloaded = True: toàn bộ dimension nằm trong RAM; False: chỉ giữ các key đã tra trong lô hiện tại
+# ===========================
+class DimensionKeyCache:
+    def __init__(self, cursor, spec, preload):
+        self.spec = spec
+        self.preloaded = preload
+        self._keys = {}
+        self._hashes = {}
+        self.lookups = 0
+        if preload:
+            cursor.execute(self.select_sql())
+            for row in cursor:
+                self._store(row)
+
+    def select_sql(self, count=None):
+        columns = "business_key, surrogate_key, attr_hash" if self.spec.scd2 else "business_key, surrogate_key"
+        where = ["is_current = 1"] if self.spec.scd2 else []
+        if count is not None:
+            where.append(f"business_key IN ({', '.join(['%s'] * count)})")
+        return f"SELECT {columns} FROM {self.spec.table}" + (f" WHERE {' AND '.join(where)}" if where else "")
+
+    def _store(self, row):
+        business_key = bytes(row[0])
+        self._keys[business_key] = row[1]
+        if self.spec.scd2:
+            self._hashes[business_key] = bytes(row[2]) if row[2] is not None else None
+
+    def __contains__(self, business_key):
+        return business_key in self._keys
+
+    def get(self, business_key):
+        return self._keys.get(business_key)
+
+    def attr_hash(self, business_key):
+        return self._hashes.get(business_key)
+
+    def add(self, row):
+        self._store(row)
+
+    def resolve(self, cursor, business_keys, batch_size):
+        """Chế độ tra theo lô: nạp surrogate_key của các key cần cho lô fact hiện tại."""
+        if self.preloaded:
+            return
+        self._keys = {}
+        self._hashes = {}
+        wanted = list(dict.fromkeys(business_keys))
+        for start in range(0, len(wanted), batch_size):
+            batch = wanted[start:start + batch_size]
+            cursor.execute(self.select_sql(len(batch)), batch)
+            for row in cursor.fetchall():
+                self._store(row)
+            self.lookups += 1
+
+    def __len__(self):
+        return len(self._keys)
+
+
+def build_caches(cursor, budget_mb=None, page_rows=None):
+    """Nạp các dimension vào RAM theo thứ tự nhỏ → lớn cho tới khi hết ngân sách
+    (sau khi trừ phần RAM của thành viên dimension gom theo 1 trang staging)."""
+    budget = (config.DW_DIM_CACHE_MB if budget_mb is None else budget_mb) * 1024 * 1024
+    page_rows = config.DW_PY_PAGE_ROWS if page_rows is None else page_rows
+    reserved = page_rows * len(DIMENSIONS) * MEMBER_ENTRY_BYTES
+    if reserved > budget:
+        logger.warning("   DW_DIM_CACHE_MB (%.1f MB) không đủ cho 1 trang %s dòng (~%.1f MB): giảm DW_PY_PAGE_ROWS",
+                       budget / 1024 / 1024, f"{page_rows:,}", reserved / 1024 / 1024)
+    budget -= reserved
+    sizes = {}
+    for spec in DIMENSIONS:
+        cursor.execute(f"SELECT COUNT(*) FROM {spec.table}")
+        sizes[spec.table] = cursor.fetchone()[0]
+
+    caches = {}
+    used = 0
+    for spec in sorted(DIMENSIONS, key=lambda s: sizes[s.table]):
+        need = sizes[spec.table] * CACHE_ENTRY_BYTES
+        preload = used + need <= budget
+        if preload:
+            used += need
+        caches[spec.table] = DimensionKeyCache(cursor, spec, preload)
+        logger.info("   Cache %-15s %8s key → %s", spec.table, f"{sizes[spec.table]:,}",
+                    "RAM" if preload else "tra DB theo lô (vượt DW_DIM_CACHE_MB)")
+    return caches
+
+
+# ===========================
+# Đọc staging thay đổi theo trang id (keyset), không giữ cả tập trong RAM
+# reload_day: các tin của ngày đó trong fact_reload_links (load lại 1 ngày) thay cho khoảng updated_at
+# ===========================
+def iter_staging_pages(cursor, since, until, page_rows, reload_day=None):
+    columns = ", ".join(f"s.{c}" for c in STAGING_COLUMNS)
+    if reload_day:
+        source = ("bonbanh_staging.xe_bonbanh s JOIN fact_reload_links r "
+                  "ON r.link_hash = s.link_hash AND r.snapshot_date = %s")
+        params = (reload_day,)
+        since = until = None
+    else:
+        source = "bonbanh_staging.xe_bonbanh s"
+        params = ()
+    last_id = 0
+    while True:
+        cursor.execute(f"""
+            SELECT {columns} FROM {source}
+            WHERE s.id > %s
+              AND (%s IS NULL OR s.updated_at > %s)
+              AND (%s IS NULL OR s.updated_at <= %s)
+            ORDER BY s.id
+            LIMIT {int(page_rows)}
+        """, params + (last_id, since, since, until, until))
+        rows = cursor.fetchall()
+        if not rows:
+            return
+        yield rows
+        last_id = rows[-1][C["id"]]
+
+
+def page_members(rows):
+    """key → (thuộc tính dòng cuối) của từng dimension trong 1 trang, theo thứ tự xuất hiện đầu tiên
+    (dict giữ thứ tự chèn; gán lại giá trị không đổi vị trí)."""
+    members = {spec.table: {} for spec in DIMENSIONS}
+    for row in rows:
+        for spec in DIMENSIONS:
+            members[spec.table][spec.key_of(row)] = spec.values_of(row)
+    return members
+
+
+def max_surrogate_key(cursor, table):
+    cursor.execute(f"SELECT COALESCE(MAX(surrogate_key), 0) FROM {table}")
+    return cursor.fetchone()[0]
+
+
+def reopen_reverted_versions(cursor, spec, cache, keys, hashes, batch_size, now, mark):
+    """SCD2: mẫu xe đã đóng phiên bản cũ ở trang trước, tới trang sau lại về đúng thuộc tính cũ
+    → xoá phiên bản tạo trong lần load này, mở lại phiên bản cũ (như sp_merge_dim_mau_xe chỉ so dòng cuối).
+    Trả về số phiên bản được mở lại."""
+    reverted = []
+    for start in range(0, len(keys), batch_size):
+        batch = keys[start:start + batch_size]
+        cursor.execute(
+            f"SELECT business_key, surrogate_key, attr_hash FROM {spec.table} "
+            f"WHERE is_current = 0 AND valid_to = %s AND surrogate_key <= %s "
+            f"AND business_key IN ({', '.join(['%s'] * len(batch))})", [now, mark] + batch)
+        for business_key, surrogate_key, old_hash in cursor.fetchall():
+            business_key = bytes(business_key)
+            if old_hash is not None and bytes(old_hash) == hashes[business_key]:
+                reverted.append((business_key, cache.get(business_key), surrogate_key))
+    for start in range(0, len(reverted), batch_size):
+        batch = reverted[start:start + batch_size]
+        placeholders = ", ".join(["%s"] * len(batch))
+        cursor.execute(f"DELETE FROM {spec.table} WHERE surrogate_key IN ({placeholders})",
+                       [new_sk for _, new_sk, _ in batch])
+        cursor.execute(f"UPDATE {spec.table} SET is_current = 1, valid_to = %s "
+                       f"WHERE surrogate_key IN ({placeholders})", [OPEN_VALID_TO] + [old_sk for _, _, old_sk in batch])
+    for business_key, _, old_sk in reverted:
+        cache.add((business_key, old_sk, hashes[business_key]))
+    return len(reverted)
+
+
+def upsert_dimension(cursor, spec, cache, members, batch_size, now, versioned=True, mark=None):
+    """Thêm key mới (SCD2: + phiên bản mới cho key đổi attr_hash) của 1 trang staging, cập nhật cache.
+    SCD2, mark = MAX(surrogate_key) trước lần load: phiên bản hiện tại > mark là do trang trước của cùng
+    lần load tạo → sửa thuộc tính tại chỗ thay vì thêm phiên bản (1 phiên bản / mẫu xe / lần load, thuộc
+    tính của dòng cuối như sp_merge_dim_mau_xe).
+    versioned = False (load lại 1 ngày): SCD2 chỉ thêm key mới, giữ nguyên phiên bản hiện tại.
+    Trả về (số phiên bản / key thêm mới, số phiên bản bị đóng)."""
+    if not cache.preloaded:
+        cache.resolve(cursor, list(members), batch_size)
+    closed = []
+    if spec.scd2:
+        hashes = {key: attr_hash(values) for key, values in members.items()}
+        changed = [key for key in members
+                   if versioned and cache.get(key) is not None and cache.attr_hash(key) != hashes[key]]
+        rewritten = [key for key in changed if mark is not None and cache.get(key) > mark]
+        changed = set(changed) - set(rewritten)
+        closed = [cache.get(key) for key in members if key in changed]
+        # Giữ thứ tự xuất hiện đầu tiên (members là dict theo thứ tự chèn)
+        new_keys = [key for key in members if cache.get(key) is None or key in changed]
+    else:
+        rewritten = []
+        new_keys = [key for key in members if cache.get(key) is None]
+
+    reopened = 0
+    if rewritten:
+        assignments = ", ".join(f"{c} = %s" for c in spec.columns)
+        rows = [members[key] + (hashes[key], cache.get(key)) for key in rewritten]
+        for start in range(0, len(rows), batch_size):
+            cursor.executemany(f"UPDATE {spec.table} SET {assignments}, attr_hash = %s WHERE surrogate_key = %s",
+                               rows[start:start + batch_size])
+        for key in rewritten:
+            cache.add((key, cache.get(key), hashes[key]))
+        reopened = reopen_reverted_versions(cursor, spec, cache, rewritten, hashes, batch_size, now, mark)
+    if not new_keys:
+        return -reopened, -reopened
+
+    for start in range(0, len(closed), batch_size):
+        batch = closed[start:start + batch_size]
+        cursor.execute(
+            f"UPDATE {spec.table} SET is_current = 0, valid_to = %s "
+            f"WHERE surrogate_key IN ({', '.join(['%s'] * len(batch))})", [now] + batch)
+
+    columns = ["business_key"] + spec.columns
+    if spec.scd2:
+        columns += ["attr_hash", "valid_from", "valid_to", "is_current"]
+        rows = [(key,) + members[key] + (hashes[key], now, OPEN_VALID_TO, 1) for key in new_keys]
+        sql = f"INSERT INTO {spec.table} ({', '.join(columns)}) VALUES ({', '.join(['%s'] * len(columns))})"
+    else:
+        rows = [(key,) + members[key] for key in new_keys]
+        updates = ", ".join(f"{c} = VALUES({c})" for c in spec.columns)
+        sql = (f"INSERT INTO {spec.table} ({', '.join(columns)}) "
+               f"VALUES ({', '.join(['%s'] * len(columns))}) ON DUPLICATE KEY UPDATE {updates}")
+    for start in range(0, len(rows), batch_size):
+        cursor.executemany(sql, rows[start:start + batch_size])
+
+    # surrogate_key của key / phiên bản mới (AUTO_INCREMENT của multi-row INSERT không chắc liên tục)
+    for start in range(0, len(new_keys), batch_size):
+        batch = new_keys[start:start + batch_size]
+        cursor.execute(cache.select_sql(len(batch)), batch)
+        for row in cursor.fetchall():
+            cache.add(row)
+    return len(new_keys) - reopened, len(closed) - reopened
+
+
+def load_dimensions(cursor, caches, since, until, page_rows, batch_size, now, reload_day=None):
+    """Lượt 1: đọc staging theo trang, thêm thành viên dimension của từng trang (RAM giới hạn theo trang).
+    Trả về số dòng staging đã đọc."""
+    versioned = not reload_day
+    marks = {spec.table: max_surrogate_key(cursor, spec.table) for spec in DIMENSIONS if spec.scd2}
+    counts = {spec.table: [0, 0] for spec in DIMENSIONS}
+    total = 0
+    for rows in iter_staging_pages(cursor, since, until, page_rows, reload_day):
+        total += len(rows)
+        members = page_members(rows)
+        for spec in DIMENSIONS:
+            inserted, closed = upsert_dimension(cursor, spec, caches[spec.table], members[spec.table], batch_size,
+                                                now, versioned, marks.get(spec.table))
+            counts[spec.table][0] += inserted
+            counts[spec.table][1] += closed
+    for spec in DIMENSIONS:
+        inserted, closed = counts[spec.table]
+        logger.info("   %-15s thêm %s dòng, đóng %s phiên bản cũ", spec.table, f"{inserted:,}", f"{closed:,}")
+    return total
+
+
+FACT_SQL = """
+    INSERT INTO fact_danh_sach_xe (
+        mau_xe_sk, vi_tri_sk, nguoi_ban_sk, xuat_xu_sk, tinh_trang_sk, kieu_dang_sk,
+        gia_xe, so_km, ngay_dang, luot_xem, dong_co, mau_ngoai_that, mau_noi_that,
+        link_xe, link_hash, snapshot_date, is_current
+    ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, 1)
+    ON DUPLICATE KEY UPDATE
+        mau_xe_sk = VALUES(mau_xe_sk),
+        vi_tri_sk = VALUES(vi_tri_sk),
+        nguoi_ban_sk = VALUES(nguoi_ban_sk),
+        xuat_xu_sk = VALUES(xuat_xu_sk),
+        tinh_trang_sk = VALUES(tinh_trang_sk),
+        kieu_dang_sk = VALUES(kieu_dang_sk),
+        gia_xe = VALUES(gia_xe),
+        so_km = VALUES(so_km),
+        ngay_dang = VALUES(ngay_dang),
+        luot_xem = VALUES(luot_xem),
+        dong_co = VALUES(dong_co),
+        mau_ngoai_that = VALUES(mau_ngoai_that),
+        mau_noi_that = VALUES(mau_noi_that),
+        link_xe = VALUES(link_xe),
+        is_current = 1,
+        loaded_at = CURRENT_TIMESTAMP
+"""
+
+
+def retire_old_snapshots(cursor, since, until, snapshot_date, grain):
+    """Giống cuối sp_load_fact: bản cũ của tin vừa load → grain 'listing' xoá thẳng, 'daily' is_current = 0
+    (chỉ các tin trong khoảng staging, không quét cả bảng fact)."""
+    if grain == "listing":
+        sql = """
+            DELETE f FROM fact_danh_sach_xe f
+            JOIN bonbanh_staging.xe_bonbanh s ON s.link_hash = f.link_hash
+            WHERE (%s IS NULL OR s.updated_at > %s)
+              AND (%s IS NULL OR s.updated_at <= %s)
+              AND f.snapshot_date < %s
+        """
+    else:
+        sql = """
+            UPDATE fact_danh_sach_xe f
+            JOIN bonbanh_staging.xe_bonbanh s ON s.link_hash = f.link_hash
+            SET f.is_current = 0
+            WHERE (%s IS NULL OR s.updated_at > %s)
+              AND (%s IS NULL OR s.updated_at <= %s)
+              AND f.snapshot_date < %s AND f.is_current = 1
+        """
+    cursor.execute(sql, (since, since, until, until, snapshot_date))
+
+
+def load_facts(cursor, caches, since, until, snapshot_date, page_rows, batch_size, reload_day=None):
+    """Lượt 2: tra surrogate_key trong RAM (hoặc theo lô) rồi upsert fact theo (link_hash, snapshot_date)."""
+    count = 0
+    for rows in iter_staging_pages(cursor, since, until, page_rows, reload_day):
+        keys = {spec.table: [spec.key_of(row) for row in rows] for spec in DIMENSIONS}
+        for spec in DIMENSIONS:
+            caches[spec.table].resolve(cursor, keys[spec.table], batch_size)
+
+        facts = []
+        for i, row in enumerate(rows):
+            facts.append(tuple(caches[spec.table].get(keys[spec.table][i]) for spec in DIMENSIONS) + (
+                nullif_zero(row[C["gia_xe_vnd"]]), nullif_zero(row[C["so_km"]]), row[C["ngay_dang"]],
+                nullif_zero(row[C["luot_xem"]]), row[C["dong_co"]], row[C["mau_ngoai_that"]],
+                row[C["mau_noi_that"]], row[C["link_xe"]], row[C["link_hash"]], snapshot_date,
+            ))
+        for start in range(0, len(facts), batch_size):
+            cursor.executemany(FACT_SQL, facts[start:start + batch_size])
+        count += len(facts)
+    return count
+
+
+def load_dw(cursor, since, until, snapshot_date, grain, reload_day=None):
+    """Load staging (since < updated_at <= until) → DW. Trả về số dòng staging đã xử lý.
+    reload_day: giống sp_reload_fact_day - các tin của ngày đó trong fact_reload_links, không đóng bản cũ
+    (load_to_dw tính lại is_current), dim_mau_xe không tạo phiên bản SCD2 mới. Không commit: load_to_dw commit cùng watermark."""
+    page_rows = config.DW_PY_PAGE_ROWS
+    batch_size = config.STAGING_BULK_INSERT_BATCH
+
+    now = datetime.now().replace(microsecond=0)
+    caches = build_caches(cursor, page_rows=page_rows)
+    total = load_dimensions(cursor, caches, since, until, page_rows, batch_size, now, reload_day)
+
+    count = load_facts(cursor, caches, since, until, snapshot_date, page_rows, batch_size, reload_day)
+    if not reload_day:
+        retire_old_snapshots(cursor, since, until, snapshot_date, grain)
+    lookups = sum(cache.lookups for cache in caches.values())
+    if lookups:
+        logger.info("   Tra dimension theo lô: %d câu SELECT", lookups)
+    if count != total:
+        logger.warning("   Số dòng staging đổi giữa 2 lượt đọc: %s → %s", f"{total:,}", f"{count:,}")
+    return count
@@ -1,11 +1,20 @@
 import requests
-from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
 import time
 import os
-import re
 import csv
+import queue
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, ProcessPoolExecutor
 from datetime import datetime
 import logging
+import argparse
+import config
+from crawl_archive import HtmlArchive, ArchiveReader
+from crawl_cache import ResponseCache
+from crawl_parser import parse_list_page, parse_detail_html
+from crawl_state import SeenIndex, CrawlFrontier
+from crawl_throttle import HostRateLimiter, AdaptiveRequester
 
 # ===========================
 # 1. Khởi tạo môi trường:
@@ -33,183 +42,409 @@ logger = logging.getLogger("GetDataLogger")
 # 2. Kiểm tra và tạo CSV:
 # Nếu CSV chưa tồn tại → Tạo header → file + ghi NOUQUYEN (Không dùng crawl)
 # ===========================
-BASE_URL = "https://bonbanh.com"
-HEADERS = {"User-Agent": "Mozilla/5.0"}
+BASE_URL = config.CRAWL_BASE_URL
+HEADERS = {"User-Agent": "Mozilla/5.0", "Accept-Encoding": "gzip, deflate"}
 
 DATA_DIR = "data"
 os.makedirs(DATA_DIR, exist_ok=True)
 today_str = datetime.now().strftime("%Y-%m-%d")
 CSV_FILE = os.path.join(DATA_DIR, f"bonbanh_raw_{today_str}.csv")
+CHECKPOINT_FILE = config.CRAWL_CHECKPOINT_FILE_PATTERN.format(today=today_str)
 
 if not os.path.exists(CSV_FILE):
     with open(CSV_FILE, "w", encoding="utf-8-sig", newline="") as f:
         writer = csv.writer(f)
-        writer.writerow([
-            "Loại xe + Năm SX", "Tên xe", "Giá xe_raw", "Nơi bán", "Liên hệ", "Link xe",
-            "Ngày đăng", "Lượt xem", "Số Km đã đi:", "Tình trạng:", "Xuất xứ:", "Kiểu dáng:",
-            "Động cơ:", "Màu ngoại thất:", "Màu nội thất:", "Số chỗ ngồi:", "Số cửa:", "Năm sản xuất:"
-        ])
+        writer.writerow(config.CSV_COLUMNS)
+
+# ===========================
+# Session dùng chung: giữ kết nối keep-alive (pool đủ cho mọi luồng) + nén gzip
+# ===========================
+def make_session():
+    session = requests.Session()
+    session.headers.update(HEADERS)
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=max(10, config.CRAWL_MAX_WORKERS))
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+session = make_session()
+# Token bucket theo host (trần tốc độ) + retry/backoff/AIMD/circuit breaker
+requester = AdaptiveRequester(
+    session,
+    HostRateLimiter(config.CRAWL_RATE_PER_HOST, config.CRAWL_BURST_PER_HOST),
+    max_retries=config.CRAWL_MAX_RETRIES,
+    backoff_base=config.CRAWL_BACKOFF_BASE,
+    backoff_max=config.CRAWL_BACKOFF_MAX,
+    min_concurrency=1,
+    max_concurrency=config.CRAWL_MAX_WORKERS,
+    breaker_threshold=config.CRAWL_BREAKER_THRESHOLD,
+    breaker_cooldown=config.CRAWL_BREAKER_COOLDOWN,
+)
+response_cache = (
+    ResponseCache(config.CRAWL_CACHE_DIR, config.CRAWL_CACHE_MAX_MB * 1024 * 1024)
+    if config.CRAWL_CACHE_ENABLED else None
+)
 
 # ===========================
 # 4. Tải trang danh sách:
-# Goi get_page(url), requests.get(url, headers, timeout=15), Trả về HTML của trang danh sách
+# Goi get_page(url), requester.get(url, timeout=15), Trả về HTML của trang danh sách
+# - Có cache: gửi If-None-Match / If-Modified-Since, 304 → trả body đã lưu
+# - 429/5xx/lỗi mạng được requester retry; hết lượt retry mới trả về ""
 # ===========================
 def get_page(url):
     try:
-        resp = requests.get(url, headers=HEADERS, timeout=15)
+        entry = response_cache.get(url) if response_cache else None
+        headers = ResponseCache.conditional_headers(entry) if entry else None
+
+        resp = requester.get(url, headers=headers, timeout=15)
+        if resp.status_code == 304 and entry:
+            response_cache.hit(url)
+            return entry["body"]
         resp.raise_for_status()
+
+        if response_cache:
+            response_cache.store(url, resp)
         return resp.text
     except Exception as e:
         logger.exception("Lỗi khi tải URL %s: %s", url, e)
         return ""
 
 # ===========================
-# 5. Parse danh sách xe:
-# Dùng BeautifulSoup parse soup, Mỗi xe -1 dict, list[dict]
+# 5. Parse danh sách xe: crawl_parser.parse_list_page (backend lxml, XPath biên dịch sẵn)
+# Mỗi xe -1 dict, list[dict]
 # ===========================
-def parse_list_page(html):
-    soup = BeautifulSoup(html, "html.parser")
-    cars = []
-    for item in soup.select(".car-item"):
-        try:
-            a_tag = item.select_one("a")
-            link = ""
-            if a_tag and a_tag.get("href"):
-                href = a_tag["href"].strip()
-                if not href.startswith("/"):
-                    href = "/" + href
-                link = BASE_URL + href
-
-            cb1 = item.select_one(".cb1")
-            loai_xe = cb1.contents[0].strip() if cb1 and cb1.contents else ""
-            nam_sx = cb1.select_one("b").get_text(strip=True) if cb1 and cb1.select_one("b") else ""
-            info = f"{loai_xe} - {nam_sx}".strip(" -")
-
-            ten_xe = item.select_one(".cb2 b").get_text(strip=True) if item.select_one(".cb2 b") else ""
-            gia = item.select_one(".cb3 b").get_text(strip=True) if item.select_one(".cb3 b") else ""
-            noi_ban = item.select_one(".cb4 b").get_text(strip=True) if item.select_one(".cb4 b") else ""
-            lien_he = item.select_one(".cb7").get_text(" ", strip=True) if item.select_one(".cb7") else ""
-
-            cars.append({
-                "Loại xe + Năm SX": info,
-                "Tên xe": ten_xe,
-                "Giá xe_raw": gia,
-                "Nơi bán": noi_ban,
-                "Liên hệ": lien_he,
-                "Link xe": link,
-            })
-
-        except Exception as e:
-            logger.exception("Lỗi parse list item: %s", e)
-            continue
-
-    return cars
 
 # ===========================
 # 6. Duyệt từng xe trong danh sách: Sách CAR_LIST
 # 7. Lấy trang chi tiết xe, parse detail_page
 # - GET HTML chi tiết
-# - Regex: Ngay dang, Luot xem
-# - Lấy thông tin tu mail_parent row
-# - Trả về dict
+# - crawl_parser.parse_detail_html: Regex Ngay dang, Luot xem + thông tin từ mail_parent row
+# - Trả về dict ({} nếu không tải được trang)
 # ===========================
 def parse_detail_page(url):
     try:
         html = get_page(url)
-        soup = BeautifulSoup(html, "html.parser")
+        if not html:
+            return {}
+        return parse_detail_html(html)
+
+    except Exception as e:
+        logger.exception("Lỗi khi lấy chi tiết %s: %s", url, e)
+        return {}
 
-        notes = soup.find("div", class_="notes")
-        notes_text = notes.get_text(strip=True) if notes else ""
+# ===========================
+# Chỉ mục tin đã thấy: lần đầu chạy thì nạp từ các CSV của những ngày trước
+# ===========================
+def open_seen_index():
+    if not config.CRAWL_SEEN_INDEX_ENABLED:
+        return None
+    index = SeenIndex(config.CRAWL_SEEN_INDEX_FILE, config.CRAWL_SEEN_REFRESH_DAYS)
+    if index.count() == 0:
+        seeded = index.seed_from_csv(os.path.join(DATA_DIR, "bonbanh_raw_*.csv"), exclude=CSV_FILE)
+        logger.info("Khởi tạo chỉ mục tin đã thấy từ CSV cũ: %d tin", seeded)
+    return index
+
+# ===========================
+# Pipeline crawl 3 tầng, nối bằng hàng đợi có giới hạn:
+# - Fetch: ThreadPoolExecutor (CRAWL_MAX_WORKERS luồng, I/O-bound) tải HTML chi tiết
+# - Parse: ProcessPoolExecutor (CRAWL_PARSE_PROCESSES tiến trình, CPU-bound, tránh GIL)
+# - Ghi: 1 luồng writer duy nhất ghép list + detail, đẩy vào CsvBatchWriter đúng thứ tự danh sách
+# Hàng đợi writer tối đa CRAWL_PIPELINE_MAX_INFLIGHT tin → submit() bị chặn khi writer
+# chưa theo kịp (backpressure), bộ nhớ không tăng theo số trang đang chờ.
+# ===========================
+class CrawlPipeline:
+    def __init__(self, csv_writer, seen_index=None, archive=None, fetch_workers=None, parse_processes=None,
+                 max_inflight=None):
+        self.csv_writer = csv_writer
+        self.seen_index = seen_index
+        self.archive = archive
+        parse_processes = config.CRAWL_PARSE_PROCESSES if parse_processes is None else parse_processes
+        self.fetch_pool = ThreadPoolExecutor(max_workers=fetch_workers or config.CRAWL_MAX_WORKERS)
+        self.parse_pool = ProcessPoolExecutor(max_workers=parse_processes) if parse_processes > 0 else None
+        self.queue = queue.Queue(maxsize=max_inflight or config.CRAWL_PIPELINE_MAX_INFLIGHT)
+        self.written = 0
+        self.fetched = 0
+        self.writer = threading.Thread(target=self._write_loop, name="csv-writer", daemon=True)
+        self.writer.start()
 
-        ngay_dang = ""
-        luot_xem = ""
+    def submit(self, car):
+        detail_data = self.seen_index.lookup(car) if self.seen_index else None
+        result = Future()
+        if detail_data is not None:
+            result.set_result(detail_data)
+            fetched = False
+        else:
+            fetch = self.fetch_pool.submit(self._fetch, car["Link xe"])
+            fetch.add_done_callback(lambda f: self._on_fetched(car, f, result))
+            fetched = True
+        self.queue.put((car, result, fetched))  # Chặn khi hàng đợi đầy (backpressure)
 
-        if notes_text:
-            m1 = re.search(r"Đăng\s+ngày\s+(\d{1,2}/\d{1,2}/\d{4})", notes_text)
-            if m1:
-                ngay_dang = m1.group(1)
-            m2 = re.search(r"Xem\s+(\d+)\s+lượt", notes_text)
-            if m2:
-                luot_xem = m2.group(1)
+    def _fetch(self, link):
+        logger.info("→ Lấy chi tiết: %s", link)
+        html = get_page(link)
+        if html and self.archive:
+            self.archive.append("detail", link, html)
+        return html
 
-        details = {}
-        for row in soup.select("div#mail_parent.row"):
-            label = row.find("label")
-            value = row.find("span", class_="inp")
-            if label and value:
-                details[label.get_text(strip=True)] = value.get_text(strip=True)
+    def _on_fetched(self, car, fetch, result):
+        html = fetch.exception() is None and fetch.result()
+        if not html:
+            result.set_result({})
+        elif self.parse_pool:
+            parse = self.parse_pool.submit(parse_detail_html, html)
+            parse.add_done_callback(lambda f: self._on_parsed(car, f, result))
+        else:
+            self._on_parsed(car, None, result, html)
 
-        data = {"Ngày đăng": ngay_dang, "Lượt xem": luot_xem}
-        data.update(details)
+    def _on_parsed(self, car, parse, result, html=None):
+        try:
+            result.set_result(parse.result() if parse else parse_detail_html(html))
+        except Exception as e:
+            logger.exception("Lỗi khi lấy chi tiết %s: %s", car["Link xe"], e)
+            result.set_result({})
 
-        return data
+    def _write_loop(self):
+        while True:
+            item = self.queue.get()
+            try:
+                if item is None:
+                    return
+                car, result, fetched = item
+                detail_data = result.result()
+                if fetched:
+                    self.fetched += 1
+                    if self.seen_index and detail_data:
+                        self.seen_index.remember(car, detail_data)
+                # 8. Ghép Detail va List - UPDATE DICT XE card.update(detail_data)
+                car.update(detail_data)
+                self.csv_writer.write(car)
+                self.written += 1
+            except Exception as e:
+                logger.exception("Lỗi writer: %s", e)
+            finally:
+                self.queue.task_done()
 
-    except Exception as e:
-        logger.exception("Lỗi khi lấy chi tiết %s: %s", url, e)
-        return {}
+    def join(self):
+        """Chờ mọi tin đã submit được ghi xong và fsync CSV (dùng ở ranh giới batch / checkpoint)."""
+        self.queue.join()
+        self.csv_writer.checkpoint()
+
+    def close(self):
+        self.queue.put(None)
+        self.writer.join()
+        self.fetch_pool.shutdown()
+        if self.parse_pool:
+            self.parse_pool.shutdown()
 
 # ===========================
-# 9. GHI CSV (append ngay) append.csv(car)
+# 9. GHI CSV: 1 writer mở file suốt phiên crawl, gom dòng vào buffer
+# - Flush khi đủ CRAWL_CSV_FLUSH_ROWS dòng hoặc quá CRAWL_CSV_FLUSH_SECONDS giây
+# - checkpoint(): flush + fsync (gọi trước khi ghi checkpoint frontier)
+# - An toàn khi gọi từ nhiều luồng (lock)
 # ===========================
-def append_csv(row_dict):
-    try:
-        with open(CSV_FILE, "a", encoding="utf-8-sig", newline="") as f:
-            writer = csv.writer(f)
-            writer.writerow([
-                row_dict.get("Loại xe + Năm SX", ""),
-                row_dict.get("Tên xe", ""),
-                row_dict.get("Giá xe_raw", ""),
-                row_dict.get("Nơi bán", ""),
-                row_dict.get("Liên hệ", ""),
-                row_dict.get("Link xe", ""),
-                row_dict.get("Ngày đăng", ""),
-                row_dict.get("Lượt xem", ""),
-                row_dict.get("Số Km đã đi:", ""),
-                row_dict.get("Tình trạng:", ""),
-                row_dict.get("Xuất xứ:", ""),
-                row_dict.get("Kiểu dáng:", ""),
-                row_dict.get("Động cơ:", ""),
-                row_dict.get("Màu ngoại thất:", ""),
-                row_dict.get("Màu nội thất:", ""),
-                row_dict.get("Số chỗ ngồi:", ""),
-                row_dict.get("Số cửa:", ""),
-                row_dict.get("Năm sản xuất:", "")
-            ])
-    except Exception as e:
-        logger.exception("Lỗi khi ghi CSV: %s", e)
+class CsvBatchWriter:
+    def __init__(self, path, flush_rows=None, flush_seconds=None):
+        self.path = path
+        self.flush_rows = flush_rows or config.CRAWL_CSV_FLUSH_ROWS
+        self.flush_seconds = flush_seconds or config.CRAWL_CSV_FLUSH_SECONDS
+        self._file = open(path, "a", encoding="utf-8-sig", newline="")
+        self._writer = csv.writer(self._file)
+        self._buffer = []
+        self._lock = threading.Lock()
+        self._last_flush = time.monotonic()
+        self._closed = threading.Event()
+        self._timer = threading.Thread(target=self._flush_periodically, name="csv-flush", daemon=True)
+        self._timer.start()
+
+    @staticmethod
+    def to_row(row_dict):
+        return [row_dict.get(col, "") for col in config.CSV_COLUMNS]
+
+    def write(self, row_dict):
+        with self._lock:
+            self._buffer.append(self.to_row(row_dict))
+            if len(self._buffer) >= self.flush_rows:
+                self._flush()
+
+    def _flush(self):
+        """Ghi buffer ra file (gọi khi đang giữ lock)."""
+        if self._buffer:
+            try:
+                self._writer.writerows(self._buffer)
+                self._file.flush()
+            except Exception as e:
+                logger.exception("Lỗi khi ghi CSV: %s", e)
+            self._buffer = []
+        self._last_flush = time.monotonic()
+
+    def _flush_periodically(self):
+        while not self._closed.wait(self.flush_seconds):
+            with self._lock:
+                if time.monotonic() - self._last_flush >= self.flush_seconds:
+                    self._flush()
+
+    def flush(self):
+        with self._lock:
+            self._flush()
+
+    def checkpoint(self):
+        with self._lock:
+            self._flush()
+            os.fsync(self._file.fileno())
+
+    def close(self):
+        self._closed.set()
+        self._timer.join()
+        self.checkpoint()
+        self._file.close()
+
+# ===========================
+# Crawl 1 batch (các tin của 1 trang danh sách): lấy chi tiết, ghép, ghi CSV
+# Trả về (số bản ghi đã ghi, True nếu toàn bộ tin đều đã thấy và không đổi)
+# ===========================
+def crawl_batch(cars, pipeline):
+    written_before, fetched_before = pipeline.written, pipeline.fetched
+    for car in cars:
+        pipeline.submit(car)
+    pipeline.join()
+    all_seen = pipeline.seen_index is not None and bool(cars) and pipeline.fetched == fetched_before
+    return pipeline.written - written_before, all_seen
+
+def links_in_csv():
+    """Các link đã có trong CSV hôm nay (để không ghi trùng khi chạy tiếp từ checkpoint)."""
+    with open(CSV_FILE, "r", encoding="utf-8-sig", newline="") as f:
+        return {row.get("Link xe") for row in csv.DictReader(f)}
 
 # ===========================
 # Hàm main
 # ===========================
 def main():
     all_count = 0
+    seen_index = open_seen_index()
+    csv_writer = CsvBatchWriter(CSV_FILE)
+    archive = HtmlArchive(config.CRAWL_ARCHIVE_DIR, today_str) if config.CRAWL_ARCHIVE_ENABLED else None
+    pipeline = CrawlPipeline(csv_writer, seen_index, archive)
+    frontier = CrawlFrontier(CHECKPOINT_FILE, config.CRAWL_MAX_PAGES, config.CRAWL_STOP_AFTER_SEEN_PAGES)
+
+    # Chạy tiếp từ checkpoint: hoàn tất trang đang dở trước
+    if frontier.resumed:
+        logger.info("Chạy tiếp từ checkpoint %s (trang cuối đã xong: %d)",
+                    CHECKPOINT_FILE, frontier.state["last_page_done"])
+        if frontier.pending:
+            done = links_in_csv()
+            cars = [car for car in frontier.pending if car.get("Link xe") not in done]
+            logger.info("→ Trang %d còn %d/%d tin chưa ghi", frontier.current_page, len(cars), len(frontier.pending))
+            count, all_seen = crawl_batch(cars, pipeline)
+            all_count += count
+            frontier.finish_batch(frontier.current_page, all_seen)
 
     # 3. Tạo URL cho trang
-    for page in range(1, 2):
+    finished = True
+    for page in frontier.pages():
         url = f"{BASE_URL}/oto/page,{page}/" if page > 1 else BASE_URL
         logger.info("Đang tải trang danh sách %d... %s", page, url)
 
         html = get_page(url)
+        if not html:
+            # Lỗi tải trang: giữ checkpoint để lần sau chạy tiếp từ trang này
+            logger.error("Không tải được trang %d → dừng, giữ checkpoint.", page)
+            finished = False
+            break
+        if archive:
+            archive.append("list", url, html)
+
         car_list = parse_list_page(html)
         logger.info("➡ Tìm thấy %d xe trên trang %d", len(car_list), page)
+        if not car_list:
+            logger.info("Trang %d rỗng → hết danh sách.", page)
+            break
 
-        for car in car_list:
-            link = car.get("Link xe")
-            if link:
-                logger.info("→ Lấy chi tiết: %s", link)
-                detail_data = parse_detail_page(link)
-                # 8. Ghép Detail va List - UPDATE DICT XE card.update(detail_data)
-                car.update(detail_data)
-                append_csv(car)
-                all_count += 1
-                # 10. Time sleep(1) Tránh bi block all_count +=1
-                time.sleep(1)
+        # 10. Tốc độ request do requester (token bucket + AIMD + circuit breaker) kiểm soát trong get_page
+        cars_with_link = [car for car in car_list if car.get("Link xe")]
+        frontier.start_batch(page, cars_with_link)
+        count, all_seen = crawl_batch(cars_with_link, pipeline)
+        all_count += count
+        frontier.finish_batch(page, all_seen)
+
+        if frontier.should_stop():
+            logger.info("Gặp %d trang liên tiếp toàn tin đã thấy → dừng.", frontier.state["seen_streak"])
+            break
+
+    pipeline.close()
+    csv_writer.close()
+    if archive:
+        archive.close()
+    if finished:
+        frontier.complete()
 
     # 11. Hoàn tất trang crawl: Log tổng số bản ghi đã crawl
     logger.info("🎉 Đã crawl + ghi CSV %d bản ghi.", all_count)
+    if seen_index:
+        logger.info("Chỉ mục tin đã thấy: dùng lại %d, tải chi tiết %d",
+                    pipeline.written - pipeline.fetched, pipeline.fetched)
+        seen_index.close()
+    stats = requester.stats
+    logger.info("Request: %d lần gửi, %d thành công, %d retry, %d lần bị throttle (429/503), "
+                "%d thất bại, circuit breaker mở %d lần, hiệu dụng %.2f request/giây",
+                stats["requests"], stats["ok"], stats["retries"], stats["throttled"],
+                stats["failed"], stats["breaker_opens"], requester.requests_per_second())
+    if response_cache:
+        stats = response_cache.stats
+        logger.info("Cache HTTP: %d hit (304), %d miss, %d lưu mới, %d bị xoá (eviction)",
+                    stats["hits"], stats["misses"], stats["stores"], stats["evictions"])
+
+# ===========================
+# Parse lại 1 ngày từ kho HTML (không gửi request nào):
+# - Duyệt các trang danh sách đã lưu theo thứ tự crawl
+# - Lấy trang chi tiết trong kho (ngày đó hoặc ngày trước gần nhất), parse bằng process pool
+# - Ghi ra file tạm rồi thay thế data/bonbanh_raw_<ngày>.csv
+# ===========================
+def reparse(day):
+    reader = ArchiveReader(config.CRAWL_ARCHIVE_DIR, day)
+    csv_path = os.path.join(DATA_DIR, f"bonbanh_raw_{day}.csv")
+    tmp_path = csv_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8-sig", newline="") as f:
+        csv.writer(f).writerow(config.CSV_COLUMNS)
+
+    csv_writer = CsvBatchWriter(tmp_path)
+    parse_pool = ProcessPoolExecutor(config.CRAWL_PARSE_PROCESSES) if config.CRAWL_PARSE_PROCESSES > 0 else None
+    count = missing = 0
+    try:
+        for html in reader.list_pages():
+            cars = [car for car in parse_list_page(html) if car.get("Link xe")]
+            htmls = [reader.detail(car["Link xe"]) for car in cars]
+            found = [h for h in htmls if h]
+            parsed = iter(parse_pool.map(parse_detail_html, found, chunksize=8) if parse_pool
+                          else map(parse_detail_html, found))
+            for car, detail_html in zip(cars, htmls):
+                if detail_html:
+                    car.update(next(parsed))
+                else:
+                    missing += 1
+                csv_writer.write(car)
+                count += 1
+    finally:
+        csv_writer.close()
+        reader.close()
+        if parse_pool:
+            parse_pool.shutdown()
+
+    os.replace(tmp_path, csv_path)
+    logger.info("🎉 Đã parse lại %d bản ghi từ kho HTML → %s (%d tin không có trang chi tiết trong kho)",
+                count, csv_path, missing)
 
 # ===========================
 # Chạy script
+# - python get_data.py                  → crawl
+# - python get_data.py reparse [--day]  → dựng lại CSV của ngày từ kho HTML
 # ===========================
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    arg_parser = argparse.ArgumentParser(description="Crawl bonbanh.com → CSV raw")
+    arg_parser.add_argument("mode", nargs="?", choices=["crawl", "reparse"], default="crawl")
+    arg_parser.add_argument("--day", default=today_str, help="Ngày cần parse lại (YYYY-MM-DD)")
+    args = arg_parser.parse_args()
+
+    if args.mode == "reparse":
+        reparse(args.day)
+    else:
+        main()
\ No newline at end of file
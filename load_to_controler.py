@@ -86,4 +86,23 @@ class ETLLogger:
         if self.cursor:
             self.cursor.close()
         if self.conn and self.conn.is_connected():
-            self.conn.close()
\ No newline at end of file
+            self.conn.close()
+
+
+# ===========================
+# Watermark cho các bước load incremental (bảng bonbanh_control.etl_watermark)
+# Dùng cursor của chính bước load → ghi watermark cùng transaction với dữ liệu
+# ===========================
+def get_watermark(cursor, name):
+    """Mốc đã load xong lần trước (None = chưa load bao giờ → load toàn bộ)."""
+    cursor.execute("SELECT watermark_ts FROM bonbanh_control.etl_watermark WHERE name = %s", (name,))
+    row = cursor.fetchone()
+    return row[0] if row else None
+
+
+def set_watermark(cursor, name, watermark_ts, rows_loaded=0):
+    cursor.execute("""
+        INSERT INTO bonbanh_control.etl_watermark (name, watermark_ts, rows_loaded)
+        VALUES (%s, %s, %s)
+        ON DUPLICATE KEY UPDATE watermark_ts = VALUES(watermark_ts), rows_loaded = VALUES(rows_loaded)
+    """, (name, watermark_ts, rows_loaded))
@@ -1,10 +1,17 @@
+import time
+import threading
 import mysql.connector
-import os
+import mysql.connector.pooling
 from mysql.connector import Error
 import logging
 import config  # Import config file
+from db_stats import log_buffer_pool_sizes, log_index_sizes
+import db_migrations
+import dw_python_loader
+import dw_partitions
+from load_to_controler import get_watermark, set_watermark
 
-from datetime import datetime
+from datetime import date
 
 # ===========================
 # Cấu hình logger
@@ -23,62 +30,247 @@ logging.basicConfig(
 logger = logging.getLogger("LoadDWLogger")
 
 # ===========================
-# Cấu hình MySQL + file SQL
+# Cấu hình MySQL
 # ===========================
 DB_CONFIG = config.DB_CONFIG_BASE
 
-SQL_DW_SCHEMA = config.DW_SQL_SCHEMA_FILE
-SQL_PROCEDURE = config.DW_SQL_PROCEDURE_FILE
+WATERMARK_NAME = "dw_fact"   # Mốc updated_at của staging đã đưa vào DW (bonbanh_control.etl_watermark)
+MART_WATERMARK_NAME = "mart_fact"   # = load_to_mart.WATERMARK_NAME
+
+DIMENSION_TABLES = ["dim_mau_xe", "dim_vi_tri", "dim_nguoi_ban", "dim_xuat_xu", "dim_tinh_trang", "dim_kieu_dang"]
+
+
+def dw_exists(cursor):
+    cursor.execute("SELECT COUNT(*) FROM information_schema.SCHEMATA WHERE SCHEMA_NAME = %s", (config.DW_DB_NAME,))
+    return cursor.fetchone()[0] > 0
+
+
+def log_dimension_sizes(cursor, label):
+    # Chỉ chạy khi schema DW đổi → quét cả buffer pool được (so sánh số trang của index business_key)
+    for table in DIMENSION_TABLES:
+        log_index_sizes(logger, cursor, config.DW_DB_NAME, table, label)
+        log_buffer_pool_sizes(logger, cursor, config.DW_DB_NAME, table, label)
 
 # ===========================
-# Hàm đọc và chạy SQL file
+# Load song song 6 dimension (sp_load_dim_*), mỗi dimension 1 connection lấy từ pool
 # ===========================
-def execute_sql_file(cursor, filepath, desc=""):
-    if not os.path.exists(filepath):
-        logger.error("Không tìm thấy file: %s", filepath)
-        return False
-
-    logger.info("Đang thực thi %s: %s ...", desc, filepath)
-    with open(filepath, "r", encoding="utf-8") as f:
-        sql = f.read()
-
-    statements = []
-    current = ""
-    delimiter = ";"
-
-    for line in sql.splitlines():
-        line = line.strip()
-        if line.upper().startswith("DELIMITER"):
-            if current:
-                statements.append((delimiter, current))
-                current = ""
-            delimiter = line.split()[-1]
-        else:
-            current += line + "\n"
-            if line.endswith(delimiter):
-                statements.append((delimiter, current.strip()))
-                current = ""
-
-    if current.strip():
-        statements.append((delimiter, current.strip()))
-
-    for delim, stmt in statements:
-        for part in [s.strip() for s in stmt.split(delim) if s.strip()]:
-            if part.upper().startswith("DELIMITER"):
-                continue
-            try:
-                cursor.execute(part)
-            except Error as e:
-                if "already exists" not in str(e).lower():
-                    logger.error("Lỗi SQL trong %s: %s", filepath, e)
-                    logger.error("   Câu lệnh lỗi: %s...", part[:200])
-                    raise
-    return True
+class DimensionLoader(threading.Thread):
+    """Chạy sp_load_<table> trong 1 transaction rồi chờ ở barrier cùng các dimension khác:
+    chỉ commit khi mọi dimension đều thành công, có 1 cái lỗi → tất cả rollback.
+    6 connection commit lần lượt → commit của 1 dimension vẫn có thể lỗi sau khi các dimension khác
+    đã commit (committed = True): load_parallel hoàn tác bằng undo_dimensions."""
+
+    def __init__(self, pool, table, since, until, barrier, failed):
+        super().__init__(name=f"dw-{table}", daemon=True)
+        self.pool = pool
+        self.table = table
+        self.since = since
+        self.until = until
+        self.barrier = barrier
+        self.failed = failed
+        self.rows = 0
+        self.seconds = 0.0
+        self.error = None
+        self.committed = False
+
+    def run(self):
+        conn = cursor = None
+        started = time.monotonic()
+        try:
+            conn = self.pool.get_connection()
+            cursor = conn.cursor()
+            cursor.callproc(f"sp_load_{self.table}", (self.since, self.until))
+            cursor.execute("SELECT @dim_rows")
+            self.rows = cursor.fetchone()[0] or 0
+        except Exception as e:
+            self.error = e
+            self.failed.set()
+            logger.error("   %s: lỗi load dimension: %s", self.table, e)
+        self.seconds = time.monotonic() - started
+
+        try:
+            self.barrier.wait()
+            if conn is not None:
+                if self.failed.is_set():
+                    conn.rollback()
+                else:
+                    conn.commit()
+                    self.committed = True
+        except Exception as e:
+            self.error = self.error or e
+            self.failed.set()
+        finally:
+            if cursor is not None:
+                cursor.close()
+            if conn is not None:
+                conn.close()  # Trả connection về pool
+
+
+def load_dimensions_parallel(since, until):
+    """Load 6 dimension song song; lỗi → ném lại lỗi đầu tiên. Lỗi trước barrier → không dimension nào
+    được commit; lỗi lúc commit → các dimension đã commit được ghi log, load_parallel hoàn tác."""
+    pool = mysql.connector.pooling.MySQLConnectionPool(
+        pool_name="dw_dimensions", pool_size=len(DIMENSION_TABLES),
+        **{**DB_CONFIG, "database": config.DW_DB_NAME})
+    barrier = threading.Barrier(len(DIMENSION_TABLES))
+    failed = threading.Event()
+    loaders = [DimensionLoader(pool, table, since, until, barrier, failed) for table in DIMENSION_TABLES]
+
+    started = time.monotonic()
+    for loader in loaders:
+        loader.start()
+    for loader in loaders:
+        loader.join()
+
+    for loader in loaders:
+        logger.info("   %-15s %8s dòng ảnh hưởng  %6.2fs%s", loader.table, f"{loader.rows:,}",
+                    loader.seconds, "  (LỖI)" if loader.error else "")
+    logger.info("   6 dimension (song song): %.2fs", time.monotonic() - started)
+
+    errors = [loader.error for loader in loaders if loader.error]
+    if errors:
+        committed = [loader.table for loader in loaders if loader.committed]
+        if committed:
+            logger.error("   Commit dimension lỗi sau khi %s đã commit", ", ".join(committed))
+        raise errors[0]
+
+
+# ===========================
+# Hoàn tác dimension: fact không thấy được dòng chưa commit của connection khác nên 6 dimension phải
+# commit trước sp_load_fact, mỗi dimension 1 connection commit riêng. Lỗi ở bất kỳ bước nào sau mốc
+# (commit 1 dimension lỗi khi dimension khác đã commit, hoặc fact lỗi) → rollback fact rồi xoá các key /
+# phiên bản mới (surrogate_key > mốc trước khi load) và mở lại các phiên bản dim_mau_xe vừa bị đóng
+# → DW về đúng trạng thái trước lần load (pipeline chỉ có 1 tiến trình ghi DW tại 1 thời điểm).
+# Chưa dimension nào commit → không có dòng nào sau mốc, hoàn tác không đổi gì
+# ===========================
+def dimension_marks(cursor):
+    """(thời điểm server, {dimension: MAX(surrogate_key)}) trước khi load dimension."""
+    cursor.execute("SELECT NOW()")
+    started_at = cursor.fetchone()[0]
+    marks = {}
+    for table in DIMENSION_TABLES:
+        cursor.execute(f"SELECT IFNULL(MAX(surrogate_key), 0) FROM {table}")
+        marks[table] = cursor.fetchone()[0]
+    return started_at, marks
+
+
+def undo_dimensions(conn, cursor, started_at, marks):
+    for table in DIMENSION_TABLES:
+        cursor.execute(f"DELETE FROM {table} WHERE surrogate_key > %s", (marks[table],))
+        if cursor.rowcount:
+            logger.warning("   Hoàn tác %s: xoá %s dòng mới", table, f"{cursor.rowcount:,}")
+    cursor.execute("""
+        UPDATE dim_mau_xe SET is_current = 1, valid_to = '9999-12-31 00:00:00'
+        WHERE is_current = 0 AND valid_to >= %s AND valid_to < '9999-12-31 00:00:00'
+    """, (started_at,))
+    if cursor.rowcount:
+        logger.warning("   Hoàn tác dim_mau_xe: mở lại %s phiên bản", f"{cursor.rowcount:,}")
+    conn.commit()
+
+
+def load_parallel(conn, cursor, since, until, snapshot_date):
+    """6 dimension song song rồi sp_load_fact; lỗi ở bất kỳ bước nào → DW như trước khi load. Trả về số dòng delta."""
+    started_at, marks = dimension_marks(cursor)
+    # Kết thúc transaction đọc (watermark, mốc) để fact thấy dimension do các connection khác commit
+    conn.commit()
+    try:
+        load_dimensions_parallel(since, until)
+        fact_started = time.monotonic()
+        cursor.callproc("sp_load_fact", (since, until, snapshot_date, config.DW_FACT_GRAIN))
+        cursor.execute("SELECT @dw_delta_rows")
+        delta_rows = cursor.fetchone()[0] or 0
+    except Exception:
+        conn.rollback()
+        logger.error("   Load dimension / fact lỗi → hoàn tác các dimension đã commit")
+        undo_dimensions(conn, cursor, started_at, marks)
+        raise
+    logger.info("   fact_danh_sach_xe %8s dòng staging  %6.2fs", f"{delta_rows:,}",
+                time.monotonic() - fact_started)
+    return delta_rows
+
+# ===========================
+# Load lại 1 ngày snapshot (--reload-day, chỉ grain 'daily'):
+# - Tập tin cần load lại = các tin đang có trong partition của ngày đó (snapshot_date là ngày load, không
+#   suy ra được từ updated_at của staging), ghi vào fact_reload_links trước khi TRUNCATE PARTITION
+# - Load lại các tin đó từ staging (bản hiện tại của tin - staging chỉ giữ bản mới nhất)
+# - is_current của các tin đó tính lại theo snapshot lớn nhất còn lại (ngày load lại có thể không phải
+#   ngày mới nhất; tin không còn trong staging → bản trước đó lại là bản hiện tại)
+# - Xoá watermark của data mart: dòng bị xoá / bản cũ được đặt lại is_current không có loaded_at mới
+#   → refresh incremental không thấy, lần load_to_mart sau rebuild toàn bộ
+# ===========================
+def capture_reload_links(conn, cursor, day):
+    """Ghi tập tin của ngày `day` (giữ lại tập của lần load lại trước nếu lần đó lỗi sau TRUNCATE)."""
+    cursor.execute("""
+        INSERT IGNORE INTO fact_reload_links (snapshot_date, link_hash)
+        SELECT snapshot_date, link_hash FROM fact_danh_sach_xe
+        WHERE snapshot_date = %s AND link_hash IS NOT NULL
+    """, (day,))
+    conn.commit()
+    cursor.execute("SELECT COUNT(*) FROM fact_reload_links WHERE snapshot_date = %s", (day,))
+    return cursor.fetchone()[0]
+
+
+def refresh_current_flags(cursor, day):
+    """is_current = 1 đúng cho snapshot lớn nhất của mỗi tin trong fact_reload_links(day). Trả về số dòng đổi."""
+    cursor.execute("DROP TEMPORARY TABLE IF EXISTS tmp_dw_reload_latest")
+    cursor.execute("""
+        CREATE TEMPORARY TABLE tmp_dw_reload_latest (
+            link_hash BINARY(16) PRIMARY KEY,
+            latest DATE NOT NULL
+        ) ENGINE=InnoDB
+    """)
+    cursor.execute("""
+        INSERT INTO tmp_dw_reload_latest (link_hash, latest)
+        SELECT f.link_hash, MAX(f.snapshot_date)
+        FROM fact_danh_sach_xe f
+        JOIN fact_reload_links r ON r.link_hash = f.link_hash AND r.snapshot_date = %s
+        GROUP BY f.link_hash
+    """, (day,))
+    cursor.execute("""
+        UPDATE fact_danh_sach_xe f
+        JOIN tmp_dw_reload_latest l ON l.link_hash = f.link_hash
+        SET f.is_current = (f.snapshot_date = l.latest)
+        WHERE f.is_current <> (f.snapshot_date = l.latest)
+    """)
+    changed = cursor.rowcount
+    cursor.execute("DROP TEMPORARY TABLE IF EXISTS tmp_dw_reload_latest")
+    return changed
+
+
+def reload_fact_day(conn, cursor, day):
+    """TRUNCATE partition của ngày `day` rồi load lại đúng các tin của ngày đó. Trả về số dòng staging đã load."""
+    links = capture_reload_links(conn, cursor, day)
+    logger.info("   Load lại ngày %s: %s tin trong partition của ngày đó", day, f"{links:,}")
+    dw_partitions.truncate_day_partition(cursor, day)
+
+    if config.DW_LOAD_MODE == "python":
+        delta_rows = dw_python_loader.load_dw(cursor, None, None, day, config.DW_FACT_GRAIN, reload_day=day)
+    else:
+        cursor.callproc("sp_reload_fact_day", (day,))
+        cursor.execute("SELECT @dw_delta_rows")
+        delta_rows = cursor.fetchone()[0] or 0
+    if delta_rows < links:
+        logger.warning("   %s tin của ngày %s không còn trong staging → không có dòng ngày đó",
+                       f"{links - delta_rows:,}", day)
+
+    changed = refresh_current_flags(cursor, day)
+    logger.info("   Tính lại is_current: %s dòng đổi", f"{changed:,}")
+    set_watermark(cursor, MART_WATERMARK_NAME, None)
+    logger.info("   Xoá watermark %s → lần load data mart sau sẽ rebuild toàn bộ", MART_WATERMARK_NAME)
+    cursor.execute("DELETE FROM fact_reload_links WHERE snapshot_date = %s", (day,))
+    return delta_rows
 
 # ===========================
 # Hàm main
 # ===========================
-def main():
+def main(reload_day=None):
+    """reload_day (date): load lại fact của 1 ngày snapshot - TRUNCATE partition của ngày đó rồi load
+    lại các tin đã có trong ngày đó (reload_fact_day), không đổi watermark. Chỉ dùng với grain 'daily'."""
+    if reload_day and config.DW_FACT_GRAIN == "listing":
+        # Grain 'listing': mỗi tin chỉ có 1 dòng (ngày load gần nhất), load lại 1 ngày không có nghĩa
+        logger.error("--reload-day chỉ dùng được khi DW_FACT_GRAIN = 'daily' (hiện tại: 'listing').")
+        return
+
     logger.info("BẮT ĐẦU LOAD DATA WAREHOUSE (Staging → DW)\n")
 
     try:
@@ -86,24 +278,58 @@ def main():
         cursor = conn.cursor()
         logger.info("Kết nối MySQL thành công!")
 
-        # 1. Chạy file schema
-        execute_sql_file(cursor, SQL_DW_SCHEMA, "Tạo Data Warehouse schema")
-        conn.commit()
-        logger.info("Data Warehouse schema đã sẵn sàng.\n")
-
-        # 2. Tạo/Update stored procedure
-        execute_sql_file(cursor, SQL_PROCEDURE, "Tạo Stored Procedure sp_load_dw")
-        conn.commit()
-        logger.info("Stored Procedure sp_load_dw đã sẵn sàng.\n")
+        # 1-2. Schema DW + stored procedure sp_load_dw (chỉ chạy lại khi file SQL đổi)
+        #      Schema DW đổi (vd: migration business_key) → ghi kích thước index dimension trước / sau
+        schema_changed = (config.DW_SQL_SCHEMA_FILE in db_migrations.pending_scripts([config.DW_SQL_SCHEMA_FILE])
+                          and dw_exists(cursor))
+        if schema_changed:
+            log_dimension_sizes(cursor, "trước migrate")
+        db_migrations.apply_scripts(db_migrations.DW_SCRIPTS, logger)
+        if schema_changed:
+            log_dimension_sizes(cursor, "sau migrate")
+        logger.info("Data Warehouse schema + sp_load_dw đã sẵn sàng.\n")
 
-        # 3. Chạy procedure ETL
-        logger.info("BẮT ĐẦU CHUYỂN ĐỔI DỮ LIỆU TỪ STAGING → DATA WAREHOUSE...")
+        # 3. Chạy ETL (sp_load_dw hoặc dw_python_loader theo DW_LOAD_MODE)
+        logger.info("BẮT ĐẦU CHUYỂN ĐỔI DỮ LIỆU TỪ STAGING → DATA WAREHOUSE (%s)...", config.DW_LOAD_MODE)
         logger.info("   (Có thể mất vài phút nếu dữ liệu lớn)\n")
 
         cursor.execute("USE bonbanh_datawarehouse")
-        cursor.callproc("sp_load_dw")
+
+        # 3.1 Khoảng staging cần load: (watermark lần trước, updated_at lớn nhất hiện tại]
+        #     hoặc các tin của 1 ngày khi load lại (partition của ngày đó được TRUNCATE trước)
+        if reload_day:
+            snapshot_date = reload_day
+            since = until = None
+        else:
+            snapshot_date = date.today()
+            dw_partitions.ensure_day_partition(cursor, snapshot_date)
+            dw_partitions.merge_old_day_partitions(cursor, snapshot_date)
+            since = get_watermark(cursor, WATERMARK_NAME) if config.DW_LOAD_INCREMENTAL else None
+            cursor.execute("SELECT MAX(updated_at) FROM bonbanh_staging.xe_bonbanh")
+            until = cursor.fetchone()[0]
+            if since:
+                logger.info("   Load incremental: staging updated_at > %s (đến %s)", since, until)
+            else:
+                logger.info("   Load toàn bộ staging (đến %s)", until)
+
+        # 3.2 Load + ghi watermark mới trong cùng 1 transaction
+        logger.info("   Snapshot %s, grain fact = %s", snapshot_date, config.DW_FACT_GRAIN)
+        started = time.monotonic()
+        if reload_day:
+            delta_rows = reload_fact_day(conn, cursor, reload_day)
+        elif config.DW_LOAD_MODE == "python":
+            delta_rows = dw_python_loader.load_dw(cursor, since, until, snapshot_date, config.DW_FACT_GRAIN)
+        elif config.DW_PARALLEL_DIMENSIONS:
+            delta_rows = load_parallel(conn, cursor, since, until, snapshot_date)
+        else:
+            cursor.callproc("sp_load_dw", (since, until, snapshot_date, config.DW_FACT_GRAIN))
+            cursor.execute("SELECT @dw_delta_rows")
+            delta_rows = cursor.fetchone()[0] or 0
+        if until is not None and not reload_day:
+            set_watermark(cursor, WATERMARK_NAME, until, delta_rows)
         conn.commit()
-        logger.info("HOÀN TẤT! Toàn bộ dữ liệu đã được load vào Data Warehouse (Star Schema)")
+        logger.info("HOÀN TẤT! Đã load %s dòng staging thay đổi vào Data Warehouse (Star Schema) trong %.1fs",
+                    f"{delta_rows:,}", time.monotonic() - started)
 
         # 4. Thống kê số dòng
         cursor.execute("SELECT COUNT(*) FROM fact_danh_sach_xe")
@@ -116,11 +342,19 @@ def main():
         cursor.execute("SELECT COUNT(*) FROM dim_vi_tri")
         logger.info("   → dim_vi_tri: %s bản ghi", f"{cursor.fetchone()[0]:,}")
 
+        log_index_sizes(logger, cursor, "bonbanh_datawarehouse", "fact_danh_sach_xe")
+
     except Error as e:
         logger.error("LỖI KẾT NỐI HOẶC THỰC THI: %s", e)
         if 'conn' in locals():
             conn.rollback()
 
+    except Exception as e:
+        # Lỗi ngoài MySQL (vd: BrokenBarrierError của các luồng load dimension)
+        logger.exception("LỖI KHI LOAD DATA WAREHOUSE: %s", e)
+        if 'conn' in locals() and conn.is_connected():
+            conn.rollback()
+
     finally:
         if 'cursor' in locals():
             cursor.close()
@@ -134,4 +368,13 @@ def main():
 
 # ===========================
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Load staging → Data Warehouse")
+    parser.add_argument("--reload-day", type=date.fromisoformat, metavar="YYYY-MM-DD",
+                        help="Load lại fact của 1 ngày snapshot (TRUNCATE partition của ngày đó), "
+                             "chỉ với DW_FACT_GRAIN = 'daily'")
+    args = parser.parse_args()
+    if args.reload_day and config.DW_FACT_GRAIN == "listing":
+        parser.error("--reload-day chỉ dùng được khi DW_FACT_GRAIN = 'daily'")
+    main(reload_day=args.reload_day)
\ No newline at end of file
@@ -1,9 +1,10 @@
 import mysql.connector
-import os
 from mysql.connector import Error
-from datetime import date
+from datetime import date, timedelta
 import logging
 import config  # Import config file
+import db_migrations
+from load_to_controler import get_watermark, set_watermark
 
 # ===========================
 # Cấu hình logger
@@ -26,40 +27,57 @@ logger = logging.getLogger("LoadDataMartLogger")
 # ================================================================
 DB_CONFIG = config.DB_CONFIG_BASE
 
-SQL_DATAMART_SCHEMA = config.DATAMART_SQL_SCHEMA_FILE
+WATERMARK_NAME = "mart_fact"   # Mốc loaded_at của fact đã đưa vào data mart (bonbanh_control.etl_watermark)
 
-# ================================================================
-#              HÀM THỰC THI FILE SQL ĐƠN GIẢN (không DELIMITER)
-# ================================================================
-def execute_sql_file(cursor, filepath, desc=""):
-    if not os.path.exists(filepath):
-        logger.error("Không tìm thấy file: %s", filepath)
-        return False
-
-    logger.info("Đang thực thi %s: %s ...", desc, filepath)
-
-    with open(filepath, "r", encoding="utf-8") as f:
-        sql = f.read()
-
-    stmts = [s.strip() for s in sql.split(';') if s.strip()]
-
-    for stmt in stmts:
-        try:
-            cursor.execute(stmt)
-        except Error as e:
-            lower = str(e).lower()
-            if "already exists" in lower or "duplicate" in lower:
-                continue
-            logger.error("Lỗi thực thi SQL: %s", e)
-            logger.error("Câu lệnh lỗi (rút gọn): %s", stmt[:200])
-            raise
+# Bucket giá của 1 dòng fact (dùng chung cho rebuild toàn bộ và incremental)
+PRICE_BUCKET_LABEL = """CASE
+                WHEN f.gia_xe < 200000000 THEN '<200M'
+                WHEN f.gia_xe BETWEEN 200000000 AND 500000000 THEN '200-500M'
+                WHEN f.gia_xe BETWEEN 500000000 AND 1000000000 THEN '500M-1T'
+                WHEN f.gia_xe >= 1000000000 THEN '>1T'
+                ELSE 'Unknown'
+            END"""
 
-    return True
+# Phần đóng góp của 1 tin (bản is_current) vào data mart = 1 dòng mart_listing_state
+LISTING_STATE_SELECT = f"""
+        SELECT
+            f.link_hash,
+            f.id AS fact_id,
+            f.snapshot_date,
+            COALESCE(dm.ten_xe, 'Unknown') AS ten_xe,
+            COALESCE(dm.nam_san_xuat, 0) AS nam_san_xuat,
+            COALESCE(dv.noi_ban, 'Unknown') AS noi_ban,
+            f.ngay_dang AS ngay,
+            {PRICE_BUCKET_LABEL} AS bucket_label,
+            f.gia_xe,
+            COALESCE(f.luot_xem, 0) AS luot_xem,
+            f.loaded_at
+        FROM bonbanh_datawarehouse.fact_danh_sach_xe f
+        LEFT JOIN bonbanh_datawarehouse.dim_mau_xe dm
+            ON f.mau_xe_sk = dm.surrogate_key
+        LEFT JOIN bonbanh_datawarehouse.dim_vi_tri dv
+            ON f.vi_tri_sk = dv.surrogate_key
+"""
+STATE_COLUMNS = ("link_hash, fact_id, snapshot_date, ten_xe, nam_san_xuat, noi_ban, ngay, "
+                 "bucket_label, gia_xe, luot_xem, loaded_at")
 
 # ================================================================
 #            HÀM REFRESH DATAMART (DW → DataMart)
 # ================================================================
+def fact_filter():
+    """Điều kiện lọc fact dùng chung: chỉ bản mới nhất của mỗi tin; DATAMART_WINDOW_DAYS → thêm
+    điều kiện trên snapshot_date (cột partition) để MySQL chỉ đọc các partition trong cửa sổ."""
+    if config.DATAMART_WINDOW_DAYS:
+        since = date.today() - timedelta(days=config.DATAMART_WINDOW_DAYS)
+        return "f.is_current = 1 AND f.snapshot_date >= %s", (since,)
+    return "f.is_current = 1", ()
+
 def refresh_datamart(conn, cursor):
+    """Rebuild toàn bộ data mart từ fact (cách gốc). Đồng thời dựng lại mart_listing_state + watermark
+    để các lần refresh incremental sau nối tiếp được."""
+    cursor.execute("SELECT MAX(loaded_at) FROM bonbanh_datawarehouse.fact_danh_sach_xe")
+    until = cursor.fetchone()[0]
+
     logger.info("Truncating DataMart tables (refresh)...")
 
     tables = [
@@ -67,47 +85,56 @@ def refresh_datamart(conn, cursor):
         "agg_count_by_location",
         "agg_views_by_day",
         "agg_price_bucket",
-        "top_listings_by_views"
+        "top_listings_by_views",
+        "mart_listing_state"
     ]
 
     for t in tables:
         cursor.execute(f"TRUNCATE TABLE bonbanh_datamart.{t}")
 
+    where, params = fact_filter()
+
     logger.info("Populating agg_price_by_make ...")
-    cursor.execute("""
+    cursor.execute(f"""
         INSERT INTO bonbanh_datamart.agg_price_by_make
-        (ten_xe, nam_san_xuat, listings_count, avg_price, min_price, max_price)
+        (ten_xe, nam_san_xuat, listings_count, avg_price, min_price, max_price, price_count, price_sum)
         SELECT
             COALESCE(dm.ten_xe, 'Unknown') AS ten_xe,
             COALESCE(dm.nam_san_xuat, 0) AS nam_san_xuat,
             COUNT(f.id) AS listings_count,
             AVG(f.gia_xe) AS avg_price,
             MIN(f.gia_xe) AS min_price,
-            MAX(f.gia_xe) AS max_price
+            MAX(f.gia_xe) AS max_price,
+            COUNT(f.gia_xe) AS price_count,
+            IFNULL(SUM(f.gia_xe), 0) AS price_sum
         FROM bonbanh_datawarehouse.fact_danh_sach_xe f
         LEFT JOIN bonbanh_datawarehouse.dim_mau_xe dm 
             ON f.mau_xe_sk = dm.surrogate_key
+        WHERE {where}
         GROUP BY COALESCE(dm.ten_xe, 'Unknown'), COALESCE(dm.nam_san_xuat, 0)
         ORDER BY listings_count DESC
-    """)
+    """, params)
 
     logger.info("Populating agg_count_by_location ...")
-    cursor.execute("""
+    cursor.execute(f"""
         INSERT INTO bonbanh_datamart.agg_count_by_location
-        (noi_ban, listings_count, avg_price)
+        (noi_ban, listings_count, avg_price, price_count, price_sum)
         SELECT
             COALESCE(dv.noi_ban, 'Unknown') AS noi_ban,
             COUNT(f.id) AS listings_count,
-            AVG(f.gia_xe) AS avg_price
+            AVG(f.gia_xe) AS avg_price,
+            COUNT(f.gia_xe) AS price_count,
+            IFNULL(SUM(f.gia_xe), 0) AS price_sum
         FROM bonbanh_datawarehouse.fact_danh_sach_xe f
         LEFT JOIN bonbanh_datawarehouse.dim_vi_tri dv 
             ON f.vi_tri_sk = dv.surrogate_key
+        WHERE {where}
         GROUP BY COALESCE(dv.noi_ban, 'Unknown')
         ORDER BY listings_count DESC
-    """)
+    """, params)
 
     logger.info("Populating agg_views_by_day ...")
-    cursor.execute("""
+    cursor.execute(f"""
         INSERT INTO bonbanh_datamart.agg_views_by_day
         (ngay, total_listings, total_views, avg_views_per_listing)
         SELECT
@@ -119,22 +146,17 @@ def refresh_datamart(conn, cursor):
                 ELSE SUM(COALESCE(f.luot_xem,0))/COUNT(f.id) 
             END AS avg_views_per_listing
         FROM bonbanh_datawarehouse.fact_danh_sach_xe f
+        WHERE {where}
         GROUP BY f.ngay_dang
         ORDER BY f.ngay_dang DESC
-    """)
+    """, params)
 
     logger.info("Populating agg_price_bucket ...")
-    cursor.execute("""
+    cursor.execute(f"""
         INSERT INTO bonbanh_datamart.agg_price_bucket
-        (bucket_label, bucket_min, bucket_max, listings_count, avg_price)
+        (bucket_label, bucket_min, bucket_max, listings_count, avg_price, price_count, price_sum)
         SELECT
-            CASE
-                WHEN f.gia_xe < 200000000 THEN '<200M'
-                WHEN f.gia_xe BETWEEN 200000000 AND 500000000 THEN '200-500M'
-                WHEN f.gia_xe BETWEEN 500000000 AND 1000000000 THEN '500M-1T'
-                WHEN f.gia_xe >= 1000000000 THEN '>1T'
-                ELSE 'Unknown'
-            END AS bucket_label,
+            {PRICE_BUCKET_LABEL} AS bucket_label,
             CASE
                 WHEN f.gia_xe < 200000000 THEN 0
                 WHEN f.gia_xe BETWEEN 200000000 AND 500000000 THEN 200000000
@@ -150,14 +172,17 @@ def refresh_datamart(conn, cursor):
                 ELSE NULL
             END AS bucket_max,
             COUNT(*) AS listings_count,
-            AVG(f.gia_xe) AS avg_price
+            AVG(f.gia_xe) AS avg_price,
+            COUNT(f.gia_xe) AS price_count,
+            IFNULL(SUM(f.gia_xe), 0) AS price_sum
         FROM bonbanh_datawarehouse.fact_danh_sach_xe f
+        WHERE {where}
         GROUP BY bucket_label
         ORDER BY listings_count DESC
-    """)
+    """, params)
 
     logger.info("Populating top_listings_by_views (top 100)...")
-    cursor.execute("""
+    cursor.execute(f"""
         INSERT INTO bonbanh_datamart.top_listings_by_views
         (source_fact_id, ten_xe, gia_xe, luot_xem, ngay_dang, noi_ban, link_xe)
         SELECT
@@ -173,16 +198,292 @@ def refresh_datamart(conn, cursor):
             ON f.mau_xe_sk = dm.surrogate_key
         LEFT JOIN bonbanh_datawarehouse.dim_vi_tri dv 
             ON f.vi_tri_sk = dv.surrogate_key
+        WHERE {where}
         ORDER BY COALESCE(f.luot_xem,0) DESC
         LIMIT 100
+    """, params)
+
+    logger.info("Populating mart_listing_state ...")
+    cursor.execute(f"""
+        INSERT INTO bonbanh_datamart.mart_listing_state ({STATE_COLUMNS})
+        {LISTING_STATE_SELECT}
+        WHERE {where}
+        ON DUPLICATE KEY UPDATE fact_id = VALUES(fact_id)
+    """, params)
+
+    # Cửa sổ DATAMART_WINDOW_DAYS → mart_listing_state chỉ có các tin trong cửa sổ, không nối tiếp
+    # incremental được: xoá mốc để lần sau cũng rebuild toàn bộ
+    watermark = None if config.DATAMART_WINDOW_DAYS else until
+    set_watermark(cursor, WATERMARK_NAME, watermark, cursor.rowcount)
+    conn.commit()
+
+# ================================================================
+#      REFRESH INCREMENTAL (chỉ các dòng fact có loaded_at mới)
+# ================================================================
+def refresh_datamart_incremental(conn, cursor, since):
+    """Cộng dồn phần thay đổi của fact (loaded_at >= since) vào data mart thay vì rebuild:
+    mỗi tin đổi → trừ phần đóng góp cũ (mart_listing_state), cộng phần mới vào count/sum của nhóm.
+    Chạy lại cùng 1 khoảng không sai số (trừ cũ cộng mới của cùng 1 dòng = 0). Trả về số tin thay đổi."""
+    cursor.execute("SELECT MAX(loaded_at) FROM bonbanh_datawarehouse.fact_danh_sach_xe")
+    until = cursor.fetchone()[0]
+    if until is None or until < since:
+        logger.info("Fact không có dòng mới từ %s → bỏ qua.", since)
+        return 0
+
+    logger.info("Refresh incremental: fact loaded_at từ %s đến %s", since, until)
+    cursor.execute("DROP TEMPORARY TABLE IF EXISTS bonbanh_datamart.tmp_mart_new")
+    cursor.execute("DROP TEMPORARY TABLE IF EXISTS bonbanh_datamart.tmp_mart_delta")
+
+    # 1. Phần đóng góp mới của các tin vừa load
+    cursor.execute(f"""
+        CREATE TEMPORARY TABLE bonbanh_datamart.tmp_mart_new (PRIMARY KEY (link_hash))
+        {LISTING_STATE_SELECT}
+        WHERE f.is_current = 1 AND f.loaded_at >= %s AND f.loaded_at <= %s
+    """, (since, until))
+    cursor.execute("SELECT COUNT(*) FROM bonbanh_datamart.tmp_mart_new")
+    changed = cursor.fetchone()[0]
+    logger.info("   %s tin thay đổi", f"{changed:,}")
+
+    # 2. Delta = +1 phần mới, -1 phần cũ (tin đã có trong state)
+    cursor.execute("""
+        CREATE TEMPORARY TABLE bonbanh_datamart.tmp_mart_delta (
+            delta TINYINT NOT NULL,
+            ten_xe VARCHAR(512),
+            nam_san_xuat INT,
+            noi_ban VARCHAR(255),
+            ngay DATE,
+            bucket_label VARCHAR(64),
+            gia_xe BIGINT,
+            luot_xem INT
+        ) ENGINE=InnoDB
+    """)
+    cursor.execute("""
+        INSERT INTO bonbanh_datamart.tmp_mart_delta
+        SELECT 1, ten_xe, nam_san_xuat, noi_ban, ngay, bucket_label, gia_xe, luot_xem
+        FROM bonbanh_datamart.tmp_mart_new
+    """)
+    cursor.execute("""
+        INSERT INTO bonbanh_datamart.tmp_mart_delta
+        SELECT -1, s.ten_xe, s.nam_san_xuat, s.noi_ban, s.ngay, s.bucket_label, s.gia_xe, s.luot_xem
+        FROM bonbanh_datamart.mart_listing_state s
+        JOIN bonbanh_datamart.tmp_mart_new n ON n.link_hash = s.link_hash
     """)
 
+    # 3. Gộp delta vào 4 bảng tổng hợp (avg = sum / count sau khi cộng dồn)
+    logger.info("Merging agg_price_by_make ...")
+    cursor.execute("""
+        INSERT INTO bonbanh_datamart.agg_price_by_make
+        (ten_xe, nam_san_xuat, listings_count, price_count, price_sum, avg_price)
+        SELECT
+            ten_xe, nam_san_xuat,
+            SUM(delta),
+            SUM(IF(gia_xe IS NULL, 0, delta)),
+            SUM(delta * IFNULL(gia_xe, 0)),
+            SUM(delta * IFNULL(gia_xe, 0)) / NULLIF(SUM(IF(gia_xe IS NULL, 0, delta)), 0)
+        FROM bonbanh_datamart.tmp_mart_delta
+        GROUP BY ten_xe, nam_san_xuat
+        ON DUPLICATE KEY UPDATE
+            listings_count = listings_count + VALUES(listings_count),
+            price_count = price_count + VALUES(price_count),
+            price_sum = price_sum + VALUES(price_sum),
+            avg_price = price_sum / NULLIF(price_count, 0)
+    """)
+
+    logger.info("Merging agg_count_by_location ...")
+    cursor.execute("""
+        INSERT INTO bonbanh_datamart.agg_count_by_location
+        (noi_ban, listings_count, price_count, price_sum, avg_price)
+        SELECT
+            noi_ban,
+            SUM(delta),
+            SUM(IF(gia_xe IS NULL, 0, delta)),
+            SUM(delta * IFNULL(gia_xe, 0)),
+            SUM(delta * IFNULL(gia_xe, 0)) / NULLIF(SUM(IF(gia_xe IS NULL, 0, delta)), 0)
+        FROM bonbanh_datamart.tmp_mart_delta
+        GROUP BY noi_ban
+        ON DUPLICATE KEY UPDATE
+            listings_count = listings_count + VALUES(listings_count),
+            price_count = price_count + VALUES(price_count),
+            price_sum = price_sum + VALUES(price_sum),
+            avg_price = price_sum / NULLIF(price_count, 0)
+    """)
+
+    logger.info("Merging agg_views_by_day ...")
+    cursor.execute("""
+        INSERT INTO bonbanh_datamart.agg_views_by_day
+        (ngay, total_listings, total_views, avg_views_per_listing)
+        SELECT
+            ngay,
+            SUM(delta),
+            SUM(delta * luot_xem),
+            IFNULL(SUM(delta * luot_xem) / NULLIF(SUM(delta), 0), 0)
+        FROM bonbanh_datamart.tmp_mart_delta
+        GROUP BY ngay
+        ON DUPLICATE KEY UPDATE
+            total_listings = total_listings + VALUES(total_listings),
+            total_views = total_views + VALUES(total_views),
+            avg_views_per_listing = IFNULL(total_views / NULLIF(total_listings, 0), 0)
+    """)
+
+    logger.info("Merging agg_price_bucket ...")
+    cursor.execute("""
+        INSERT INTO bonbanh_datamart.agg_price_bucket
+        (bucket_label, bucket_min, bucket_max, listings_count, price_count, price_sum, avg_price)
+        SELECT
+            bucket_label,
+            CASE bucket_label
+                WHEN '<200M' THEN 0
+                WHEN '200-500M' THEN 200000000
+                WHEN '500M-1T' THEN 500000000
+                WHEN '>1T' THEN 1000000000
+            END,
+            CASE bucket_label
+                WHEN '<200M' THEN 199999999
+                WHEN '200-500M' THEN 500000000
+                WHEN '500M-1T' THEN 1000000000
+            END,
+            SUM(delta),
+            SUM(IF(gia_xe IS NULL, 0, delta)),
+            SUM(delta * IFNULL(gia_xe, 0)),
+            SUM(delta * IFNULL(gia_xe, 0)) / NULLIF(SUM(IF(gia_xe IS NULL, 0, delta)), 0)
+        FROM bonbanh_datamart.tmp_mart_delta
+        GROUP BY bucket_label
+        ON DUPLICATE KEY UPDATE
+            listings_count = listings_count + VALUES(listings_count),
+            price_count = price_count + VALUES(price_count),
+            price_sum = price_sum + VALUES(price_sum),
+            avg_price = price_sum / NULLIF(price_count, 0)
+    """)
+
+    # Nhóm không còn tin nào (mọi tin đã chuyển sang nhóm khác)
+    cursor.execute("DELETE FROM bonbanh_datamart.agg_price_by_make WHERE listings_count <= 0")
+    cursor.execute("DELETE FROM bonbanh_datamart.agg_count_by_location WHERE listings_count <= 0")
+    cursor.execute("DELETE FROM bonbanh_datamart.agg_views_by_day WHERE total_listings <= 0")
+    cursor.execute("DELETE FROM bonbanh_datamart.agg_price_bucket WHERE listings_count <= 0")
+
+    # 4. Ghi phần đóng góp mới vào state
+    cursor.execute(f"""
+        INSERT INTO bonbanh_datamart.mart_listing_state ({STATE_COLUMNS})
+        SELECT {STATE_COLUMNS} FROM bonbanh_datamart.tmp_mart_new
+        ON DUPLICATE KEY UPDATE
+            fact_id = VALUES(fact_id), snapshot_date = VALUES(snapshot_date),
+            ten_xe = VALUES(ten_xe), nam_san_xuat = VALUES(nam_san_xuat), noi_ban = VALUES(noi_ban),
+            ngay = VALUES(ngay), bucket_label = VALUES(bucket_label), gia_xe = VALUES(gia_xe),
+            luot_xem = VALUES(luot_xem), loaded_at = VALUES(loaded_at)
+    """)
+
+    # 5. min / max không cộng dồn được → tính lại từ state, chỉ cho các nhóm có thay đổi
+    logger.info("Recomputing min/max price for changed makes ...")
+    cursor.execute("""
+        UPDATE bonbanh_datamart.agg_price_by_make a
+        JOIN (
+            SELECT s.ten_xe, s.nam_san_xuat, MIN(s.gia_xe) AS min_price, MAX(s.gia_xe) AS max_price
+            FROM bonbanh_datamart.mart_listing_state s
+            JOIN (SELECT DISTINCT ten_xe, nam_san_xuat FROM bonbanh_datamart.tmp_mart_delta) d
+                ON d.ten_xe = s.ten_xe AND d.nam_san_xuat = s.nam_san_xuat
+            GROUP BY s.ten_xe, s.nam_san_xuat
+        ) m ON m.ten_xe = a.ten_xe AND m.nam_san_xuat = a.nam_san_xuat
+        SET a.min_price = m.min_price, a.max_price = m.max_price
+    """)
+
+    # 6. Top 100 theo lượt xem: lấy từ state (index luot_xem), DELETE thay cho TRUNCATE để nằm trong transaction
+    logger.info("Recomputing top_listings_by_views (top 100)...")
+    cursor.execute("DELETE FROM bonbanh_datamart.top_listings_by_views")
+    cursor.execute("""
+        INSERT INTO bonbanh_datamart.top_listings_by_views
+        (source_fact_id, ten_xe, gia_xe, luot_xem, ngay_dang, noi_ban, link_xe)
+        SELECT
+            f.id AS source_fact_id,
+            COALESCE(dm.ten_xe, '') AS ten_xe,
+            f.gia_xe,
+            COALESCE(f.luot_xem, 0) AS luot_xem,
+            f.ngay_dang,
+            COALESCE(dv.noi_ban, '') AS noi_ban,
+            f.link_xe
+        FROM (
+            SELECT fact_id, snapshot_date, luot_xem
+            FROM bonbanh_datamart.mart_listing_state
+            ORDER BY luot_xem DESC
+            LIMIT 100
+        ) s
+        JOIN bonbanh_datawarehouse.fact_danh_sach_xe f
+            ON f.id = s.fact_id AND f.snapshot_date = s.snapshot_date
+        LEFT JOIN bonbanh_datawarehouse.dim_mau_xe dm
+            ON f.mau_xe_sk = dm.surrogate_key
+        LEFT JOIN bonbanh_datawarehouse.dim_vi_tri dv
+            ON f.vi_tri_sk = dv.surrogate_key
+        ORDER BY s.luot_xem DESC
+    """)
+    top_rows = cursor.rowcount
+    if top_rows < 100:
+        # State trỏ tới dòng fact đã bị xoá (vd: load lại 1 ngày mà không chạy qua load_to_dw) → thiếu dòng
+        cursor.execute("SELECT COUNT(*) FROM (SELECT 1 FROM bonbanh_datamart.mart_listing_state LIMIT 100) t")
+        expected = cursor.fetchone()[0]
+        if top_rows < expected:
+            logger.warning("Top 100 chỉ có %d/%d dòng: mart_listing_state trỏ tới dòng fact không còn "
+                           "→ chạy lại với --full", top_rows, expected)
+
+    cursor.execute("DROP TEMPORARY TABLE IF EXISTS bonbanh_datamart.tmp_mart_new")
+    cursor.execute("DROP TEMPORARY TABLE IF EXISTS bonbanh_datamart.tmp_mart_delta")
+
+    set_watermark(cursor, WATERMARK_NAME, until, changed)
     conn.commit()
+    return changed
+
+# ================================================================
+#      KIỂM TRA: so data mart với GROUP BY trực tiếp trên fact
+# ================================================================
+# (bảng, cột khoá, cột giá trị) - phía fact tính lại từ LISTING_STATE_SELECT với cùng tên cột
+VERIFY_CHECKS = [
+    ("agg_price_by_make", "ten_xe, nam_san_xuat", "listings_count, price_count, price_sum",
+     "COUNT(*), COUNT(gia_xe), IFNULL(SUM(gia_xe), 0)"),
+    ("agg_count_by_location", "noi_ban", "listings_count, price_count, price_sum",
+     "COUNT(*), COUNT(gia_xe), IFNULL(SUM(gia_xe), 0)"),
+    ("agg_views_by_day", "ngay", "total_listings, total_views",
+     "COUNT(*), SUM(luot_xem)"),
+    ("agg_price_bucket", "bucket_label", "listings_count, price_count, price_sum",
+     "COUNT(*), COUNT(gia_xe), IFNULL(SUM(gia_xe), 0)"),
+]
+
+
+def _verify_key(values):
+    # Khoá so sánh không phân biệt hoa thường như collation của MySQL
+    return tuple(v.casefold() if isinstance(v, str) else v for v in values)
+
+
+def _fetch_groups(cursor, sql, params, key_len):
+    cursor.execute(sql, params)
+    return {_verify_key(row[:key_len]): tuple(int(v or 0) for v in row[key_len:]) for row in cursor.fetchall()}
+
+
+def verify_datamart(cursor, examples=5):
+    """So count/sum của 4 bảng tổng hợp với kết quả GROUP BY tính lại từ fact. Trả về số nhóm lệch."""
+    where, params = fact_filter()
+    mismatches = 0
+    for table, keys, values, aggregates in VERIFY_CHECKS:
+        key_len = len(keys.split(","))
+        mart = _fetch_groups(cursor, f"SELECT {keys}, {values} FROM bonbanh_datamart.{table}", (), key_len)
+        fact = _fetch_groups(cursor, f"""
+            SELECT {keys}, {aggregates}
+            FROM ({LISTING_STATE_SELECT} WHERE {where}) x
+            GROUP BY {keys}
+        """, params, key_len)
+
+        diff = [key for key in mart.keys() | fact.keys() if mart.get(key) != fact.get(key)]
+        mismatches += len(diff)
+        if not diff:
+            logger.info("   Kiểm tra %s: khớp (%s nhóm)", table, f"{len(fact):,}")
+            continue
+        logger.warning("   Kiểm tra %s: %s nhóm lệch", table, f"{len(diff):,}")
+        for key in diff[:examples]:
+            logger.warning("      %s: data mart %s, fact %s", key, mart.get(key), fact.get(key))
+    return mismatches
 
 # =================================================================
 #                       HÀM MAIN
 # =================================================================
-def main():
+def main(full=False, verify=False):
+    """full: bỏ qua incremental, rebuild toàn bộ. verify: so data mart với fact sau khi refresh."""
     logger.info("BẮT ĐẦU LOAD DATA MART (DW -> DataMart)")
 
     try:
@@ -190,11 +491,20 @@ def main():
         cursor = conn.cursor()
         logger.info("Kết nối MySQL thành công!")
 
-        execute_sql_file(cursor, SQL_DATAMART_SCHEMA, "Tạo DataMart schema")
-        conn.commit()
+        db_migrations.apply_scripts(db_migrations.DATAMART_SCRIPTS, logger)
         logger.info("DataMart schema đã sẵn sàng.")
 
-        refresh_datamart(conn, cursor)
+        # Incremental khi đã có mốc từ lần refresh trước; cửa sổ DATAMART_WINDOW_DAYS luôn rebuild toàn bộ
+        since = get_watermark(cursor, WATERMARK_NAME)
+        if full or config.DATAMART_REFRESH_MODE == "full" or config.DATAMART_WINDOW_DAYS or since is None:
+            refresh_datamart(conn, cursor)
+        else:
+            refresh_datamart_incremental(conn, cursor, since)
+
+        if verify:
+            mismatches = verify_datamart(cursor)
+            if mismatches:
+                logger.warning("Data mart lệch %s nhóm so với fact → chạy lại với --full", f"{mismatches:,}")
 
         # Thống kê số bản ghi
         cursor.execute("SELECT COUNT(*) FROM bonbanh_datamart.agg_price_by_make")
@@ -225,4 +535,10 @@ def main():
 
 # =================================================================
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Refresh Data Mart từ Data Warehouse")
+    parser.add_argument("--full", action="store_true", help="Rebuild toàn bộ (TRUNCATE + tổng hợp lại từ fact)")
+    parser.add_argument("--verify", action="store_true", help="So các bảng tổng hợp với GROUP BY trực tiếp trên fact")
+    args = parser.parse_args()
+    main(full=args.full, verify=args.verify)
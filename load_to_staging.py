@@ -1,13 +1,21 @@
 import pandas as pd
 import mysql.connector
+import mysql.connector.pooling
 import math
 import os
+import csv
+import time
+import queue
+import threading
+from collections import Counter
 from mysql.connector import Error
 from datetime import datetime
 import logging
 import config  
+import staging_transform
+from db_stats import log_index_sizes, log_upsert_latency
+import db_migrations
 # =========================== 1. Tạo log file theo thời gian ===========================
-today_str_log = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
 LOG_FILE = config.get_log_file("load_to_staging")
 
 # =========================== 2. Cấu hình logging (file + console) ===========================
@@ -23,7 +31,6 @@ logging.basicConfig(
 logger = logging.getLogger("LoadStagingLogger")
 
 # =========================== Cấu hình DB + file CSV ===========================
-DB_CONFIG_NO_DB = config.DB_CONFIG_NO_DB      # Kết nối MySQL 
 DB_CONFIG = config.DB_CONFIG_STAGING          # Kết nối vào bonbanh_staging
 
 today_str = datetime.now().strftime("%Y-%m-%d")
@@ -35,113 +42,339 @@ if not os.path.exists(CSV_FILE):
     logger.info("Chạy: python get_data.py trước!")
     exit()   # Dừng script nếu chưa có dữ liệu raw
 
-SQL_SCHEMA_FILE = config.STAGING_SQL_SCHEMA_FILE   # File tạo DB + bảng
-SQL_SP_FILE = config.STAGING_SQL_SP_FILE           # File tạo Stored Procedure
+LANDING_COLUMNS = [
+    "loai_xe_nam_sx", "ten_xe", "gia_xe_raw", "noi_ban", "lien_he", "link_xe",
+    "ngay_dang_raw", "luot_xem_raw", "so_km_raw", "tinh_trang", "xuat_xu", "kieu_dang",
+    "dong_co", "mau_ngoai_that", "mau_noi_that", "so_cho_ngoi", "so_cua", "nam_san_xuat"
+]
 
 # =========================== Hàm tiện ích ===========================
 def fix_nan(x):
     return "" if (x is None or (isinstance(x, float) and math.isnan(x))) else str(x).strip()
 
-def db_exists(cursor, db_name="bonbanh_staging"):
-    cursor.execute("SHOW DATABASES LIKE %s", (db_name,))
-    return cursor.fetchone() is not None
-
-def table_exists(cursor):
-    cursor.execute("""
-        SELECT 1 FROM information_schema.TABLES 
-        WHERE TABLE_SCHEMA = 'bonbanh_staging' AND TABLE_NAME = 'xe_bonbanh'
-    """)
-    return cursor.fetchone() is not None
-
-def procedure_exists(cursor):
-    cursor.execute("""
-        SELECT 1 FROM information_schema.ROUTINES 
-        WHERE ROUTINE_SCHEMA = 'bonbanh_staging' 
-          AND ROUTINE_NAME = 'sp_transform_row' 
-          AND ROUTINE_TYPE = 'PROCEDURE'
-    """)
-    return cursor.fetchone() is not None
-
-def execute_sql_file(cursor, filepath):
-    """Chạy file .sql có hỗ trợ DELIMITER (dùng cho tạo SP)"""
-    if not os.path.exists(filepath):
-        logger.error("Không tìm thấy file: %s", filepath)
-        return False
-
-    with open(filepath, "r", encoding="utf-8") as f:
-        sql = f.read()
-
-    statements = []
-    current_stmt = ""
-    current_delim = ";"
-
-    for line in sql.splitlines():
-        line = line.strip()
-        if line.upper().startswith("DELIMITER"):
-            if current_stmt:
-                statements.append((current_delim, current_stmt))
-                current_stmt = ""
-            current_delim = line.split()[-1]
-        else:
-            current_stmt += line + "\n"
-            if line.endswith(current_delim):
-                statements.append((current_delim, current_stmt.strip()))
-                current_stmt = ""
-
-    if current_stmt.strip():
-        statements.append((current_delim, current_stmt.strip()))
-
-    for delim, stmt in statements:
-        for part in [s.strip() for s in stmt.split(delim) if s.strip()]:
-            if part.upper().startswith("DELIMITER"):
-                continue
-            try:
-                cursor.execute(part)
-            except Error as e:
-                if "already exists" not in str(e).lower():
-                    logger.error("Lỗi SQL: %s", e)
-    return True
+def read_load_counters(cursor):
+    """Đọc + reset biến session do sp_transform_row / sp_transform_landing đếm."""
+    cursor.execute("SELECT IFNULL(@n_inserted, 0), IFNULL(@n_updated, 0), IFNULL(@n_unchanged, 0)")
+    inserted, updated, unchanged = cursor.fetchone()
+    cursor.execute("SET @n_inserted = 0, @n_updated = 0, @n_unchanged = 0")
+    return Counter(inserted=int(inserted), updated=int(updated), unchanged=int(unchanged))
 
 # =========================== 4. Khởi tạo database (gọi init_database()) ===========================
-def init_database():
-    logger.info("Bước 1: Kiểm tra và khởi tạo database...")
-
-    # 4.1 Kết nối MySQL 
-    conn = mysql.connector.connect(**DB_CONFIG_NO_DB)
+def staging_exists():
+    conn = mysql.connector.connect(**config.DB_CONFIG_NO_DB)
     cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT COUNT(*) FROM information_schema.TABLES "
+                       "WHERE TABLE_SCHEMA = 'bonbanh_staging' AND TABLE_NAME = 'xe_bonbanh'")
+        return cursor.fetchone()[0] > 0
+    finally:
+        cursor.close()
+        conn.close()
+
+def log_staging_stats(label):
+    """Kích thước index + độ trễ upsert của xe_bonbanh trên mẫu cố định (N dòng đầu CSV hôm nay).
+    Đo bằng sp_transform_row (write_rows_sp): chế độ duy nhất chạy được với cả schema cũ (trước migrate,
+    SP cũ) lẫn schema mới; mỗi lượt rollback → không ghi gì vào staging."""
+    sample = next(read_chunks(CSV_FILE)).head(config.STAGING_LATENCY_SAMPLE_ROWS)
+    conn = mysql.connector.connect(**DB_CONFIG)
+    cursor = conn.cursor()
+    try:
+        log_index_sizes(logger, cursor, "bonbanh_staging", "xe_bonbanh", label)
+        log_upsert_latency(logger, conn, lambda: write_rows_sp(conn, cursor, sample), len(sample), label)
+    finally:
+        cursor.close()
+        conn.close()
 
-    # 4.2 Kiểm tra DB bonbanh_staging tồn tại chưa?
-    if not db_exists(cursor):
-        logger.info("→ Database 'bonbanh_staging' chưa tồn tại → đang tạo...")
-        execute_sql_file(cursor, SQL_SCHEMA_FILE)           # Tạo DB mới
-    else:
-        logger.info("→ Database 'bonbanh_staging' đã tồn tại.")
-
-    cursor.close()
-    conn.close()
+def init_database():
+    logger.info("Bước 1: Kiểm tra và khởi tạo database...")
+    # Migration staging đổi (vd: khoá link_hash) trên bảng đã có dữ liệu → đo trước / sau để so sánh
+    measure = (config.STAGING_SQL_MIGRATE_FILE in db_migrations.pending_scripts([config.STAGING_SQL_MIGRATE_FILE])
+               and staging_exists())
+    if measure:
+        log_staging_stats("trước migrate")
+    # Tạo DB + bảng xe_bonbanh, migration bảng cũ, SP transform từng dòng, bảng landing + SP set-based
+    # File nào có checksum không đổi từ lần chạy trước thì bỏ qua
+    db_migrations.apply_scripts(db_migrations.STAGING_SCRIPTS, logger)
+    if measure:
+        log_staging_stats("sau migrate")
+    logger.info("Khởi tạo database hoàn tất!\n")
 
-    # 4.4 Kết nối lại vào bonbanh_staging
-    conn = mysql.connector.connect(**DB_CONFIG)
+# =========================== Đọc CSV theo khối + luồng ghi DB riêng ===========================
+def read_chunks(csv_file):
+    """Đọc CSV từng khối STAGING_CSV_CHUNK_ROWS dòng (dtype=str, đã fillna("")).
+    Index của DataFrame liên tục qua các khối → dòng trong file = index + 2."""
+    reader = pd.read_csv(csv_file, encoding="utf-8-sig", dtype=str,
+                         chunksize=config.STAGING_CSV_CHUNK_ROWS)
+    for chunk in reader:
+        chunk.columns = [c.strip() for c in chunk.columns]
+        yield chunk.fillna("")
+
+def partition_of(chunk, partitions):
+    """Số partition cho từng dòng theo hash(Link xe) - ổn định giữa các lần chạy,
+    cùng 1 link luôn vào cùng 1 partition (giữ thứ tự dòng sau ghi đè dòng trước).
+    Chuẩn hoá link như link_hash để 2 link cùng khoá không rơi vào 2 partition."""
+    links = chunk["Link xe"] if "Link xe" in chunk.columns else pd.Series("", index=chunk.index)
+    links = links.str.strip(" ").str.lower()
+    return pd.util.hash_pandas_object(links, index=False).to_numpy() % partitions
+
+def make_pool(size):
+    return mysql.connector.pooling.MySQLConnectionPool(
+        pool_name="staging_load", pool_size=size, **DB_CONFIG)
+
+class ChunkWriter(threading.Thread):
+    """Luồng ghi DB của 1 partition, connection lấy từ pool: nhận từng khối qua hàng đợi
+    có giới hạn, gọi write_chunk(conn, cursor, chunk) → Counter(ok, total, inserted, updated, unchanged)
+    rồi commit 1 lần / khối. Khối lỗi (mất kết nối, deadlock...) được rollback và thử lại
+    tối đa STAGING_PARTITION_RETRIES lần với connection mới.
+    Đọc + transform khối sau chạy song song với ghi khối trước."""
+
+    def __init__(self, write_chunk, pool, partition=0, max_chunks=None):
+        super().__init__(name=f"staging-writer-{partition}", daemon=True)
+        self.write_chunk = write_chunk
+        self.pool = pool
+        self.partition = partition
+        self._queue = queue.Queue(maxsize=max_chunks or config.STAGING_WRITER_QUEUE_CHUNKS)
+        self.stats = Counter()
+        self.retries = 0
+        self.error = None
+
+    def put(self, chunk):
+        self._queue.put(chunk)
+
+    def _write(self, chunk):
+        for attempt in range(config.STAGING_PARTITION_RETRIES + 1):
+            conn = self.pool.get_connection()
+            cursor = conn.cursor()
+            try:
+                result = self.write_chunk(conn, cursor, chunk)
+                conn.commit()
+                return result
+            except Error as e:
+                try:
+                    conn.rollback()
+                except Error:
+                    pass
+                if attempt >= config.STAGING_PARTITION_RETRIES:
+                    raise
+                self.retries += 1
+                logger.warning("Partition %d: lỗi ghi khối (%s) → thử lại lần %d",
+                               self.partition, e, attempt + 1)
+                time.sleep(min(2 ** attempt, 10))
+            finally:
+                cursor.close()
+                conn.close()  # Trả connection về pool
+
+    def run(self):
+        try:
+            while True:
+                chunk = self._queue.get()
+                if chunk is None:
+                    break
+                self.stats.update(self._write(chunk))
+        except Exception as e:
+            self.error = e
+            logger.exception("Partition %d: luồng ghi DB dừng vì lỗi: %s", self.partition, e)
+            # Vẫn lấy hết hàng đợi để luồng đọc không bị chặn ở put()
+            while self._queue.get() is not None:
+                pass
+
+    def close(self):
+        """Báo hết dữ liệu, chờ ghi xong."""
+        self._queue.put(None)
+        self.join()
+
+def stream_csv(write_chunk, transform=None):
+    partitions = min(max(1, config.STAGING_PARALLEL_WORKERS), 32)  # Pool mysql-connector tối đa 32 connection
+    pool = make_pool(partitions)
+    writers = [ChunkWriter(write_chunk, pool, p) for p in range(partitions)]
+    for writer in writers:
+        writer.start()
+
+    started_at = time.monotonic()
+    logger.info("Đang đọc %s theo khối %d dòng, ghi song song %d partition...",
+                CSV_FILE, config.STAGING_CSV_CHUNK_ROWS, partitions)
+    try:
+        for chunk in read_chunks(CSV_FILE):
+            parts = partition_of(chunk, partitions) if partitions > 1 else None
+            for writer in writers:
+                part = chunk if parts is None else chunk[parts == writer.partition]
+                if len(part):
+                    writer.put(transform(part) if transform else part)
+            if any(writer.error is not None for writer in writers):
+                break
+            done = sum(writer.stats["total"] for writer in writers)
+            elapsed = time.monotonic() - started_at
+            logger.info("   Đã đẩy %d dòng (%.0f dòng/s)", done, done / elapsed if elapsed > 0 else 0)
+    finally:
+        for writer in writers:
+            writer.close()
+
+    errors = [writer.error for writer in writers if writer.error is not None]
+    if errors:
+        raise errors[0]
+    stats = sum((writer.stats for writer in writers), Counter())
+    elapsed = time.monotonic() - started_at
+    logger.info("Ghi %d dòng trong %.1fs (%.0f dòng/s, %d lần thử lại)", stats["total"], elapsed,
+                stats["total"] / elapsed if elapsed > 0 else 0, sum(writer.retries for writer in writers))
+    return stats
+
+# =========================== Chế độ procedure: gọi SP từng dòng ===========================
+def write_rows_sp(conn, cursor, chunk):
+    cursor.execute("SET @n_inserted = 0, @n_updated = 0, @n_unchanged = 0")
+    cnt = 0
+    for idx, row in zip(chunk.index, chunk.itertuples(index=False, name=None)):
+        params = dict(zip(chunk.columns, row))
+        try:
+            # Gọi SP transform từng dòng
+            cursor.execute("CALL sp_transform_row(%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s)",
+                           tuple(params.get(col, "") for col in config.CSV_COLUMNS))
+            cnt += 1
+        except Error as e:
+            if not conn.is_connected():
+                raise  # Mất kết nối → để ChunkWriter thử lại cả khối
+            # Ghi log lỗi + link xe để dễ debug sau
+            logger.error("Lỗi dòng %d: %s", idx + 2, e)
+            logger.error("   Link: %s", params.get("Link xe", "N/A"))
+    stats = read_load_counters(cursor)
+    stats.update(ok=cnt, total=len(chunk))
+    return stats
+
+def load_rows():
+    # 7-8. Đọc CSV theo khối → luồng ghi gọi SP từng dòng, commit mỗi khối
+    return stream_csv(write_rows_sp)
+
+# =========================== Chế độ bulk: landing + transform set-based ===========================
+def insert_landing_batches(cursor, csv_file):
+    """Dự phòng khi server tắt local_infile: đọc CSV và gửi multi-row INSERT theo lô."""
+    sql = "INSERT INTO xe_bonbanh_landing ({}) VALUES ({})".format(
+        ", ".join(LANDING_COLUMNS), ", ".join(["%s"] * len(LANDING_COLUMNS)))
+    width = len(LANDING_COLUMNS)
+    batch = []
+    with open(csv_file, "r", encoding="utf-8-sig", newline="") as f:
+        reader = csv.reader(f)
+        next(reader, None)  # Bỏ header
+        for row in reader:
+            batch.append(tuple((row + [""] * width)[:width]))
+            if len(batch) >= config.STAGING_BULK_INSERT_BATCH:
+                cursor.executemany(sql, batch)
+                batch = []
+    if batch:
+        cursor.executemany(sql, batch)
+
+def load_bulk():
+    conn = mysql.connector.connect(**DB_CONFIG, allow_local_infile=True)
     cursor = conn.cursor()
 
-    # 5 Kiểm tra bảng xe_bonbanh tồn tại chưa?
-    if not table_exists(cursor):
-        logger.info("→ Bảng 'xe_bonbanh' chưa tồn tại → đang tạo...")
-        execute_sql_file(cursor, SQL_SCHEMA_FILE)           # DROP + CREATE bảng
-    else:
-        logger.info("→ Bảng 'xe_bonbanh' đã tồn tại.")
+    # 7. Đổ CSV vào bảng landing
+    cursor.execute("TRUNCATE TABLE xe_bonbanh_landing")
+    logger.info("Đang nạp %s vào bảng landing...", CSV_FILE)
+    try:
+        cursor.execute(f"""
+            LOAD DATA LOCAL INFILE %s INTO TABLE xe_bonbanh_landing
+            CHARACTER SET utf8mb4
+            FIELDS TERMINATED BY ',' OPTIONALLY ENCLOSED BY '"' ESCAPED BY ''
+            LINES TERMINATED BY '\\r\\n'
+            IGNORE 1 LINES
+            ({", ".join(LANDING_COLUMNS)})
+        """, (os.path.abspath(CSV_FILE),))
+    except Error as e:
+        logger.warning("Không dùng được LOAD DATA LOCAL INFILE (%s) → chuyển sang multi-row INSERT", e)
+        conn.rollback()
+        cursor.execute("TRUNCATE TABLE xe_bonbanh_landing")
+        insert_landing_batches(cursor, CSV_FILE)
+    conn.commit()
 
-    # 6.1 Kiểm tra Stored Procedure sp_transform_row tồn tại chưa?
-    if not procedure_exists(cursor):
-        logger.info("→ Stored Procedure chưa tồn tại → đang tạo...")
-        execute_sql_file(cursor, SQL_SP_FILE)               # Tạo SP transform
-    else:
-        logger.info("→ Stored Procedure 'sp_transform_row' đã tồn tại.")
+    cursor.execute("SELECT COUNT(*) FROM xe_bonbanh_landing")
+    total = cursor.fetchone()[0]
 
+    # 8. Transform set-based landing → xe_bonbanh (1 câu INSERT ... SELECT ... ON DUPLICATE KEY UPDATE)
+    logger.info("Bắt đầu transform %d bản ghi (set-based)...", total)
+    cursor.execute("CALL sp_transform_landing()")
+    stats = read_load_counters(cursor)
     conn.commit()
+
     cursor.close()
     conn.close()
-    logger.info("Khởi tạo database hoàn tất!\n")
+    stats.update(ok=total, total=total)
+    return stats
+
+# =========================== Chế độ python: parse bằng pandas + upsert theo lô ===========================
+def upsert_sql():
+    cols = staging_transform.STAGING_COLUMNS
+    updates = [f"{c} = VALUES({c})" for c in cols if c != "link_xe"] + ["updated_at = CURRENT_TIMESTAMP"]
+    return "INSERT INTO xe_bonbanh ({}) VALUES ({}) ON DUPLICATE KEY UPDATE {}".format(
+        ", ".join(cols), ", ".join(["%s"] * len(cols)), ", ".join(updates))
+
+def normalize_chunk(chunk):
+    """Khối CSV raw → (số dòng trong file của từng dòng, list tuple đã chuẩn hoá)."""
+    return list(chunk.index + 2), staging_transform.to_rows(staging_transform.normalize_frame(chunk))
+
+LINK_POS = staging_transform.STAGING_COLUMNS.index("link_xe")
+HASH_POS = staging_transform.STAGING_COLUMNS.index("row_hash")
+
+def fetch_row_hashes(cursor, keys, batch_size):
+    """link_hash → row_hash đang lưu của các tin trong khối."""
+    existing = {}
+    keys = list(dict.fromkeys(keys))
+    for start in range(0, len(keys), batch_size):
+        batch = keys[start:start + batch_size]
+        cursor.execute("SELECT link_hash, row_hash FROM xe_bonbanh WHERE link_hash IN ({})".format(
+            ", ".join(["%s"] * len(batch))), batch)
+        existing.update((bytes(key), row_hash) for key, row_hash in cursor.fetchall())
+    return existing
+
+def classify_rows(lines, rows, keys, existing):
+    """Bỏ các dòng có hash trùng bản đang lưu; đếm mới / đổi / không đổi.
+    Link trùng trong khối: so với dòng trước đó của chính khối (dòng sau ghi đè dòng trước)."""
+    stats = Counter()
+    keep_lines, keep_rows = [], []
+    for line, row, key in zip(lines, rows, keys):
+        if key in existing and existing[key] == row[HASH_POS]:
+            stats["unchanged"] += 1
+            continue
+        stats["updated" if key in existing else "inserted"] += 1
+        existing[key] = row[HASH_POS]
+        keep_lines.append(line)
+        keep_rows.append(row)
+    return keep_lines, keep_rows, stats
+
+def write_rows_upsert(conn, cursor, chunk):
+    lines, rows = chunk
+    sql = upsert_sql()
+    batch_size = config.STAGING_BULK_INSERT_BATCH
+    total = len(rows)
+    keys = [staging_transform.link_key(row[LINK_POS]) for row in rows]
+    existing = fetch_row_hashes(cursor, keys, batch_size)
+    lines, rows, stats = classify_rows(lines, rows, keys, existing)
+    stats.update(total=total)
+    try:
+        for start in range(0, len(rows), batch_size):
+            cursor.executemany(sql, rows[start:start + batch_size])
+        stats.update(ok=total)
+        return stats
+    except Error as e:
+        if not conn.is_connected():
+            raise  # Mất kết nối → để ChunkWriter thử lại cả khối
+        # Khối lỗi → rollback cả khối rồi thử lại từng dòng để chỉ bỏ dòng hỏng
+        conn.rollback()
+        logger.warning("Lỗi khối %d dòng (%d-%d) (%s) → thử lại từng dòng",
+                       len(rows), lines[0], lines[-1], e)
+    cnt = stats["unchanged"]
+    for line, params in zip(lines, rows):
+        try:
+            cursor.execute(sql, params)
+            cnt += 1
+        except Error as e:
+            if not conn.is_connected():
+                raise
+            logger.error("Lỗi dòng %d: %s", line, e)
+            logger.error("   Link: %s", params[LINK_POS])
+    stats.update(ok=cnt)
+    return stats
+
+def load_python():
+    # 7-8. Đọc CSV theo khối, chuẩn hoá vectorized từng khối → luồng ghi upsert multi-row
+    return stream_csv(write_rows_upsert, normalize_chunk)
 
 # =========================== Hàm chính ===========================
 def main():
@@ -154,46 +387,24 @@ def main():
         logger.info("Chạy lệnh: python get_data.py")
         return
 
-    # =========================== 7. Đọc CSV bằng pandas ===========================
-    logger.info("Đang đọc %s...", CSV_FILE)
-    df = pd.read_csv(CSV_FILE, encoding="utf-8-sig", dtype=str).fillna("")
-    df.columns = [c.strip() for c in df.columns]
+    if config.STAGING_LOAD_MODE == "bulk":
+        stats = load_bulk()
+    elif config.STAGING_LOAD_MODE == "python":
+        stats = load_python()
+    else:
+        stats = load_rows()
+
+    # =========================== 9. Kết thúc - ghi log tổng kết ===========================
+    logger.info("HOÀN TẤT! Đã xử lý %d/%d bản ghi thành công!", stats["ok"], stats["total"])
+    logger.info("   Thêm mới: %d | Cập nhật: %d | Không đổi (bỏ qua): %d",
+                stats["inserted"], stats["updated"], stats["unchanged"])
 
-    # =========================== 8. Load dữ liệu vào staging ===========================
     conn = mysql.connector.connect(**DB_CONFIG)
     cursor = conn.cursor()
-    total = len(df)
-    cnt = 0
-
-    logger.info("Bắt đầu đẩy %d bản ghi vào MySQL...", total)
-
-    for idx, row in df.iterrows():
-        params = tuple(row.get(col, "") for col in [
-            "Loại xe + Năm SX", "Tên xe", "Giá xe_raw", "Nơi bán", "Liên hệ", "Link xe",
-            "Ngày đăng", "Lượt xem", "Số Km đã đi:", "Tình trạng:", "Xuất xứ:", "Kiểu dáng:",
-            "Động cơ:", "Màu ngoại thất:", "Màu nội thất:", "Số chỗ ngồi:", "Số cửa:", "Năm sản xuất:"
-        ])
-        try:
-            # Gọi SP transform từng dòng
-            cursor.execute("CALL sp_transform_row(%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s)", params)
-            cnt += 1
-            # Commit mỗi 100 bản ghi để giảm tải
-            if cnt % 100 == 0:
-                conn.commit()
-                logger.info("   Đã đẩy %d/%d...", cnt, total)
-        except Error as e:
-            # Ghi log lỗi + link xe để dễ debug sau
-            logger.error("Lỗi dòng %d: %s", idx+2, e)
-            logger.error("   Link: %s", row.get("Link xe", "N/A"))
-
-    # Commit cuối cùng
-    conn.commit()
+    log_index_sizes(logger, cursor, "bonbanh_staging", "xe_bonbanh")
     cursor.close()
     conn.close()
 
-    # =========================== 9. Kết thúc - ghi log tổng kết ===========================
-    logger.info("HOÀN TẤT! Đã xử lý %d/%d bản ghi thành công!", cnt, total)
-
 # =========================== Chạy script ===========================
 if __name__ == "__main__":
     main()
\ No newline at end of file
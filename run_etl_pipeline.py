@@ -5,6 +5,7 @@ import sys
 import subprocess
 from datetime import datetime
 from  load_to_controler import  ETLLogger  # <-- THÊM DÒNG NÀY
+import db_migrations
 
 # =========================== Cấu hình logging file (giữ nguyên) ===========================
 LOG_DIR = "logs"
@@ -64,6 +65,13 @@ def main():
     # Khởi tạo DB Logger
     db_logger = ETLLogger("BonBanh Full ETL Pipeline")
 
+    # Chạy các file SQL schema / migration / procedure đã đổi (không đổi → 1 câu SELECT checksum)
+    # Lỗi ở đây không dừng pipeline: bước tương ứng sẽ tự chạy lại và báo lỗi
+    try:
+        db_migrations.apply_scripts(db_migrations.ALL_SCRIPTS, logger)
+    except Exception as e:
+        logger.error("Lỗi khi chạy migration SQL: %s", e)
+
     steps = [
         ("1. Thu thập dữ liệu (Crawl)",     "get_data.py",         1),
         ("2. Load vào Staging",             "load_to_staging.py",  2),
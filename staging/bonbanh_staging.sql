@@ -23,6 +23,11 @@ CREATE TABLE IF NOT EXISTS xe_bonbanh (
   so_cho_ngoi VARCHAR(32),
   so_cua VARCHAR(32),
   nam_san_xuat VARCHAR(32),
+  row_hash CHAR(32) DEFAULT NULL,   -- MD5 18 cột raw (CHAR(31) ngăn cách): trùng → bỏ qua, không ghi lại
+  -- Khoá tin đăng: MD5 16 byte của link đã chuẩn hoá (bỏ dấu cách 2 đầu, chữ thường)
+  -- thay cho UNIQUE(link_xe(700)) - index hẹp, so sánh cố định 16 byte
+  link_hash BINARY(16) AS (UNHEX(MD5(LOWER(TRIM(link_xe))))) STORED,
   updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
-  UNIQUE KEY ux_link (link_xe(700))
+  UNIQUE KEY ux_link_hash (link_hash),
+  INDEX idx_updated_at (updated_at)   -- DW load incremental theo watermark
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
\ No newline at end of file
@@ -0,0 +1,155 @@
+USE bonbanh_staging;
+
+-- ========================
+--  BẢNG LANDING: dữ liệu thô từ CSV (LOAD DATA LOCAL INFILE / multi-row INSERT)
+--  Kiểu cột giống tham số của sp_transform_row
+-- ========================
+CREATE TABLE IF NOT EXISTS xe_bonbanh_landing (
+  line_no BIGINT AUTO_INCREMENT PRIMARY KEY,
+  loai_xe_nam_sx VARCHAR(255),
+  ten_xe VARCHAR(512),
+  gia_xe_raw VARCHAR(255),
+  noi_ban VARCHAR(255),
+  lien_he TEXT,
+  link_xe VARCHAR(1024),
+  ngay_dang_raw VARCHAR(50),
+  luot_xem_raw VARCHAR(50),
+  so_km_raw VARCHAR(50),
+  tinh_trang VARCHAR(128),
+  xuat_xu VARCHAR(128),
+  kieu_dang VARCHAR(128),
+  dong_co VARCHAR(128),
+  mau_ngoai_that VARCHAR(128),
+  mau_noi_that VARCHAR(128),
+  so_cho_ngoi VARCHAR(32),
+  so_cua VARCHAR(32),
+  nam_san_xuat VARCHAR(32)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+
+-- ========================
+--  TẠO PROCEDURE: transform toàn bộ landing → xe_bonbanh bằng 1 câu INSERT ... SELECT
+--  Cùng quy tắc parse giá / km / ngày / lượt xem với sp_transform_row
+--  Link trùng trong cùng file → chỉ lấy dòng cuối (line_no lớn nhất), như gọi từng dòng
+--  Tin đã có với cùng row_hash → không ghi lại (updated_at giữ nguyên)
+--  Đếm kết quả vào biến session @n_inserted / @n_updated / @n_unchanged
+-- ========================
+
+DROP PROCEDURE IF EXISTS sp_transform_landing;
+DELIMITER $$
+
+CREATE PROCEDURE sp_transform_landing()
+BEGIN
+  -- Đếm trước khi ghi: mới / đổi / không đổi (theo dòng cuối của mỗi link)
+  SELECT COUNT(*), COALESCE(SUM(x.id IS NULL), 0), COALESCE(SUM(x.row_hash <=> h.row_hash), 0)
+    INTO @n_candidates, @n_inserted, @n_unchanged
+  FROM (
+    SELECT UNHEX(MD5(LOWER(TRIM(l.link_xe)))) AS link_hash,
+      MD5(CONCAT_WS(CHAR(31),
+        l.loai_xe_nam_sx, l.ten_xe, l.gia_xe_raw, l.noi_ban, l.lien_he, l.link_xe,
+        l.ngay_dang_raw, l.luot_xem_raw, l.so_km_raw, l.tinh_trang, l.xuat_xu, l.kieu_dang,
+        l.dong_co, l.mau_ngoai_that, l.mau_noi_that, l.so_cho_ngoi, l.so_cua, l.nam_san_xuat)) AS row_hash
+    FROM xe_bonbanh_landing l
+    JOIN (SELECT MAX(line_no) AS line_no FROM xe_bonbanh_landing
+          GROUP BY UNHEX(MD5(LOWER(TRIM(link_xe))))) last_line
+      ON last_line.line_no = l.line_no
+  ) h
+  LEFT JOIN xe_bonbanh x ON x.link_hash = h.link_hash;
+  SET @n_updated = @n_candidates - @n_inserted - @n_unchanged;
+
+  INSERT INTO xe_bonbanh (
+    loai_xe_nam_sx, ten_xe, gia_xe_raw, gia_xe_vnd, noi_ban, lien_he, link_xe,
+    ngay_dang, luot_xem, so_km, tinh_trang, xuat_xu, kieu_dang, dong_co,
+    mau_ngoai_that, mau_noi_that, so_cho_ngoi, so_cua, nam_san_xuat, row_hash
+  )
+  SELECT
+    p.loai_xe_nam_sx,
+    p.ten_xe,
+    p.gia_xe_raw,
+    -- Parse giá: Tỷ + Triệu, nếu = 0 thì lấy toàn bộ chữ số (chỉ khi có chữ Triệu/Tr)
+    CASE
+      WHEN p.gia_xe_raw IS NULL OR p.gia_xe_raw = '' THEN NULL
+      WHEN p.price_ty + p.price_tr <> 0 THEN p.price_ty + p.price_tr
+      WHEN p.price_digits = '' THEN 0
+      WHEN p.gia_xe_raw LIKE '%Triệu%' OR p.gia_xe_raw LIKE '%Tr%' THEN CAST(p.price_digits AS UNSIGNED) * 1000000
+      ELSE NULL
+    END,
+    p.noi_ban,
+    p.lien_he,
+    p.link_xe,
+    -- Parse ngày dd/mm/yyyy: chỉ gọi STR_TO_DATE với ngày có thật. Trong INSERT ... SELECT, chuỗi sai
+    -- (STRICT_TRANS_TABLES) là lỗi 1411 làm hỏng cả lô, còn sp_transform_row (SET biến) chỉ ra NULL.
+    -- CASE xét lần lượt → không hàm nào nhận chuỗi sai định dạng
+    CASE
+      WHEN NOT p.ngay_ok OR p.ngay_ok IS NULL THEN NULL
+      WHEN p.ngay_month NOT BETWEEN 1 AND 12 OR p.ngay_year = 0 THEN NULL
+      WHEN p.ngay_day NOT BETWEEN 1 AND DAY(LAST_DAY(MAKEDATE(p.ngay_year, 1) + INTERVAL (p.ngay_month - 1) MONTH)) THEN NULL
+      ELSE STR_TO_DATE(p.ngay_dang_raw, '%d/%m/%Y')
+    END,
+    -- Parse lượt xem, km: bỏ ký tự không phải số
+    CAST(NULLIF(REGEXP_REPLACE(p.luot_xem_raw, '[^0-9]', ''), '') AS UNSIGNED),
+    CAST(NULLIF(REGEXP_REPLACE(p.so_km_raw, '[^0-9]', ''), '') AS UNSIGNED),
+    p.tinh_trang,
+    p.xuat_xu,
+    p.kieu_dang,
+    p.dong_co,
+    p.mau_ngoai_that,
+    p.mau_noi_that,
+    p.so_cho_ngoi,
+    p.so_cua,
+    p.nam_san_xuat,
+    p.row_hash
+  FROM (
+    SELECT
+      l.*,
+      UNHEX(MD5(LOWER(TRIM(l.link_xe)))) AS link_hash,
+      -- Tỷ
+      COALESCE(CAST(NULLIF(REGEXP_SUBSTR(l.gia_xe_raw, '[0-9]+(?= *[Tt](ỷ|y))'), '') AS UNSIGNED), 0) * 1000000000 AS price_ty,
+      -- Triệu hoặc Tr.
+      COALESCE(CAST(NULLIF(REGEXP_SUBSTR(l.gia_xe_raw, '[0-9]+(?= *(Triệu|Tr\.?|Tr ))'), '') AS UNSIGNED), 0) * 1000000 AS price_tr,
+      REGEXP_REPLACE(l.gia_xe_raw, '[^0-9]', '') AS price_digits,
+      -- Ngày đúng dạng dd/mm/yyyy → tách dd / mm / yyyy (tối đa 4 chữ số, CAST không tràn); sai dạng → NULL
+      l.ngay_dang_raw REGEXP '^[0-9]{1,2}/[0-9]{1,2}/[0-9]{4}$' AS ngay_ok,
+      CASE WHEN l.ngay_dang_raw REGEXP '^[0-9]{1,2}/[0-9]{1,2}/[0-9]{4}$'
+        THEN CAST(SUBSTRING_INDEX(l.ngay_dang_raw, '/', 1) AS UNSIGNED) END AS ngay_day,
+      CASE WHEN l.ngay_dang_raw REGEXP '^[0-9]{1,2}/[0-9]{1,2}/[0-9]{4}$'
+        THEN CAST(SUBSTRING_INDEX(SUBSTRING_INDEX(l.ngay_dang_raw, '/', 2), '/', -1) AS UNSIGNED) END AS ngay_month,
+      CASE WHEN l.ngay_dang_raw REGEXP '^[0-9]{1,2}/[0-9]{1,2}/[0-9]{4}$'
+        THEN CAST(SUBSTRING_INDEX(l.ngay_dang_raw, '/', -1) AS UNSIGNED) END AS ngay_year,
+      MD5(CONCAT_WS(CHAR(31),
+        l.loai_xe_nam_sx, l.ten_xe, l.gia_xe_raw, l.noi_ban, l.lien_he, l.link_xe,
+        l.ngay_dang_raw, l.luot_xem_raw, l.so_km_raw, l.tinh_trang, l.xuat_xu, l.kieu_dang,
+        l.dong_co, l.mau_ngoai_that, l.mau_noi_that, l.so_cho_ngoi, l.so_cua, l.nam_san_xuat)) AS row_hash
+    FROM xe_bonbanh_landing l
+    JOIN (SELECT MAX(line_no) AS line_no FROM xe_bonbanh_landing
+          GROUP BY UNHEX(MD5(LOWER(TRIM(link_xe))))) last_line
+      ON last_line.line_no = l.line_no
+  ) p
+  -- Bỏ tin không đổi: không có dòng khớp link + cùng hash
+  WHERE NOT EXISTS (
+    SELECT 1 FROM xe_bonbanh x WHERE x.link_hash = p.link_hash AND x.row_hash = p.row_hash
+  )
+  ON DUPLICATE KEY UPDATE
+    loai_xe_nam_sx = VALUES(loai_xe_nam_sx),
+    ten_xe = VALUES(ten_xe),
+    gia_xe_raw = VALUES(gia_xe_raw),
+    gia_xe_vnd = VALUES(gia_xe_vnd),
+    noi_ban = VALUES(noi_ban),
+    lien_he = VALUES(lien_he),
+    ngay_dang = VALUES(ngay_dang),
+    luot_xem = VALUES(luot_xem),
+    so_km = VALUES(so_km),
+    tinh_trang = VALUES(tinh_trang),
+    xuat_xu = VALUES(xuat_xu),
+    kieu_dang = VALUES(kieu_dang),
+    dong_co = VALUES(dong_co),
+    mau_ngoai_that = VALUES(mau_ngoai_that),
+    mau_noi_that = VALUES(mau_noi_that),
+    so_cho_ngoi = VALUES(so_cho_ngoi),
+    so_cua = VALUES(so_cua),
+    nam_san_xuat = VALUES(nam_san_xuat),
+    row_hash = VALUES(row_hash),
+    updated_at = CURRENT_TIMESTAMP;
+
+END$$
+DELIMITER ;
@@ -0,0 +1,56 @@
+USE bonbanh_staging;
+
+-- ========================
+--  MIGRATION bảng xe_bonbanh tạo từ phiên bản cũ (kiểm tra information_schema, chạy lại không sao)
+--  1. Thêm cột row_hash (bỏ qua tin không đổi)
+--  2. Thay UNIQUE(link_xe(700)) bằng cột sinh link_hash BINARY(16) + UNIQUE(link_hash)
+--     Link chỉ khác dấu cách đầu chuỗi trước đây là 2 tin → giữ bản ghi mới nhất (id lớn nhất)
+--  3. Index updated_at cho DW load incremental theo watermark
+-- ========================
+
+DROP PROCEDURE IF EXISTS sp_migrate_xe_bonbanh;
+DELIMITER $$
+
+CREATE PROCEDURE sp_migrate_xe_bonbanh()
+BEGIN
+  IF NOT EXISTS (
+    SELECT 1 FROM information_schema.COLUMNS
+    WHERE TABLE_SCHEMA = 'bonbanh_staging' AND TABLE_NAME = 'xe_bonbanh' AND COLUMN_NAME = 'row_hash'
+  ) THEN
+    ALTER TABLE xe_bonbanh ADD COLUMN row_hash CHAR(32) DEFAULT NULL AFTER nam_san_xuat;
+  END IF;
+
+  IF NOT EXISTS (
+    SELECT 1 FROM information_schema.COLUMNS
+    WHERE TABLE_SCHEMA = 'bonbanh_staging' AND TABLE_NAME = 'xe_bonbanh' AND COLUMN_NAME = 'link_hash'
+  ) THEN
+    ALTER TABLE xe_bonbanh
+      ADD COLUMN link_hash BINARY(16) AS (UNHEX(MD5(LOWER(TRIM(link_xe))))) STORED AFTER row_hash,
+      ADD INDEX ix_link_hash_tmp (link_hash);
+
+    DELETE x FROM xe_bonbanh x
+    JOIN xe_bonbanh y ON y.link_hash = x.link_hash AND y.id > x.id;
+
+    ALTER TABLE xe_bonbanh
+      ADD UNIQUE KEY ux_link_hash (link_hash),
+      DROP INDEX ix_link_hash_tmp;
+  END IF;
+
+  IF EXISTS (
+    SELECT 1 FROM information_schema.STATISTICS
+    WHERE TABLE_SCHEMA = 'bonbanh_staging' AND TABLE_NAME = 'xe_bonbanh' AND INDEX_NAME = 'ux_link'
+  ) THEN
+    ALTER TABLE xe_bonbanh DROP INDEX ux_link;
+  END IF;
+
+  IF NOT EXISTS (
+    SELECT 1 FROM information_schema.STATISTICS
+    WHERE TABLE_SCHEMA = 'bonbanh_staging' AND TABLE_NAME = 'xe_bonbanh' AND INDEX_NAME = 'idx_updated_at'
+  ) THEN
+    ALTER TABLE xe_bonbanh ADD INDEX idx_updated_at (updated_at);
+  END IF;
+END$$
+DELIMITER ;
+
+CALL sp_migrate_xe_bonbanh();
+DROP PROCEDURE IF EXISTS sp_migrate_xe_bonbanh;
@@ -24,13 +24,20 @@ CREATE TABLE IF NOT EXISTS xe_bonbanh (
   so_cho_ngoi VARCHAR(32),
   so_cua VARCHAR(32),
   nam_san_xuat VARCHAR(32),
+  row_hash CHAR(32) DEFAULT NULL,   -- MD5 18 cột raw (CHAR(31) ngăn cách): trùng → bỏ qua, không ghi lại
+  -- Khoá tin đăng: MD5 16 byte của link đã chuẩn hoá (bỏ dấu cách 2 đầu, chữ thường)
+  -- thay cho UNIQUE(link_xe(700)) - index hẹp, so sánh cố định 16 byte
+  link_hash BINARY(16) AS (UNHEX(MD5(LOWER(TRIM(link_xe))))) STORED,
   updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
-  UNIQUE KEY ux_link (link_xe(700))
+  UNIQUE KEY ux_link_hash (link_hash),
+  INDEX idx_updated_at (updated_at)   -- DW load incremental theo watermark
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
 
 
 -- ========================
 --  TẠO PROCEDURE
+--  Tin đã có với cùng row_hash → bỏ qua (không parse, không ghi, không đổi updated_at)
+--  Đếm kết quả vào biến session @n_inserted / @n_updated / @n_unchanged
 -- ========================
 
 DROP PROCEDURE IF EXISTS sp_transform_row;
@@ -56,7 +63,7 @@ CREATE PROCEDURE sp_transform_row(
   IN p_so_cua VARCHAR(32),
   IN p_nam_sx VARCHAR(32)
 )
-BEGIN
+proc: BEGIN
   DECLARE v_price_ty BIGINT DEFAULT 0;
   DECLARE v_price_tr BIGINT DEFAULT 0;
   DECLARE v_price BIGINT DEFAULT NULL;
@@ -64,6 +71,23 @@ BEGIN
   DECLARE v_ngay DATE DEFAULT NULL;
   DECLARE v_luot INT DEFAULT NULL;
   DECLARE v_tmp VARCHAR(255);
+  DECLARE v_hash CHAR(32);
+  DECLARE v_found INT DEFAULT 0;
+  DECLARE v_old_hash CHAR(32) DEFAULT NULL;
+
+  -- Hash nội dung raw, so với bản đang lưu
+  SET v_hash = MD5(CONCAT_WS(CHAR(31),
+    p_loai_xe_nam_sx, p_ten_xe, p_gia_raw, p_noi_ban, p_lien_he, p_link_xe,
+    p_ngay_dang_raw, p_luot_xem_raw, p_so_km_raw, p_tinh_trang, p_xuat_xu, p_kieu_dang,
+    p_dong_co, p_mau_ngoai, p_mau_noi, p_so_cho, p_so_cua, p_nam_sx));
+
+  SELECT COUNT(*), MAX(row_hash) INTO v_found, v_old_hash
+  FROM xe_bonbanh WHERE link_hash = UNHEX(MD5(LOWER(TRIM(p_link_xe))));
+
+  IF v_found > 0 AND v_old_hash = v_hash THEN
+    SET @n_unchanged = IFNULL(@n_unchanged, 0) + 1;
+    LEAVE proc;
+  END IF;
 
   -- Parse giá
   IF p_gia_raw IS NOT NULL AND p_gia_raw <> '' THEN
@@ -120,12 +144,12 @@ BEGIN
   INSERT INTO xe_bonbanh (
     loai_xe_nam_sx, ten_xe, gia_xe_raw, gia_xe_vnd, noi_ban, lien_he, link_xe,
     ngay_dang, luot_xem, so_km, tinh_trang, xuat_xu, kieu_dang, dong_co,
-    mau_ngoai_that, mau_noi_that, so_cho_ngoi, so_cua, nam_san_xuat
+    mau_ngoai_that, mau_noi_that, so_cho_ngoi, so_cua, nam_san_xuat, row_hash
   )
   VALUES (
     p_loai_xe_nam_sx, p_ten_xe, p_gia_raw, v_price, p_noi_ban, p_lien_he, p_link_xe,
     v_ngay, v_luot, v_km, p_tinh_trang, p_xuat_xu, p_kieu_dang, p_dong_co,
-    p_mau_ngoai, p_mau_noi, p_so_cho, p_so_cua, p_nam_sx
+    p_mau_ngoai, p_mau_noi, p_so_cho, p_so_cua, p_nam_sx, v_hash
   )
   ON DUPLICATE KEY UPDATE
     loai_xe_nam_sx = VALUES(loai_xe_nam_sx),
@@ -146,7 +170,14 @@ BEGIN
     so_cho_ngoi = VALUES(so_cho_ngoi),
     so_cua = VALUES(so_cua),
     nam_san_xuat = VALUES(nam_san_xuat),
+    row_hash = VALUES(row_hash),
     updated_at = CURRENT_TIMESTAMP;
 
+  IF v_found > 0 THEN
+    SET @n_updated = IFNULL(@n_updated, 0) + 1;
+  ELSE
+    SET @n_inserted = IFNULL(@n_inserted, 0) + 1;
+  END IF;
+
 END$$
 DELIMITER ;
@@ -0,0 +1,122 @@
+import hashlib
+import pandas as pd
+import numpy as np
+import config
+
+# ===========================
+# Chuẩn hoá dữ liệu raw → kiểu dữ liệu của bảng xe_bonbanh ngay trong Python
+# (thay cho phần REGEXP trong sp_transform_row, cùng quy tắc parse):
+# - Giá "1 Tỷ 250 Triệu" → 1250000000 ; "850 Triệu" → 850000000
+# - Số Km / Lượt xem: bỏ ký tự không phải số
+# - Ngày đăng dd/mm/yyyy → DATE
+# Mọi phép biến đổi chạy vectorized trên cả cột (pandas .str), giá chỉ parse 1 lần
+# cho mỗi chuỗi khác nhau rồi map lại (rất nhiều tin trùng chuỗi giá).
+# ===========================
+
+# Thứ tự cột ghi vào bonbanh_staging.xe_bonbanh
+STAGING_COLUMNS = [
+    "loai_xe_nam_sx", "ten_xe", "gia_xe_raw", "gia_xe_vnd", "noi_ban", "lien_he", "link_xe",
+    "ngay_dang", "luot_xem", "so_km", "tinh_trang", "xuat_xu", "kieu_dang", "dong_co",
+    "mau_ngoai_that", "mau_noi_that", "so_cho_ngoi", "so_cua", "nam_san_xuat", "row_hash"
+]
+
+# Cột CSV giữ nguyên (không cần parse) → cột staging
+PASSTHROUGH_COLUMNS = {
+    "Loại xe + Năm SX": "loai_xe_nam_sx",
+    "Tên xe": "ten_xe",
+    "Giá xe_raw": "gia_xe_raw",
+    "Nơi bán": "noi_ban",
+    "Liên hệ": "lien_he",
+    "Link xe": "link_xe",
+    "Tình trạng:": "tinh_trang",
+    "Xuất xứ:": "xuat_xu",
+    "Kiểu dáng:": "kieu_dang",
+    "Động cơ:": "dong_co",
+    "Màu ngoại thất:": "mau_ngoai_that",
+    "Màu nội thất:": "mau_noi_that",
+    "Số chỗ ngồi:": "so_cho_ngoi",
+    "Số cửa:": "so_cua",
+    "Năm sản xuất:": "nam_san_xuat",
+}
+
+# Giống REGEXP_SUBSTR trong sp_transform_row (collation *_ci → không phân biệt hoa thường)
+RE_PRICE_TY = r"([0-9]+)(?= *[Tt](?:ỷ|y))"
+RE_PRICE_TR = r"([0-9]+)(?= *(?:Triệu|Tr\.?|Tr ))"
+
+# Giới hạn số chuỗi giá nhớ lại (đọc theo khối vẫn giữ bộ nhớ cố định với file rất lớn)
+PRICE_CACHE_MAX = 200_000
+_price_cache = {}
+
+
+def _is_blank(s):
+    """So sánh `x <> ''` của MySQL (collation PAD SPACE): chuỗi chỉ gồm dấu cách cũng là rỗng."""
+    return s.str.strip(" ") == ""
+
+
+def _digits(s):
+    """REGEXP_REPLACE(x, '[^0-9]', '') rồi CAST AS UNSIGNED, chuỗi rỗng → NULL."""
+    digits = s.str.replace(r"[^0-9]", "", regex=True)
+    return digits.where(digits != "").astype("Int64")
+
+
+def _parse_prices(values):
+    """Parse vectorized 1 mảng chuỗi giá (đã loại trùng)."""
+    s = pd.Series(values, dtype=object)
+    ty = s.str.extract(RE_PRICE_TY, flags=2)[0].fillna("0").astype("int64") * 1_000_000_000  # 2 = re.IGNORECASE
+    tr = s.str.extract(RE_PRICE_TR, flags=2)[0].fillna("0").astype("int64") * 1_000_000
+    total = ty + tr
+    digits = s.str.replace(r"[^0-9]", "", regex=True)
+    has_tr = s.str.contains("tr", case=False, regex=False)
+    fallback = digits.where(digits != "", "0").astype("int64") * 1_000_000
+
+    price = pd.Series(np.where(total != 0, total, np.where(digits == "", 0, fallback)), dtype="Int64")
+    price[(total == 0) & (digits != "") & ~has_tr] = pd.NA
+    price[_is_blank(s)] = pd.NA
+    return price
+
+
+def parse_price_column(raw):
+    """Cột 'Giá xe_raw' → Int64 (VND). Mỗi chuỗi giá chỉ parse 1 lần trong suốt phiên chạy."""
+    raw = raw.fillna("")
+    new_values = [v for v in raw.unique() if v not in _price_cache]
+    if new_values:
+        if len(_price_cache) + len(new_values) > PRICE_CACHE_MAX:
+            _price_cache.clear()
+        _price_cache.update(zip(new_values, _parse_prices(new_values)))
+    return raw.map(_price_cache).astype("Int64")
+
+
+def link_key(link):
+    """Khoá 16 byte của tin = cột sinh link_hash: UNHEX(MD5(LOWER(TRIM(link_xe))))."""
+    return hashlib.md5(link.strip(" ").lower().encode("utf-8")).digest()
+
+
+def row_hashes(df):
+    """MD5 18 cột raw nối bằng \x1f - giống MD5(CONCAT_WS(CHAR(31), ...)) trong SP."""
+    return [
+        hashlib.md5("\x1f".join(values).encode("utf-8")).hexdigest()
+        for values in df[config.CSV_COLUMNS].itertuples(index=False, name=None)
+    ]
+
+
+def normalize_frame(df):
+    """DataFrame CSV raw (dtype=str, đã fillna("")) → DataFrame theo STAGING_COLUMNS."""
+    df = df.reindex(columns=config.CSV_COLUMNS, fill_value="").fillna("")
+    out = pd.DataFrame({dst: df[src] for src, dst in PASSTHROUGH_COLUMNS.items()}, index=df.index)
+
+    out["gia_xe_vnd"] = parse_price_column(df["Giá xe_raw"])
+    out["so_km"] = _digits(df["Số Km đã đi:"])
+    out["luot_xem"] = _digits(df["Lượt xem"])
+    ngay = pd.to_datetime(df["Ngày đăng"], format="%d/%m/%Y", errors="coerce")
+    out["ngay_dang"] = ngay.dt.date.where(ngay.notna(), None)
+    out["row_hash"] = row_hashes(df)
+    return out[STAGING_COLUMNS]
+
+
+def to_rows(frame):
+    """DataFrame đã chuẩn hoá → list tuple cho executemany (NA → None, numpy int → int)."""
+    records = frame.astype(object).where(frame.notna(), None)
+    return [
+        tuple(int(v) if isinstance(v, np.integer) else v for v in row)
+        for row in records.itertuples(index=False, name=None)
+    ]
@@ -0,0 +1,112 @@
+"""So business_key VARCHAR(64) (MD5 hex, utf8mb4) với BINARY(16) (UNHEX) trên 2 bảng dimension giả lập.
+
+    python tests/bench_business_keys.py                    # 500k key
+    python tests/bench_business_keys.py --rows 2000000 --buffer-pool
+
+Chạy trong schema riêng bonbanh_bench_keys (tạo rồi xoá), không đụng tới staging / DW.
+In kích thước index (mysql.innodb_index_stats), thời gian tra surrogate_key theo lô IN (...) như
+dw_python_loader và thời gian upsert ON DUPLICATE KEY UPDATE như sp_load_dim_*.
+Không phải test (pytest không thu thập file này).
+"""
+import argparse
+import hashlib
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import mysql.connector  # noqa: E402
+
+import config  # noqa: E402
+from db_stats import buffer_pool_sizes, index_sizes  # noqa: E402
+
+SCHEMA = "bonbanh_bench_keys"
+BATCH = 1000
+
+# Cùng cấu trúc dimension trước / sau migration của dataWarehouse/db_dw_setup.sql
+LAYOUTS = {
+    "varchar": ("VARCHAR(64)", lambda digest: digest.hex()),
+    "binary": ("BINARY(16)", lambda digest: digest),
+}
+
+
+def create_table(cursor, name, key_type):
+    cursor.execute(f"""
+        CREATE TABLE {SCHEMA}.dim_{name} (
+            surrogate_key BIGINT AUTO_INCREMENT PRIMARY KEY,
+            business_key {key_type} UNIQUE,
+            lien_he VARCHAR(255),
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+    """)
+
+
+def timed(work):
+    started = time.perf_counter()
+    work()
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark business_key VARCHAR(64) vs BINARY(16)")
+    parser.add_argument("--rows", type=int, default=500_000, help="Số key trong mỗi bảng")
+    parser.add_argument("--lookups", type=int, default=100_000, help="Số key tra / upsert khi đo")
+    parser.add_argument("--buffer-pool", action="store_true", help="Đo thêm số trang trong buffer pool (chậm)")
+    args = parser.parse_args()
+
+    digests = [hashlib.md5(f"Người bán {i}".encode("utf-8")).digest() for i in range(args.rows)]
+    probe = random.Random(130).sample(digests, min(args.lookups, len(digests)))
+
+    conn = mysql.connector.connect(**config.DB_CONFIG_NO_DB)
+    cursor = conn.cursor()
+    try:
+        cursor.execute(f"DROP DATABASE IF EXISTS {SCHEMA}")
+        cursor.execute(f"CREATE DATABASE {SCHEMA} CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci")
+        for name, (key_type, encode) in LAYOUTS.items():
+            create_table(cursor, name, key_type)
+            table = f"{SCHEMA}.dim_{name}"
+            keys = [encode(d) for d in probe]
+
+            def insert_all():
+                rows = [(encode(d), f"Người bán {i}") for i, d in enumerate(digests)]
+                for start in range(0, len(rows), BATCH):
+                    cursor.executemany(f"INSERT INTO {table} (business_key, lien_he) VALUES (%s, %s)",
+                                       rows[start:start + BATCH])
+
+            def lookup():
+                for start in range(0, len(keys), BATCH):
+                    batch = keys[start:start + BATCH]
+                    cursor.execute(f"SELECT business_key, surrogate_key FROM {table} "
+                                   f"WHERE business_key IN ({', '.join(['%s'] * len(batch))})", batch)
+                    cursor.fetchall()
+
+            def upsert():
+                batch_rows = [(key, "cập nhật") for key in keys]
+                for start in range(0, len(batch_rows), BATCH):
+                    cursor.executemany(f"INSERT INTO {table} (business_key, lien_he) VALUES (%s, %s) "
+                                       f"ON DUPLICATE KEY UPDATE lien_he = VALUES(lien_he)",
+                                       batch_rows[start:start + BATCH])
+
+            load_s = timed(insert_all)
+            lookup()  # Làm nóng buffer pool
+            lookup_s = timed(lookup)
+            upsert_s = timed(upsert)
+
+            sizes = {index: size / 1024 / 1024 for index, size in index_sizes(cursor, SCHEMA, f"dim_{name}")}
+            print(f"{key_type:12s} {args.rows:10,d} key   index business_key {sizes.get('business_key', 0):8.2f} MB"
+                  f"   dữ liệu {sizes.get('PRIMARY', 0):8.2f} MB   nạp {load_s:6.2f} s"
+                  f"   tra {len(keys):,} key {lookup_s * 1000:8.1f} ms   upsert {upsert_s * 1000:8.1f} ms")
+            if args.buffer_pool:
+                for index, pages, size in buffer_pool_sizes(cursor, SCHEMA, f"dim_{name}"):
+                    print(f"{'':12s} buffer pool {index:15s} {pages:8d} trang {size / 1024 / 1024:8.2f} MB")
+    finally:
+        cursor.execute(f"DROP DATABASE IF EXISTS {SCHEMA}")
+        cursor.close()
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
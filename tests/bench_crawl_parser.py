@@ -0,0 +1,77 @@
+"""Đo thời gian parse / trang của 2 backend crawl_parser (lxml và bs4) trên các trang HTML đã lưu.
+
+    python tests/bench_crawl_parser.py                     # trang fixture, phóng to x20 cho gần cỡ trang thật
+    python tests/bench_crawl_parser.py --dir <thư mục .html>  # trang thật (vd: giải nén từ kho crawl_archive)
+
+Không phải test (pytest không thu thập file này); dừng với lỗi nếu 2 backend trả về khác nhau.
+"""
+import argparse
+import glob
+import logging
+import os
+import re
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import crawl_parser  # noqa: E402
+
+# Tin lỗi trong fixture (cố ý) ghi traceback ở mỗi lượt parse → tắt log khi đo
+logging.getLogger("GetDataLogger").disabled = True
+
+RE_BODY = re.compile(r"(<body[^>]*>)(.*)(</body>)", re.S | re.I)
+
+BACKENDS = {
+    "list": (crawl_parser.parse_list_page_bs4, crawl_parser.parse_list_page_lxml),
+    "detail": (crawl_parser.parse_detail_html_bs4, crawl_parser.parse_detail_html_lxml),
+}
+
+
+def load_pages(directory, scale):
+    pages = {"list": [], "detail": []}
+    for path in sorted(glob.glob(os.path.join(directory, "*.html"))):
+        kind = "detail" if os.path.basename(path).startswith("detail") else "list"
+        with open(path, "r", encoding="utf-8") as f:
+            html = f.read()
+        if scale > 1:
+            # Lặp lại nội dung <body> để trang fixture có cỡ gần trang thật (~20 tin / trang, nhiều layout)
+            html = RE_BODY.sub(lambda m: m.group(1) + m.group(2) * scale + m.group(3), html, count=1)
+        pages[kind].append(html)
+    return pages
+
+
+def time_per_page(parse, pages, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for html in pages:
+            parse(html)
+    return (time.perf_counter() - started) * 1000 / (repeat * len(pages))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark crawl_parser: lxml vs bs4")
+    parser.add_argument("--dir", default=os.path.join(ROOT, "tests", "fixtures", "html"),
+                        help="Thư mục trang .html (tên bắt đầu bằng detail → trang chi tiết, còn lại → danh sách)")
+    parser.add_argument("--scale", type=int, default=None, help="Số lần lặp <body> (mặc định: 20 với fixture, 1 với --dir)")
+    parser.add_argument("--repeat", type=int, default=20, help="Số lượt parse mỗi trang")
+    args = parser.parse_args()
+
+    scale = args.scale if args.scale is not None else (20 if "--dir" not in sys.argv else 1)
+    pages = load_pages(args.dir, scale)
+    for kind, (bs4_parse, lxml_parse) in BACKENDS.items():
+        if not pages[kind]:
+            continue
+        for html in pages[kind]:
+            if bs4_parse(html) != lxml_parse(html):
+                sys.exit(f"Kết quả 2 backend khác nhau trên 1 trang {kind}")
+        kb = sum(len(html.encode("utf-8")) for html in pages[kind]) / len(pages[kind]) / 1024
+        bs4_ms = time_per_page(bs4_parse, pages[kind], args.repeat)
+        lxml_ms = time_per_page(lxml_parse, pages[kind], args.repeat)
+        print(f"{kind:6s} {len(pages[kind]):3d} trang ~{kb:6.1f} KB   bs4 {bs4_ms:8.2f} ms   "
+              f"lxml {lxml_ms:7.2f} ms   x{bs4_ms / lxml_ms:5.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,279 @@
+"""Đo thời gian load staging → DW: cursor từng dòng (sp_load_dw cũ) / sp_load_dw set-based / dw_python_loader.
+
+    python tests/bench_dw_load.py --reset                  # 100k dòng staging giả lập, cả 3 cách
+    python tests/bench_dw_load.py --reset --rows 20000 --modes procedure,python
+
+CHỈ chạy trên MySQL thử: --reset xoá sạch bonbanh_staging.xe_bonbanh và các bảng DW (dimension + fact)
+rồi nạp dòng giả lập (cùng seed → cùng dữ liệu). Mỗi cách load chạy trên DW rỗng, đo cả commit.
+Không phải test (pytest không thu thập file này); dừng với lỗi nếu số dòng dimension / fact khác nhau.
+"""
+import argparse
+import logging
+import os
+import random
+import sys
+import time
+from datetime import date, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import mysql.connector  # noqa: E402
+
+import config  # noqa: E402
+import db_migrations  # noqa: E402
+import dw_python_loader  # noqa: E402
+import staging_transform  # noqa: E402
+
+DW_TABLES = ["fact_danh_sach_xe", "dim_mau_xe", "dim_vi_tri", "dim_nguoi_ban",
+             "dim_xuat_xu", "dim_tinh_trang", "dim_kieu_dang"]
+
+# Vòng lặp cursor của sp_load_dw trước khi chuyển sang set-based (~13 câu lệnh / dòng staging),
+# chuyển sang schema hiện tại: business_key BINARY(16), dim_mau_xe ghi đè phiên bản hiện tại (không SCD2),
+# fact upsert theo (link_hash, snapshot_date). Chỉ dùng để đo, tạo khi chạy benchmark rồi xoá
+CURSOR_PROCEDURE = """
+CREATE PROCEDURE bench_sp_load_dw_cursor(IN p_snapshot_date DATE)
+BEGIN
+    DECLARE done INT DEFAULT FALSE;
+    DECLARE v_ten VARCHAR(512);
+    DECLARE v_loai VARCHAR(255);
+    DECLARE v_namsx VARCHAR(32);
+    DECLARE v_dongco VARCHAR(128);
+    DECLARE v_maungoai VARCHAR(128);
+    DECLARE v_maunoi VARCHAR(128);
+    DECLARE v_cho INT;
+    DECLARE v_cua INT;
+    DECLARE v_noiban VARCHAR(255);
+    DECLARE v_lienhe VARCHAR(255);
+    DECLARE v_xuatxu VARCHAR(128);
+    DECLARE v_tinhtrang VARCHAR(128);
+    DECLARE v_kieudang VARCHAR(128);
+    DECLARE v_gia BIGINT;
+    DECLARE v_km BIGINT;
+    DECLARE v_ngaydang DATE;
+    DECLARE v_luot INT;
+    DECLARE v_link VARCHAR(1024);
+    DECLARE v_link_hash BINARY(16);
+
+    DECLARE cur CURSOR FOR
+        SELECT ten_xe, loai_xe_nam_sx, nam_san_xuat, dong_co, mau_ngoai_that, mau_noi_that,
+               NULLIF(CAST(NULLIF(REGEXP_REPLACE(so_cho_ngoi, '[^0-9]', ''), '') AS UNSIGNED), 0),
+               NULLIF(CAST(NULLIF(REGEXP_REPLACE(so_cua, '[^0-9]', ''), '') AS UNSIGNED), 0),
+               noi_ban, LEFT(lien_he, 255), xuat_xu, tinh_trang, kieu_dang,
+               NULLIF(gia_xe_vnd, 0), NULLIF(so_km, 0), ngay_dang, NULLIF(luot_xem, 0), link_xe, link_hash
+        FROM bonbanh_staging.xe_bonbanh
+        ORDER BY id;
+
+    DECLARE CONTINUE HANDLER FOR NOT FOUND SET done = TRUE;
+
+    OPEN cur;
+    read_loop: LOOP
+        FETCH cur INTO v_ten, v_loai, v_namsx, v_dongco, v_maungoai, v_maunoi, v_cho, v_cua,
+            v_noiban, v_lienhe, v_xuatxu, v_tinhtrang, v_kieudang,
+            v_gia, v_km, v_ngaydang, v_luot, v_link, v_link_hash;
+        IF done THEN
+            LEAVE read_loop;
+        END IF;
+
+        SET @bk_car = UNHEX(MD5(CONCAT(IFNULL(v_ten,''), '_', IFNULL(v_namsx,''))));
+        SET @namsx = CAST(NULLIF(REGEXP_REPLACE(v_namsx, '[^0-9]', ''), '') AS UNSIGNED);
+        SET @sk_car = (SELECT surrogate_key FROM dim_mau_xe WHERE business_key = @bk_car AND is_current = 1);
+        IF @sk_car IS NULL THEN
+            INSERT INTO dim_mau_xe (business_key, ten_xe, loai_xe_nam_sx, nam_san_xuat, so_cho_ngoi, so_cua)
+            VALUES (@bk_car, v_ten, v_loai, @namsx, v_cho, v_cua);
+            SET @sk_car = LAST_INSERT_ID();
+        ELSE
+            UPDATE dim_mau_xe
+            SET ten_xe = v_ten, loai_xe_nam_sx = v_loai, nam_san_xuat = @namsx, so_cho_ngoi = v_cho, so_cua = v_cua
+            WHERE surrogate_key = @sk_car;
+        END IF;
+
+        SET @bk_loc = UNHEX(MD5(IFNULL(v_noiban,'')));
+        INSERT INTO dim_vi_tri (business_key, noi_ban) VALUES (@bk_loc, v_noiban)
+        ON DUPLICATE KEY UPDATE noi_ban = VALUES(noi_ban);
+        SET @sk_loc = (SELECT surrogate_key FROM dim_vi_tri WHERE business_key = @bk_loc);
+
+        SET @bk_seller = UNHEX(MD5(IFNULL(v_lienhe,'')));
+        INSERT INTO dim_nguoi_ban (business_key, lien_he) VALUES (@bk_seller, v_lienhe)
+        ON DUPLICATE KEY UPDATE lien_he = VALUES(lien_he);
+        SET @sk_seller = (SELECT surrogate_key FROM dim_nguoi_ban WHERE business_key = @bk_seller);
+
+        SET @bk_xx = UNHEX(MD5(IFNULL(v_xuatxu,'')));
+        INSERT INTO dim_xuat_xu (business_key, xuat_xu) VALUES (@bk_xx, v_xuatxu)
+        ON DUPLICATE KEY UPDATE xuat_xu = VALUES(xuat_xu);
+        SET @sk_xx = (SELECT surrogate_key FROM dim_xuat_xu WHERE business_key = @bk_xx);
+
+        SET @bk_cond = UNHEX(MD5(IFNULL(v_tinhtrang,'')));
+        INSERT INTO dim_tinh_trang (business_key, tinh_trang) VALUES (@bk_cond, v_tinhtrang)
+        ON DUPLICATE KEY UPDATE tinh_trang = VALUES(tinh_trang);
+        SET @sk_cond = (SELECT surrogate_key FROM dim_tinh_trang WHERE business_key = @bk_cond);
+
+        SET @bk_style = UNHEX(MD5(IFNULL(v_kieudang,'')));
+        INSERT INTO dim_kieu_dang (business_key, kieu_dang) VALUES (@bk_style, v_kieudang)
+        ON DUPLICATE KEY UPDATE kieu_dang = VALUES(kieu_dang);
+        SET @sk_style = (SELECT surrogate_key FROM dim_kieu_dang WHERE business_key = @bk_style);
+
+        INSERT INTO fact_danh_sach_xe (
+            mau_xe_sk, vi_tri_sk, nguoi_ban_sk, xuat_xu_sk, tinh_trang_sk, kieu_dang_sk,
+            gia_xe, so_km, ngay_dang, luot_xem, dong_co, mau_ngoai_that, mau_noi_that,
+            link_xe, link_hash, snapshot_date, is_current
+        ) VALUES (
+            @sk_car, @sk_loc, @sk_seller, @sk_xx, @sk_cond, @sk_style,
+            v_gia, v_km, v_ngaydang, v_luot, v_dongco, v_maungoai, v_maunoi,
+            v_link, v_link_hash, p_snapshot_date, 1
+        )
+        ON DUPLICATE KEY UPDATE
+            mau_xe_sk = VALUES(mau_xe_sk), vi_tri_sk = VALUES(vi_tri_sk), nguoi_ban_sk = VALUES(nguoi_ban_sk),
+            xuat_xu_sk = VALUES(xuat_xu_sk), tinh_trang_sk = VALUES(tinh_trang_sk),
+            kieu_dang_sk = VALUES(kieu_dang_sk), gia_xe = VALUES(gia_xe), so_km = VALUES(so_km),
+            ngay_dang = VALUES(ngay_dang), luot_xem = VALUES(luot_xem), dong_co = VALUES(dong_co),
+            mau_ngoai_that = VALUES(mau_ngoai_that), mau_noi_that = VALUES(mau_noi_that),
+            link_xe = VALUES(link_xe), is_current = 1;
+    END LOOP;
+    CLOSE cur;
+END
+"""
+
+
+# ===========================
+# Dữ liệu staging giả lập: phân bố gần dữ liệu thật (vài nghìn mẫu xe, 63 tỉnh, ~1 người bán / 5 tin),
+# nhiều tin cùng mẫu xe nhưng khác động cơ / màu / số chỗ → thuộc tính dimension lấy theo dòng cuối
+# ===========================
+BRANDS = ["Toyota", "Kia", "Hyundai", "Mazda", "Honda", "Ford", "VinFast", "Mitsubishi", "Mercedes Benz", "BMW"]
+BODIES = ["Sedan", "SUV", "Crossover", "Hatchback", "MPV", "Bán tải / Pickup", "Coupe", "Van"]
+COLORS = ["Trắng", "Đen", "Đỏ", "Bạc", "Xám", "Xanh", "Nâu", "Be"]
+
+
+def synthetic_staging_rows(count, seed=130):
+    """count tuple theo staging_transform.STAGING_COLUMNS (đã parse, giống sau load_to_staging)."""
+    rng = random.Random(seed)
+    sellers = max(count // 5, 1)
+    rows = []
+    for i in range(count):
+        year = rng.randint(2005, 2025)
+        ten_xe = f"{rng.choice(BRANDS)} Model {rng.randint(1, 200)}"
+        price = rng.randint(1, 300) * 10_000_000
+        posted = date(2026, 1, 1) + timedelta(days=rng.randint(0, 280))
+        km = rng.choice([0, rng.randint(1, 300) * 1000])
+        record = {
+            "loai_xe_nam_sx": f"{'Mới' if km == 0 else 'Cũ'} - {year}",
+            "ten_xe": ten_xe,
+            "gia_xe_raw": f"{price // 1_000_000} Triệu",
+            "gia_xe_vnd": price,
+            "noi_ban": f"Tỉnh {rng.randint(1, 63)}",
+            "lien_he": f"Người bán {rng.randint(1, sellers)}",
+            "link_xe": f"https://bonbanh.com/xe-bench-{i}",
+            "ngay_dang": posted if rng.random() < 0.95 else None,
+            "luot_xem": rng.choice([None, rng.randint(0, 20000)]),
+            "so_km": km,
+            "tinh_trang": "Xe mới" if km == 0 else "Xe đã dùng",
+            "xuat_xu": rng.choice(["Lắp ráp trong nước", "Nhập khẩu"]),
+            "kieu_dang": rng.choice(BODIES),
+            "dong_co": f"{rng.choice(['Xăng', 'Dầu', 'Hybrid'])} {rng.choice(['1.5', '2.0', '2.5'])} L",
+            "mau_ngoai_that": rng.choice(COLORS),
+            "mau_noi_that": rng.choice(COLORS),
+            "so_cho_ngoi": f"{rng.choice([4, 5, 7])} chỗ",
+            "so_cua": f"{rng.choice([4, 5])} cửa",
+            "nam_san_xuat": str(year),
+            "row_hash": f"{i:032x}",
+        }
+        rows.append(tuple(record[c] for c in staging_transform.STAGING_COLUMNS))
+    return rows
+
+
+def insert_staging_rows(conn, cursor, rows):
+    sql = "INSERT INTO bonbanh_staging.xe_bonbanh ({}) VALUES ({})".format(
+        ", ".join(staging_transform.STAGING_COLUMNS), ", ".join(["%s"] * len(staging_transform.STAGING_COLUMNS)))
+    for start in range(0, len(rows), config.STAGING_BULK_INSERT_BATCH):
+        cursor.executemany(sql, rows[start:start + config.STAGING_BULK_INSERT_BATCH])
+    conn.commit()
+
+
+def reset_dw(conn, cursor):
+    cursor.execute("USE bonbanh_datawarehouse")
+    for table in DW_TABLES:
+        cursor.execute(f"TRUNCATE TABLE {table}")
+    conn.commit()
+
+
+def reset_staging(conn, cursor):
+    cursor.execute("TRUNCATE TABLE bonbanh_staging.xe_bonbanh")
+    conn.commit()
+
+
+# ===========================
+# Các cách load (DW rỗng, toàn bộ staging, snapshot hôm nay, grain 'listing')
+# ===========================
+def load_cursor(cursor):
+    cursor.callproc("bench_sp_load_dw_cursor", (date.today(),))
+
+
+def load_procedure(cursor):
+    cursor.callproc("sp_load_dw", (None, None, date.today(), "listing"))
+
+
+def load_python(cursor):
+    dw_python_loader.load_dw(cursor, None, None, date.today(), "listing")
+
+
+MODES = {"cursor": load_cursor, "procedure": load_procedure, "python": load_python}
+
+
+def table_counts(cursor):
+    counts = {}
+    for table in DW_TABLES:
+        cursor.execute(f"SELECT COUNT(*) FROM {table}")
+        counts[table] = cursor.fetchone()[0]
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark load staging → DW: cursor vs set-based vs python")
+    parser.add_argument("--reset", action="store_true",
+                        help="Bắt buộc: đồng ý xoá dữ liệu staging + DW của server này")
+    parser.add_argument("--rows", type=int, default=100_000, help="Số dòng staging giả lập")
+    parser.add_argument("--modes", default=",".join(MODES), help="Các cách load, ngăn bởi dấu phẩy")
+    args = parser.parse_args()
+    if not args.reset:
+        parser.error("benchmark xoá bonbanh_staging.xe_bonbanh và các bảng DW: thêm --reset (chỉ trên MySQL thử)")
+    modes = [m.strip() for m in args.modes.split(",") if m.strip()]
+    unknown = [m for m in modes if m not in MODES]
+    if unknown:
+        parser.error(f"cách load không có: {', '.join(unknown)}")
+
+    logging.basicConfig(level=logging.WARNING)
+    db_migrations.apply_scripts(db_migrations.STAGING_SCRIPTS + db_migrations.DW_SCRIPTS)
+    conn = mysql.connector.connect(**config.DB_CONFIG_BASE)
+    cursor = conn.cursor()
+    try:
+        reset_staging(conn, cursor)
+        insert_staging_rows(conn, cursor, synthetic_staging_rows(args.rows))
+        reset_dw(conn, cursor)
+        cursor.execute("DROP PROCEDURE IF EXISTS bench_sp_load_dw_cursor")
+        cursor.execute(CURSOR_PROCEDURE)
+
+        results = {}
+        for mode in modes:
+            reset_dw(conn, cursor)
+            started = time.perf_counter()
+            MODES[mode](cursor)
+            conn.commit()
+            results[mode] = (time.perf_counter() - started, table_counts(cursor))
+
+        baseline = results.get("cursor", next(iter(results.values())))[0]
+        for mode, (seconds, counts) in results.items():
+            print(f"{mode:10s} {args.rows:8,d} dòng   {seconds:8.2f} s   {args.rows / seconds:9,.0f} dòng/s   "
+                  f"x{baseline / seconds:5.1f}   fact {counts['fact_danh_sach_xe']:,}   "
+                  f"dim_mau_xe {counts['dim_mau_xe']:,}   dim_nguoi_ban {counts['dim_nguoi_ban']:,}")
+        first = next(iter(results.values()))[1]
+        if any(counts != first for _, counts in results.values()):
+            sys.exit("Số dòng dimension / fact khác nhau giữa các cách load")
+    finally:
+        cursor.execute("DROP PROCEDURE IF EXISTS bonbanh_datawarehouse.bench_sp_load_dw_cursor")
+        reset_dw(conn, cursor)
+        cursor.close()
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
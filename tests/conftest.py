@@ -0,0 +1,163 @@
+import csv
+import hashlib
+import importlib
+import os
+import re
+import subprocess
+import sys
+import threading
+from datetime import datetime
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIXTURES_DIR = os.path.join(ROOT, "tests", "fixtures")
+HTML_DIR = os.path.join(FIXTURES_DIR, "html")
+
+sys.path.insert(0, ROOT)
+
+RE_DETAIL_ID = re.compile(r"-(\d+)$")
+
+# Các tin của list_page_1.html + list_page_2.html theo thứ tự danh sách
+LIST_ORDER = [
+    "xe-toyota-vios-1.5g-2019-5123401",
+    "xe-kia-morning-si-2017-5123402",
+    "xe-mercedes-benz-glc-300-2022-5123403",
+    "xe-honda-cr-v-l-2020-5123404",
+    "xe-vinfast-vf8-plus-2024-5123405",
+]
+
+
+def read_fixture(*parts):
+    with open(os.path.join(FIXTURES_DIR, *parts), "r", encoding="utf-8") as f:
+        return f.read()
+
+
+def read_csv_rows(path):
+    with open(path, "r", encoding="utf-8-sig", newline="") as f:
+        return list(csv.reader(f))
+
+
+def today_csv(workdir):
+    return os.path.join(workdir, "data", f"bonbanh_raw_{datetime.now():%Y-%m-%d}.csv")
+
+
+def run_get_data(base_url, workdir, *args, timeout=120):
+    """Chạy get_data.py như cron (tiến trình riêng, cwd = workdir) với BONBANH_BASE_URL = server fixture."""
+    env = {**os.environ, "BONBANH_BASE_URL": base_url}
+    return subprocess.run([sys.executable, os.path.join(ROOT, "get_data.py"), *args], cwd=workdir, env=env,
+                          check=True, timeout=timeout, capture_output=True, text=True)
+
+
+# ===========================
+# Server fixture thay cho bonbanh.com (BONBANH_BASE_URL=http://127.0.0.1:<port>):
+# / và /oto/page,N/ → list_page_N.html (trang không có file → danh sách rỗng)
+# /xe-...-<id>      → detail_<id>.html
+# - Mọi response có ETag + Last-Modified; If-None-Match trùng → 304 không body
+# - server.request_log: [(path, headers)] theo thứ tự nhận
+# - server.hold(suffix): request có path kết thúc bằng suffix bị giữ tới server.release()
+# ===========================
+FIXTURE_LAST_MODIFIED = "Mon, 12 Oct 2026 08:00:00 GMT"
+
+
+def fixture_file_for(path):
+    if path == "/":
+        return "list_page_1.html"
+    if path.startswith("/oto/page,"):
+        name = f"list_page_{path[len('/oto/page,'):].strip('/')}.html"
+        return name if os.path.exists(os.path.join(HTML_DIR, name)) else "list_page_empty.html"
+    match = RE_DETAIL_ID.search(path.rstrip("/"))
+    return f"detail_{match.group(1)}.html" if match else None
+
+
+def is_detail_path(path):
+    return RE_DETAIL_ID.search(path.rstrip("/")) is not None
+
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        self.server.request_log.append((self.path, dict(self.headers)))
+        if self.server.held_suffix and self.path.endswith(self.server.held_suffix):
+            self.server.released.wait(60)
+
+        name = fixture_file_for(self.path)
+        if name is None or not os.path.exists(os.path.join(HTML_DIR, name)):
+            self.send_error(404)
+            return
+        body = read_fixture("html", name).encode("utf-8")
+        etag = f'"{hashlib.md5(body).hexdigest()}"'
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", etag)
+        self.send_header("Last-Modified", FIXTURE_LAST_MODIFIED)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FixtureServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), FixtureHandler)
+        self.request_log = []
+        self.held_suffix = None
+        self.released = threading.Event()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def hold(self, suffix):
+        self.released.clear()
+        self.held_suffix = suffix
+
+    def release(self):
+        self.held_suffix = None
+        self.released.set()
+
+    def detail_requests(self):
+        return [path for path, _ in self.request_log if is_detail_path(path)]
+
+    def stop(self):
+        self.release()
+        self.shutdown()
+        self.server_close()
+
+
+@pytest.fixture
+def fixture_httpd():
+    server = FixtureServer()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield server
+    finally:
+        server.stop()
+
+
+@pytest.fixture
+def fixture_server(fixture_httpd):
+    return fixture_httpd.url
+
+
+# ===========================
+# get_data import trong thư mục tạm: module tạo logs/, data/, CSV hôm nay theo đường dẫn tương đối
+# lúc import → chdir trước, import lại module mới cho mỗi test
+# ===========================
+@pytest.fixture
+def get_data_module(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.delitem(sys.modules, "get_data", raising=False)
+    module = importlib.import_module("get_data")
+    yield module
+    sys.modules.pop("get_data", None)
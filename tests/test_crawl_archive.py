@@ -0,0 +1,89 @@
+import glob
+import os
+import shutil
+import subprocess
+import sys
+import textwrap
+from datetime import datetime
+
+from crawl_archive import ArchiveReader, HtmlArchive
+from conftest import ROOT, read_csv_rows, today_csv
+
+# get_data với kho HTML bật (config.CRAWL_ARCHIVE_ENABLED mặc định False), parse bằng process pool như cron
+CRAWL_SCRIPT = textwrap.dedent("""
+    import config
+    config.CRAWL_ARCHIVE_ENABLED = True
+    import get_data
+    get_data.main()
+""")
+REPARSE_SCRIPT = textwrap.dedent("""
+    import sys, get_data
+    get_data.reparse(sys.argv[1])
+""")
+
+
+def run_script(script, workdir, base_url, *args):
+    env = {**os.environ, "BONBANH_BASE_URL": base_url, "PYTHONPATH": ROOT}
+    subprocess.run([sys.executable, "-c", script, *args], cwd=workdir, env=env,
+                   check=True, timeout=120, capture_output=True)
+
+
+def today():
+    return f"{datetime.now():%Y-%m-%d}"
+
+
+def move_day(workdir, day):
+    """Đổi CSV + kho HTML hôm nay thành của ngày `day` (giả lập crawl của 1 ngày trước)."""
+    os.replace(today_csv(workdir), os.path.join(workdir, "data", f"bonbanh_raw_{day}.csv"))
+    for path in glob.glob(os.path.join(workdir, "data", "archive", f"bonbanh_{today()}.*")):
+        os.replace(path, path.replace(f"bonbanh_{today()}", f"bonbanh_{day}"))
+
+
+def test_reparse_rebuilds_identical_csv_without_network(fixture_httpd, tmp_path):
+    base = fixture_httpd.url
+    run_script(CRAWL_SCRIPT, tmp_path, base)
+    crawled = today_csv(tmp_path)
+    shutil.copy(crawled, tmp_path / "crawled.csv")
+
+    fixture_httpd.stop()
+    fixture_httpd.request_log.clear()
+    run_script(REPARSE_SCRIPT, tmp_path, base, today())
+
+    assert fixture_httpd.request_log == []
+    assert read_csv_rows(crawled) == read_csv_rows(tmp_path / "crawled.csv")
+    assert len(read_csv_rows(crawled)) == 6
+
+
+def test_reparse_takes_detail_pages_from_an_earlier_day(fixture_httpd, tmp_path):
+    base = fixture_httpd.url
+    run_script(CRAWL_SCRIPT, tmp_path, base)
+    move_day(tmp_path, "2026-01-01")
+
+    # Lần crawl sau dùng lại chi tiết từ chỉ mục tin đã thấy → kho hôm nay chỉ có trang danh sách
+    fixture_httpd.request_log.clear()
+    run_script(CRAWL_SCRIPT, tmp_path, base)
+    assert fixture_httpd.detail_requests() == []
+    crawled = read_csv_rows(today_csv(tmp_path))
+
+    fixture_httpd.stop()
+    run_script(REPARSE_SCRIPT, tmp_path, base, today())
+    assert read_csv_rows(today_csv(tmp_path)) == crawled
+
+
+def test_reader_prefers_the_nearest_earlier_day(tmp_path):
+    url = "http://fixture.test/xe-1"
+    for day, html in [("2026-01-01", "old"), ("2026-01-05", "newer"), ("2026-01-09", "future")]:
+        archive = HtmlArchive(str(tmp_path), day)
+        archive.append("detail", url, html)
+        archive.close()
+    archive = HtmlArchive(str(tmp_path), "2026-01-06")
+    archive.append("list", "http://fixture.test/", "list page")
+    archive.close()
+
+    reader = ArchiveReader(str(tmp_path), "2026-01-06")
+    try:
+        assert list(reader.list_pages()) == ["list page"]
+        assert reader.detail(url) == "newer"
+        assert reader.detail("http://fixture.test/xe-2") is None
+    finally:
+        reader.close()
@@ -0,0 +1,83 @@
+import os
+
+from crawl_cache import ResponseCache
+from conftest import read_fixture
+
+
+class FakeResponse:
+    def __init__(self, text, etag='"v1"', last_modified=None):
+        self.text = text
+        self.headers = {}
+        if etag:
+            self.headers["ETag"] = etag
+        if last_modified:
+            self.headers["Last-Modified"] = last_modified
+
+
+def test_second_fetch_revalidates_and_is_served_from_cache(get_data_module, fixture_httpd, tmp_path, monkeypatch):
+    cache = ResponseCache(str(tmp_path / "cache"), 10 * 1024 * 1024)
+    monkeypatch.setattr(get_data_module, "response_cache", cache)
+    url = f"{fixture_httpd.url}/xe-toyota-vios-1.5g-2019-5123401"
+    expected = read_fixture("html", "detail_5123401.html")
+
+    assert get_data_module.get_page(url) == expected
+    assert cache.stats == {"hits": 0, "misses": 1, "stores": 1, "evictions": 0}
+
+    assert get_data_module.get_page(url) == expected
+    first, second = [headers for _, headers in fixture_httpd.request_log]
+    assert "If-None-Match" not in first
+    assert second["If-None-Match"] == cache.get(url)["etag"]
+    assert second["If-Modified-Since"] == cache.get(url)["last_modified"]
+    # 304 → body lấy từ cache, không lưu lại
+    assert cache.stats == {"hits": 1, "misses": 1, "stores": 1, "evictions": 0}
+
+
+def test_changed_page_after_revalidation_is_not_a_miss(tmp_path):
+    cache = ResponseCache(str(tmp_path), 10 * 1024 * 1024)
+    url = "http://fixture.test/xe-1"
+
+    assert cache.get(url) is None
+    cache.store(url, FakeResponse("v1"))
+    assert cache.get(url)["body"] == "v1"
+    # Server trả 200 (ETag mới) cho request có If-None-Match → chỉ là 1 lần lưu mới
+    cache.store(url, FakeResponse("v2", etag='"v2"'))
+    assert cache.get(url)["body"] == "v2"
+    assert cache.stats == {"hits": 0, "misses": 1, "stores": 2, "evictions": 0}
+
+
+def test_response_without_validators_is_not_stored(tmp_path):
+    cache = ResponseCache(str(tmp_path), 10 * 1024 * 1024)
+    cache.store("http://fixture.test/xe-1", FakeResponse("body", etag=None))
+    assert cache.stats["stores"] == 0
+    assert os.listdir(tmp_path) == []
+
+
+def test_evicts_least_recently_used_down_to_90_percent(tmp_path):
+    cache = ResponseCache(str(tmp_path), 10 * 1024 * 1024)
+    urls = [f"http://fixture.test/xe-{i}" for i in range(6)]
+    for i, url in enumerate(urls[:5]):
+        cache.store(url, FakeResponse("x" * 1000))
+        # mtime tăng dần: xe-0 cũ nhất
+        os.utime(os.path.join(tmp_path, cache._name(url)), (1000 + i, 1000 + i))
+    entry_size = cache._total // 5
+
+    # Dùng lại xe-1 (304) → thành mới nhất
+    cache.hit(urls[1])
+    cache.max_bytes = 5 * entry_size
+
+    # Entry thứ 6 vượt giới hạn → xoá theo mtime tới khi <= 90% (4.5 entry): xe-0 rồi xe-2
+    cache.store(urls[5], FakeResponse("x" * 1000))
+    assert cache.stats["evictions"] == 2
+    assert cache.get(urls[0]) is None
+    assert cache.get(urls[2]) is None
+    assert all(cache.get(url) is not None for url in (urls[1], urls[3], urls[4], urls[5]))
+    assert cache._total == 4 * entry_size <= int(cache.max_bytes * 0.9)
+    assert sorted(os.listdir(tmp_path)) == sorted(cache._name(url) for url in (urls[1], urls[3], urls[4], urls[5]))
+
+
+def test_existing_entries_count_towards_the_limit(tmp_path):
+    cache = ResponseCache(str(tmp_path), 10 * 1024 * 1024)
+    cache.store("http://fixture.test/xe-1", FakeResponse("x" * 1000))
+
+    reopened = ResponseCache(str(tmp_path), 10 * 1024 * 1024)
+    assert reopened._total == cache._total
@@ -0,0 +1,65 @@
+import glob
+import os
+
+import pytest
+
+import crawl_parser
+from conftest import HTML_DIR, read_fixture
+
+PAGES = sorted(os.path.basename(path) for path in glob.glob(os.path.join(HTML_DIR, "*.html")))
+LIST_PAGES = [name for name in PAGES if name.startswith("list_")]
+DETAIL_PAGES = [name for name in PAGES if name.startswith("detail_")]
+
+
+# Backend lxml phải trả về đúng các dict của backend BeautifulSoup (bản gốc) trên mọi trang đã lưu,
+# kể cả khi đưa nhầm loại trang
+@pytest.mark.parametrize("name", PAGES)
+def test_list_page_backends_match(name):
+    html = read_fixture("html", name)
+    assert crawl_parser.parse_list_page_lxml(html) == crawl_parser.parse_list_page_bs4(html)
+
+
+@pytest.mark.parametrize("name", PAGES)
+def test_detail_page_backends_match(name):
+    html = read_fixture("html", name)
+    assert crawl_parser.parse_detail_html_lxml(html) == crawl_parser.parse_detail_html_bs4(html)
+
+
+@pytest.mark.parametrize("html", ["", "   ", "<html></html>", "không phải html"])
+def test_backends_match_on_empty_pages(html):
+    assert crawl_parser.parse_list_page_lxml(html) == crawl_parser.parse_list_page_bs4(html)
+    assert crawl_parser.parse_detail_html_lxml(html) == crawl_parser.parse_detail_html_bs4(html)
+
+
+def test_fixtures_cover_both_page_types():
+    assert LIST_PAGES and DETAIL_PAGES
+    assert sum(len(crawl_parser.parse_list_page_bs4(read_fixture("html", n))) for n in LIST_PAGES) >= 5
+
+
+def test_tricky_list_page():
+    cars = crawl_parser.parse_list_page_lxml(read_fixture("html", "list_page_tricky.html"))
+    base = crawl_parser.BASE_URL
+    # Tin có .cb1 bắt đầu bằng thẻ bị bỏ qua, .car-items không phải tin
+    assert [car["Link xe"] for car in cars] == [
+        f"{base}/xe-hyundai-accent-1.4-at-2021-5123406",
+        f"{base}/xe-ford-ranger-2018-5123407",
+        f"{base}/xe-mazda-3-5123408",
+        "",
+    ]
+    assert cars[0]["Loại xe + Năm SX"] == "Cũ - 2021"
+    assert cars[0]["Tên xe"] == "HyundaiAccent1.4 AT"
+    assert cars[0]["Liên hệ"] == "Anh Hùng 0909\xa0888 777"
+    assert cars[1]["Loại xe + Năm SX"] == ""
+    assert cars[2]["Loại xe + Năm SX"] == "Mới"
+
+
+def test_tricky_detail_page():
+    data = crawl_parser.parse_detail_html_lxml(read_fixture("html", "detail_tricky.html"))
+    # get_text(strip=True) nối các chuỗi không có khoảng trắng → "Đăngngày..." không khớp regex (như bản gốc)
+    assert data == {
+        "Ngày đăng": "",
+        "Lượt xem": "",
+        "Xuất xứ:": "Nhậpkhẩu",
+        "Số Km đã đi:": "1.200   Km",
+        "Số chỗ ngồi:": "7 chỗ",
+    }
@@ -0,0 +1,159 @@
+import csv
+import json
+import os
+import shutil
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+import config
+from crawl_state import CrawlFrontier, SeenIndex
+from conftest import LIST_ORDER, ROOT, read_csv_rows, run_get_data, today_csv
+
+DETAIL_PAGES = 5
+
+
+# ===========================
+# SeenIndex: tin đã thấy và không đổi → không tải lại trang chi tiết
+# ===========================
+def test_second_crawl_skips_detail_pages_of_seen_listings(fixture_httpd, tmp_path):
+    run_get_data(fixture_httpd.url, tmp_path)
+    assert len(fixture_httpd.detail_requests()) == DETAIL_PAGES
+    first = read_csv_rows(today_csv(tmp_path))
+
+    fixture_httpd.request_log.clear()
+    run_get_data(fixture_httpd.url, tmp_path)
+    assert fixture_httpd.detail_requests() == []
+    # Cùng ngày → CSV được ghi nối: lần 2 ghi lại đúng các dòng của lần 1 từ chỉ mục
+    rows = read_csv_rows(today_csv(tmp_path))
+    assert rows[1:] == first[1:] + first[1:]
+
+
+def test_first_crawl_seeds_index_from_older_csv(fixture_httpd, tmp_path):
+    earlier = tmp_path / "earlier"
+    earlier.mkdir()
+    run_get_data(fixture_httpd.url, earlier)
+    crawled = read_csv_rows(today_csv(earlier))
+
+    # Thư mục mới: chưa có chỉ mục, chỉ có CSV của 1 ngày trước
+    workdir = tmp_path / "workdir"
+    (workdir / "data").mkdir(parents=True)
+    shutil.copy(today_csv(earlier), workdir / "data" / "bonbanh_raw_2026-01-01.csv")
+    fixture_httpd.request_log.clear()
+
+    run_get_data(fixture_httpd.url, workdir)
+    assert fixture_httpd.detail_requests() == []
+    assert read_csv_rows(today_csv(workdir)) == crawled
+
+
+def write_csv(path, records):
+    with open(path, "w", encoding="utf-8-sig", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(config.CSV_COLUMNS)
+        for record in records:
+            writer.writerow([record.get(col, "") for col in config.CSV_COLUMNS])
+
+
+def test_seed_from_csv_imports_details_and_skips_excluded_file(tmp_path):
+    car = {"Tên xe": "Toyota Vios", "Giá xe_raw": "465 Triệu", "Link xe": "http://fixture.test/xe-1"}
+    detail = {"Ngày đăng": "12/10/2026", "Lượt xem": "1234", "Động cơ:": "Xăng 1.5 L"}
+    write_csv(tmp_path / "bonbanh_raw_2026-01-01.csv", [{**car, **detail}])
+    write_csv(tmp_path / "bonbanh_raw_2026-01-02.csv", [{**car, "Link xe": "http://fixture.test/xe-2"}])
+
+    index = SeenIndex(str(tmp_path / "seen.sqlite"))
+    seeded = index.seed_from_csv(os.path.join(tmp_path, "bonbanh_raw_*.csv"),
+                                 exclude=str(tmp_path / "bonbanh_raw_2026-01-02.csv"))
+    assert seeded == 1
+    assert index.count() == 1
+
+    stored = index.lookup(car)
+    assert {k: stored[k] for k in detail} == detail
+    # Cột trang danh sách đổi (giá mới) → fingerprint khác → phải tải lại chi tiết
+    assert index.lookup({**car, "Giá xe_raw": "450 Triệu"}) is None
+    index.close()
+
+
+def test_lookup_expires_after_refresh_days(tmp_path):
+    car = {"Tên xe": "Kia Morning", "Link xe": "http://fixture.test/xe-2"}
+    index = SeenIndex(str(tmp_path / "seen.sqlite"), refresh_days=7)
+    index.remember(car, {"Lượt xem": "10"}, fetched_at="2000-01-01T00:00:00")
+    assert index.lookup(car) is None
+    index.remember(car, {"Lượt xem": "11"})
+    assert index.lookup(car) == {"Lượt xem": "11"}
+    index.close()
+
+
+# ===========================
+# CrawlFrontier: crawl bị kill giữa trang → chạy lại từ checkpoint JSON, không thiếu / trùng dòng
+# ===========================
+def wait_until(condition, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return
+        time.sleep(0.1)
+    raise AssertionError("Hết thời gian chờ")
+
+
+def csv_links(workdir):
+    path = today_csv(workdir)
+    if not os.path.exists(path):
+        return []
+    return [dict(zip(config.CSV_COLUMNS, row))["Link xe"] for row in read_csv_rows(path)[1:]]
+
+
+def checkpoint_state(workdir):
+    path = os.path.join(workdir, config.CRAWL_CHECKPOINT_FILE_PATTERN.format(today=f"{datetime.now():%Y-%m-%d}"))
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def test_killed_crawl_resumes_from_checkpoint(fixture_httpd, tmp_path):
+    base = fixture_httpd.url
+    expected = [f"{base}/{href}" for href in LIST_ORDER]
+    # Tin cuối của trang 2 bị treo: tin đầu trang 2 đã ghi (flush theo thời gian) nhưng trang chưa xong
+    fixture_httpd.hold("-5123405")
+    env = {**os.environ, "BONBANH_BASE_URL": base}
+    proc = subprocess.Popen([sys.executable, os.path.join(ROOT, "get_data.py")], cwd=tmp_path, env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_until(lambda: expected[3] in csv_links(tmp_path))
+    finally:
+        proc.kill()
+        proc.wait()
+
+    state = checkpoint_state(tmp_path)
+    assert state["last_page_done"] == 1 and state["current_page"] == 2
+    assert [car["Link xe"] for car in state["pending"]] == expected[3:]
+    assert csv_links(tmp_path) == expected[:4]
+
+    fixture_httpd.release()
+    fixture_httpd.request_log.clear()
+    run_get_data(base, tmp_path)
+
+    # Tin đã ghi trước khi bị kill không ghi lại, tin còn thiếu được bổ sung; xong → xoá checkpoint
+    assert csv_links(tmp_path) == expected
+    assert checkpoint_state(tmp_path) is None
+    assert not any(path in ("/", "/oto/page,1/") for path, _ in fixture_httpd.request_log)
+
+
+def test_frontier_stops_after_seen_pages_and_resumes(tmp_path):
+    path = str(tmp_path / "checkpoint.json")
+    frontier = CrawlFrontier(path, max_pages=10, stop_after_seen_pages=2)
+    pages = []
+    for page in frontier.pages():
+        pages.append(page)
+        frontier.start_batch(page, [{"Link xe": f"xe-{page}"}])
+        frontier.finish_batch(page, all_seen=page >= 3)
+    assert pages == [1, 2, 3, 4]
+    assert frontier.should_stop()
+
+    resumed = CrawlFrontier(path, max_pages=10, stop_after_seen_pages=0)
+    assert resumed.resumed and resumed.state["last_page_done"] == 4
+    assert next(resumed.pages()) == 5
+    resumed.complete()
+    assert not os.path.exists(path)
@@ -0,0 +1,181 @@
+import time
+from email.utils import formatdate
+
+import pytest
+import requests
+
+import crawl_throttle
+from crawl_throttle import AdaptiveRequester, HostRateLimiter
+
+URL = "http://fixture.test/xe-1"
+HOST = "fixture.test"
+
+
+class FakeResponse:
+    def __init__(self, status_code, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"HTTP {self.status_code}", response=self)
+
+
+class FakeSession:
+    """Trả lần lượt các kết quả đã xếp (FakeResponse hoặc exception), kết quả cuối lặp lại mãi."""
+
+    def __init__(self, *outcomes):
+        self.outcomes = list(outcomes)
+        self.calls = 0
+
+    def get(self, url, headers=None, timeout=None):
+        outcome = self.outcomes[min(self.calls, len(self.outcomes) - 1)]
+        self.calls += 1
+        if isinstance(outcome, BaseException):
+            raise outcome
+        return outcome
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    """Ghi lại thời gian backoff thay vì ngủ thật."""
+    recorded = []
+    monkeypatch.setattr(crawl_throttle.time, "sleep", recorded.append)
+    return recorded
+
+
+def make_requester(session, max_retries=3, max_concurrency=8, breaker_threshold=0, breaker_cooldown=60):
+    return AdaptiveRequester(
+        session, HostRateLimiter(0, 1),
+        max_retries=max_retries, backoff_base=1.0, backoff_max=60.0,
+        min_concurrency=1, max_concurrency=max_concurrency,
+        breaker_threshold=breaker_threshold, breaker_cooldown=breaker_cooldown,
+    )
+
+
+def host_state(requester):
+    return requester._hosts[HOST]
+
+
+def test_retries_until_success(sleeps):
+    session = FakeSession(FakeResponse(503), FakeResponse(500), FakeResponse(200))
+    requester = make_requester(session)
+
+    assert requester.get(URL).status_code == 200
+    assert session.calls == 3
+    assert len(sleeps) == 2
+    assert requester.stats["retries"] == 2
+    assert requester.stats["ok"] == 1
+    assert requester.stats["failed"] == 0
+
+
+def test_gives_up_after_max_retries(sleeps):
+    session = FakeSession(FakeResponse(500))
+    requester = make_requester(session, max_retries=2)
+
+    with pytest.raises(requests.HTTPError):
+        requester.get(URL)
+    assert session.calls == 3
+    assert requester.stats["retries"] == 2
+    assert requester.stats["failed"] == 1
+
+
+def test_non_retry_status_is_returned_as_is(sleeps):
+    session = FakeSession(FakeResponse(404))
+    requester = make_requester(session)
+
+    assert requester.get(URL).status_code == 404
+    assert session.calls == 1
+    assert sleeps == []
+
+
+def test_retry_after_seconds_is_honoured_and_capped(sleeps):
+    session = FakeSession(FakeResponse(429, {"Retry-After": "7"}),
+                          FakeResponse(503, {"Retry-After": "600"}),
+                          FakeResponse(200))
+    requester = make_requester(session)
+
+    requester.get(URL)
+    assert sleeps == [7.0, 60.0]
+    assert requester.stats["throttled"] == 2
+
+
+def test_retry_after_http_date(sleeps):
+    when = formatdate(time.time() + 30, usegmt=True)
+    session = FakeSession(FakeResponse(429, {"Retry-After": when}), FakeResponse(200))
+    requester = make_requester(session)
+
+    requester.get(URL)
+    assert 25 <= sleeps[0] <= 30
+
+
+def test_aimd_halves_on_throttle_and_grows_additively(sleeps):
+    session = FakeSession(FakeResponse(429), FakeResponse(200), FakeResponse(200))
+    requester = make_requester(session, max_concurrency=8)
+
+    requester.get(URL)
+    state = host_state(requester)
+    # 8 → 4 (429), rồi +1/limit sau mỗi lần thành công
+    assert state.limit == pytest.approx(4 + 1 / 4)
+    requester.get(URL)
+    assert state.limit == pytest.approx(4.25 + 1 / 4.25)
+
+    for _ in range(200):
+        requester.get(URL)
+    assert state.limit == 8
+
+
+def test_aimd_never_drops_below_min_concurrency(sleeps):
+    session = FakeSession(requests.ConnectionError("down"))
+    requester = make_requester(session, max_retries=5, max_concurrency=4)
+
+    with pytest.raises(requests.ConnectionError):
+        requester.get(URL)
+    assert host_state(requester).limit == 1
+
+
+def test_breaker_opens_then_lets_a_probe_through_after_cooldown(sleeps):
+    session = FakeSession(requests.ConnectionError("down"), requests.ConnectionError("down"), FakeResponse(200))
+    requester = make_requester(session, max_retries=0, breaker_threshold=2, breaker_cooldown=0.3)
+
+    for _ in range(2):
+        with pytest.raises(requests.ConnectionError):
+            requester.get(URL)
+    state = host_state(requester)
+    assert requester.stats["breaker_opens"] == 1
+    assert state.open_until > time.monotonic()
+
+    # Nửa mở: hết cooldown thì request tiếp theo mới được gửi, thành công → đếm lỗi về 0
+    started = time.monotonic()
+    assert requester.get(URL).status_code == 200
+    assert time.monotonic() - started >= 0.25
+    assert state.failures == 0
+    assert session.calls == 3
+
+
+@pytest.mark.parametrize("exc", [
+    requests.TooManyRedirects("loop"),
+    requests.exceptions.ChunkedEncodingError("cut"),
+    requests.exceptions.ContentDecodingError("gzip"),
+    requests.exceptions.InvalidURL("bad"),
+    requests.exceptions.SSLError("tls"),
+])
+def test_slot_is_released_on_request_exceptions(sleeps, exc):
+    session = FakeSession(exc, FakeResponse(200))
+    requester = make_requester(session, max_retries=0, max_concurrency=1)
+
+    with pytest.raises(type(exc)):
+        requester.get(URL)
+    assert host_state(requester).inflight == 0
+    # Slot duy nhất đã được trả → request sau không bị kẹt trong _acquire
+    assert requester.get(URL).status_code == 200
+
+
+def test_slot_is_released_on_unexpected_exception(sleeps):
+    session = FakeSession(RuntimeError("bug"))
+    requester = make_requester(session, max_retries=3, max_concurrency=1)
+
+    with pytest.raises(RuntimeError):
+        requester.get(URL)
+    assert session.calls == 1
+    assert host_state(requester).inflight == 0
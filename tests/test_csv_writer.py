@@ -0,0 +1,81 @@
+import os
+import subprocess
+import sys
+import textwrap
+
+import config
+from conftest import ROOT, read_csv_rows
+
+
+def car(i):
+    return {"Tên xe": f"Xe {i}", "Link xe": f"http://fixture.test/xe-{i}"}
+
+
+def links(path):
+    return [dict(zip(config.CSV_COLUMNS, row))["Link xe"] for row in read_csv_rows(path)]
+
+
+def test_rows_stay_buffered_until_checkpoint(get_data_module, tmp_path, monkeypatch):
+    synced = []
+    real_fsync = os.fsync
+    monkeypatch.setattr(get_data_module.os, "fsync", lambda fd: (synced.append(fd), real_fsync(fd)))
+    path = str(tmp_path / "out.csv")
+    writer = get_data_module.CsvBatchWriter(path, flush_rows=100, flush_seconds=60)
+    try:
+        for i in range(3):
+            writer.write(car(i))
+        assert links(path) == []
+
+        writer.checkpoint()
+        assert links(path) == [car(i)["Link xe"] for i in range(3)]
+        assert synced == [writer._file.fileno()]
+    finally:
+        writer.close()
+    assert len(synced) == 2
+
+
+def test_flushes_when_buffer_reaches_flush_rows(get_data_module, tmp_path):
+    path = str(tmp_path / "out.csv")
+    writer = get_data_module.CsvBatchWriter(path, flush_rows=2, flush_seconds=60)
+    try:
+        writer.write(car(0))
+        assert links(path) == []
+        writer.write(car(1))
+        assert links(path) == [car(0)["Link xe"], car(1)["Link xe"]]
+        writer.write(car(2))
+        assert len(links(path)) == 2
+    finally:
+        writer.close()
+    assert links(path) == [car(i)["Link xe"] for i in range(3)]
+
+
+def test_close_flushes_and_syncs_the_buffer(get_data_module, tmp_path, monkeypatch):
+    synced = []
+    real_fsync = os.fsync
+    monkeypatch.setattr(get_data_module.os, "fsync", lambda fd: (synced.append(fd), real_fsync(fd)))
+    path = str(tmp_path / "out.csv")
+    writer = get_data_module.CsvBatchWriter(path, flush_rows=100, flush_seconds=60)
+    writer.write(car(0))
+    writer.close()
+    assert synced
+    assert links(path) == [car(0)["Link xe"]]
+    assert writer._file.closed
+
+
+def test_crash_loses_only_rows_after_last_checkpoint(tmp_path):
+    # Tiến trình chết đột ngột (os._exit: không flush, không close) sau checkpoint
+    script = textwrap.dedent("""
+        import os, get_data
+        writer = get_data.CsvBatchWriter("out.csv", flush_rows=100, flush_seconds=60)
+        for i in range(3):
+            writer.write({"Link xe": f"xe-{i}"})
+        writer.checkpoint()
+        for i in range(3, 5):
+            writer.write({"Link xe": f"xe-{i}"})
+        os._exit(1)
+    """)
+    env = {**os.environ, "PYTHONPATH": ROOT}
+    result = subprocess.run([sys.executable, "-c", script], cwd=tmp_path, env=env, timeout=60,
+                            capture_output=True)
+    assert result.returncode == 1
+    assert links(str(tmp_path / "out.csv")) == ["xe-0", "xe-1", "xe-2"]
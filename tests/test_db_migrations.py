@@ -0,0 +1,61 @@
+from db_migrations import parse_sql_script
+
+
+def test_trailing_comment_after_delimiter_is_not_part_of_next_statement():
+    sql = """
+        CREATE DATABASE IF NOT EXISTS bonbanh_staging; -- tạo DB nếu chưa có
+        USE bonbanh_staging;  # chọn DB
+        SELECT 1;
+    """
+    assert parse_sql_script(sql) == [
+        "CREATE DATABASE IF NOT EXISTS bonbanh_staging",
+        "USE bonbanh_staging",
+        "SELECT 1",
+    ]
+
+
+def test_inline_and_full_line_comments_are_dropped():
+    sql = """
+        -- Bảng staging
+        # comment kiểu MySQL
+        CREATE TABLE t (
+          id BIGINT PRIMARY KEY,   -- khoá chính
+          /* comment khối -- không cắt ở đây */ note TEXT
+        );
+    """
+    assert parse_sql_script(sql) == [
+        "CREATE TABLE t (\nid BIGINT PRIMARY KEY,\n/* comment khối -- không cắt ở đây */ note TEXT\n)"]
+
+
+def test_comment_markers_inside_quotes_are_kept():
+    sql = """
+        INSERT INTO t (a, b, c) VALUES ('-- không phải comment', "giá #1; rẻ", 'it''s -- ok'); -- comment
+        SELECT `cột#1` FROM t WHERE a = 'x\\'; -- vẫn trong chuỗi';
+        SELECT 1--1;
+    """
+    assert parse_sql_script(sql) == [
+        "INSERT INTO t (a, b, c) VALUES ('-- không phải comment', \"giá #1; rẻ\", 'it''s -- ok')",
+        "SELECT `cột#1` FROM t WHERE a = 'x\\'; -- vẫn trong chuỗi'",
+        "SELECT 1--1",
+    ]
+
+
+def test_delimiter_blocks_split_procedures_as_one_statement():
+    sql = """
+        DELIMITER $$
+        DROP PROCEDURE IF EXISTS sp_demo$$ -- xoá bản cũ
+        CREATE PROCEDURE sp_demo(IN p_since DATETIME)
+        BEGIN
+            -- comment trong thân procedure
+            DECLARE v_now DATETIME DEFAULT NOW();  -- không kết thúc câu lệnh
+            SELECT ';' AS semi, '$$' AS dollar;
+        END$$
+        DELIMITER ;
+        CALL sp_demo(NULL); # gọi thử
+    """
+    assert parse_sql_script(sql) == [
+        "DROP PROCEDURE IF EXISTS sp_demo",
+        "CREATE PROCEDURE sp_demo(IN p_since DATETIME)\nBEGIN\nDECLARE v_now DATETIME DEFAULT NOW();\n"
+        "SELECT ';' AS semi, '$$' AS dollar;\nEND",
+        "CALL sp_demo(NULL)",
+    ]
@@ -0,0 +1,30 @@
+import pytest
+
+from db_stats import time_in_rollback
+
+
+class FakeConnection:
+    def __init__(self):
+        self.calls = []
+
+    def rollback(self):
+        self.calls.append("rollback")
+
+
+def test_every_timed_run_is_rolled_back():
+    conn = FakeConnection()
+    seconds = time_in_rollback(conn, lambda: conn.calls.append("work"), repeat=3)
+    assert conn.calls == ["work", "rollback"] * 3
+    assert seconds >= 0
+
+
+def test_failed_run_is_rolled_back_and_raised():
+    conn = FakeConnection()
+
+    def work():
+        conn.calls.append("work")
+        raise RuntimeError("upsert lỗi")
+
+    with pytest.raises(RuntimeError):
+        time_in_rollback(conn, work)
+    assert conn.calls == ["work", "rollback"]
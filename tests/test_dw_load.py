@@ -0,0 +1,136 @@
+import os
+from datetime import date
+
+import mysql.connector
+import pandas as pd
+import pytest
+
+import config
+import db_migrations
+import dw_python_loader
+import staging_transform
+from bench_dw_load import insert_staging_rows, reset_dw, reset_staging, synthetic_staging_rows
+from conftest import FIXTURES_DIR
+
+# Cần MySQL thử (BONBANH_TEST_MYSQL=1): test xoá dữ liệu bonbanh_staging.xe_bonbanh và các bảng DW
+pytestmark = pytest.mark.skipif(not os.environ.get("BONBANH_TEST_MYSQL"),
+                                reason="cần MySQL: đặt BONBANH_TEST_MYSQL=1")
+
+SNAPSHOT = date(2026, 10, 18)
+
+DIM_COLUMNS = {
+    "dim_mau_xe": "business_key, ten_xe, loai_xe_nam_sx, nam_san_xuat, so_cho_ngoi, so_cua, attr_hash, is_current",
+    "dim_vi_tri": "business_key, noi_ban",
+    "dim_nguoi_ban": "business_key, lien_he",
+    "dim_xuat_xu": "business_key, xuat_xu",
+    "dim_tinh_trang": "business_key, tinh_trang",
+    "dim_kieu_dang": "business_key, kieu_dang",
+}
+
+# Fact so theo business key của dimension (surrogate_key phụ thuộc thứ tự AUTO_INCREMENT)
+FACT_SQL = """
+    SELECT f.link_hash, dm.business_key, dv.business_key, dn.business_key, dx.business_key,
+           dt.business_key, dk.business_key, f.gia_xe, f.so_km, f.ngay_dang, f.luot_xem, f.dong_co,
+           f.mau_ngoai_that, f.mau_noi_that, f.link_xe, f.snapshot_date, f.is_current
+    FROM fact_danh_sach_xe f
+    LEFT JOIN dim_mau_xe dm ON dm.surrogate_key = f.mau_xe_sk
+    LEFT JOIN dim_vi_tri dv ON dv.surrogate_key = f.vi_tri_sk
+    LEFT JOIN dim_nguoi_ban dn ON dn.surrogate_key = f.nguoi_ban_sk
+    LEFT JOIN dim_xuat_xu dx ON dx.surrogate_key = f.xuat_xu_sk
+    LEFT JOIN dim_tinh_trang dt ON dt.surrogate_key = f.tinh_trang_sk
+    LEFT JOIN dim_kieu_dang dk ON dk.surrogate_key = f.kieu_dang_sk
+    ORDER BY f.link_hash, f.snapshot_date
+"""
+
+
+@pytest.fixture
+def dw(monkeypatch):
+    db_migrations.apply_scripts(db_migrations.STAGING_SCRIPTS + db_migrations.DW_SCRIPTS)
+    conn = mysql.connector.connect(**config.DB_CONFIG_BASE)
+    cursor = conn.cursor()
+    # Dòng fixture (giá "Liên hệ", km rỗng, liên hệ có dấu nháy...) + dòng giả lập trùng mẫu xe / người bán
+    df = pd.read_csv(os.path.join(FIXTURES_DIR, "staging_sample.csv"), encoding="utf-8-sig", dtype=str).fillna("")
+    rows = staging_transform.to_rows(staging_transform.normalize_frame(df)) + synthetic_staging_rows(500, seed=7)
+    reset_staging(conn, cursor)
+    insert_staging_rows(conn, cursor, rows)
+    # Ngân sách cache nhỏ → dw_python_loader đi cả nhánh tra DB theo lô; trang nhỏ → 1 mẫu xe nằm ở nhiều
+    # trang với thuộc tính khác nhau (lần load thứ 2 của load_twice: sửa phiên bản tại chỗ / mở lại bản cũ)
+    monkeypatch.setattr(config, "DW_DIM_CACHE_MB", 0.01)
+    monkeypatch.setattr(config, "DW_PY_PAGE_ROWS", 37)
+    try:
+        yield conn, cursor
+    finally:
+        reset_dw(conn, cursor)
+        reset_staging(conn, cursor)
+        cursor.close()
+        conn.close()
+
+
+def load_twice(conn, cursor, load):
+    """Load toàn bộ staging, đổi thuộc tính mẫu xe của 1 phần tin rồi load lại (SCD2 + upsert fact)."""
+    reset_dw(conn, cursor)
+    load(cursor)
+    conn.commit()
+    cursor.execute("""
+        UPDATE bonbanh_staging.xe_bonbanh
+        SET loai_xe_nam_sx = CONCAT(loai_xe_nam_sx, ' (sửa)'), gia_xe_vnd = gia_xe_vnd + 1
+        WHERE id % 7 = 0
+    """)
+    conn.commit()
+    load(cursor)
+    conn.commit()
+
+    snapshot = {}
+    for table, columns in DIM_COLUMNS.items():
+        cursor.execute(f"SELECT {columns} FROM {table} ORDER BY {columns}")
+        snapshot[table] = cursor.fetchall()
+    cursor.execute(FACT_SQL)
+    snapshot["fact_danh_sach_xe"] = cursor.fetchall()
+
+    # Sửa lại staging cho lần load của chế độ kia
+    cursor.execute("""
+        UPDATE bonbanh_staging.xe_bonbanh
+        SET loai_xe_nam_sx = LEFT(loai_xe_nam_sx, CHAR_LENGTH(loai_xe_nam_sx) - 6), gia_xe_vnd = gia_xe_vnd - 1
+        WHERE id % 7 = 0
+    """)
+    conn.commit()
+    return snapshot
+
+
+def test_procedure_and_python_modes_build_the_same_star_schema(dw):
+    conn, cursor = dw
+    from_procedure = load_twice(conn, cursor, lambda c: c.callproc(
+        "sp_load_dw", (None, None, SNAPSHOT, config.DW_FACT_GRAIN)))
+    from_python = load_twice(conn, cursor, lambda c: dw_python_loader.load_dw(
+        c, None, None, SNAPSHOT, config.DW_FACT_GRAIN))
+
+    assert len(from_procedure["fact_danh_sach_xe"]) == 510
+    # Mẫu xe bị sửa → có phiên bản cũ (is_current = 0)
+    assert any(row[-1] == 0 for row in from_procedure["dim_mau_xe"])
+    for table in from_procedure:
+        assert from_python[table] == from_procedure[table], table
+
+
+@pytest.mark.parametrize("mode", ["procedure", "python"])
+def test_next_load_from_watermark_skips_boundary_rows(dw, mode):
+    # Lần sau since = until lần trước: dòng có updated_at đúng mốc không được load lại
+    # (grain 'daily' sẽ sinh thêm snapshot cho tin không đổi)
+    conn, cursor = dw
+    reset_dw(conn, cursor)
+    cursor.execute("SELECT MAX(updated_at) FROM bonbanh_staging.xe_bonbanh")
+    until = cursor.fetchone()[0]
+
+    def load(since, snapshot_date):
+        if mode == "python":
+            rows = dw_python_loader.load_dw(cursor, since, until, snapshot_date, "daily")
+        else:
+            cursor.callproc("sp_load_dw", (since, until, snapshot_date, "daily"))
+            cursor.execute("SELECT @dw_delta_rows")
+            rows = cursor.fetchone()[0] or 0
+        conn.commit()
+        return rows
+
+    assert load(None, SNAPSHOT) == 510
+    assert load(until, date(2026, 10, 19)) == 0
+    cursor.execute("SELECT COUNT(*) FROM fact_danh_sach_xe WHERE snapshot_date = '2026-10-19'")
+    assert cursor.fetchone()[0] == 0
@@ -0,0 +1,34 @@
+from datetime import date, timedelta
+
+import dw_partitions
+
+
+def day_partitions(*days):
+    """Partition ngày [d, d + 1) liên tiếp như ensure_day_partition tạo ra, cuối cùng là pmax."""
+    parts = [(dw_partitions.partition_name(d), d + timedelta(days=1)) for d in days]
+    return parts + [("pmax", None)]
+
+
+def test_merges_only_months_older_than_keep_days():
+    partitions = day_partitions(date(2026, 1, 30), date(2026, 1, 31),
+                                date(2026, 2, 1), date(2026, 2, 27), date(2026, 2, 28),
+                                date(2026, 3, 1), date(2026, 3, 2))
+    merges = dw_partitions.plan_month_merges(partitions, date(2026, 4, 10), 35)
+    assert merges == [
+        ("p202601", date(2026, 2, 1), ["p20260130", "p20260131"]),
+        ("p202602", date(2026, 3, 1), ["p20260201", "p20260227", "p20260228"]),
+    ]
+
+
+def test_month_partition_is_not_merged_again():
+    partitions = [("p202601", date(2026, 2, 1)), ("p20260201", date(2026, 2, 2)), ("pmax", None)]
+    assert dw_partitions.plan_month_merges(partitions, date(2026, 2, 10), 35) == []
+    assert dw_partitions.plan_month_merges(partitions, date(2026, 4, 10), 35) == []
+
+
+def test_reloaded_day_is_merged_back_into_its_month():
+    # load lại 2026-01-15 tách partition tháng 1 thành 3 → lần load sau gộp lại
+    partitions = [("p20260114", date(2026, 1, 15)), ("p20260115", date(2026, 1, 16)),
+                  ("p20260131", date(2026, 2, 1)), ("pmax", None)]
+    assert dw_partitions.plan_month_merges(partitions, date(2026, 4, 10), 35) == [
+        ("p202601", date(2026, 2, 1), ["p20260114", "p20260115", "p20260131"])]
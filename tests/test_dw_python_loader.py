@@ -0,0 +1,54 @@
+import dw_python_loader
+from dw_python_loader import C, DIMENSIONS, STAGING_COLUMNS
+
+
+class CountCursor:
+    """Cursor giả cho build_caches: COUNT(*) theo bảng, SELECT nạp sẵn trả về rỗng."""
+
+    def __init__(self, counts):
+        self.counts = counts
+        self._result = []
+
+    def execute(self, sql, params=None):
+        table = sql.split("FROM ")[1].split()[0]
+        self._result = [(self.counts[table],)] if sql.startswith("SELECT COUNT(*)") else []
+
+    def fetchone(self):
+        return self._result[0]
+
+    def __iter__(self):
+        return iter(self._result)
+
+
+def staging_row(row_id, ten_xe, loai_xe_nam_sx, noi_ban):
+    row = [None] * len(STAGING_COLUMNS)
+    row[C["id"]], row[C["ten_xe"]], row[C["nam_san_xuat"]] = row_id, ten_xe, "2019"
+    row[C["loai_xe_nam_sx"]], row[C["noi_ban"]] = loai_xe_nam_sx, noi_ban
+    return tuple(row)
+
+
+def test_page_members_keep_first_appearance_order_and_last_values():
+    rows = [
+        staging_row(1, "Toyota Vios", "Cũ - 2019", "Hà Nội"),
+        staging_row(2, "Kia Morning", "Cũ - 2019", "TP HCM"),
+        staging_row(3, "Toyota Vios", "Cũ - 2019 (sửa)", "Hà Nội"),
+    ]
+    members = dw_python_loader.page_members(rows)
+
+    vios, morning = dw_python_loader.md5_key("Toyota Vios_2019"), dw_python_loader.md5_key("Kia Morning_2019")
+    assert list(members["dim_mau_xe"]) == [vios, morning]
+    assert members["dim_mau_xe"][vios][1] == "Cũ - 2019 (sửa)"
+    assert list(members["dim_vi_tri"].values()) == [("Hà Nội",), ("TP HCM",)]
+
+
+def test_build_caches_reserves_one_page_of_members_from_the_budget():
+    counts = {spec.table: 1000 for spec in DIMENSIONS}
+    page_reserve_mb = 100 * len(DIMENSIONS) * dw_python_loader.MEMBER_ENTRY_BYTES / 1024 / 1024
+    all_caches_mb = 1000 * len(DIMENSIONS) * dw_python_loader.CACHE_ENTRY_BYTES / 1024 / 1024
+
+    # Đủ cho toàn bộ cache nhưng không đủ khi cộng thêm 1 trang → 1 dimension phải tra theo lô
+    caches = dw_python_loader.build_caches(CountCursor(counts), all_caches_mb + page_reserve_mb / 2, page_rows=100)
+    assert sum(not cache.preloaded for cache in caches.values()) == 1
+
+    caches = dw_python_loader.build_caches(CountCursor(counts), all_caches_mb + page_reserve_mb + 0.001, page_rows=100)
+    assert all(cache.preloaded for cache in caches.values())
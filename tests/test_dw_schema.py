@@ -0,0 +1,124 @@
+import hashlib
+import logging
+import os
+from datetime import date
+
+import mysql.connector
+import pytest
+
+import config
+import db_migrations
+from conftest import FIXTURES_DIR
+
+# Cần MySQL thử (BONBANH_TEST_MYSQL=1): test DROP DATABASE bonbanh_datawarehouse rồi tạo lại
+pytestmark = pytest.mark.skipif(not os.environ.get("BONBANH_TEST_MYSQL"),
+                                reason="cần MySQL: đặt BONBANH_TEST_MYSQL=1")
+
+logger = logging.getLogger("DbMigrationsLogger")
+
+SIMPLE_DIMENSIONS = {
+    "dim_vi_tri": ("noi_ban", ["Hà Nội", "TP HCM"]),
+    "dim_nguoi_ban": ("lien_he", ["Anh Tuấn", "Salon Phú Mỹ"]),
+    "dim_xuat_xu": ("xuat_xu", ["Nhập khẩu", "Lắp ráp trong nước"]),
+    "dim_tinh_trang": ("tinh_trang", ["Xe đã dùng", "Xe mới"]),
+    "dim_kieu_dang": ("kieu_dang", ["Sedan", "SUV"]),
+}
+CARS = [
+    # (ten_xe, nam_san_xuat, dong_co, mau_ngoai_that)
+    ("Toyota Vios 1.5G", 2019, "Xăng 1.5 L", "Trắng"),
+    ("Kia Morning Si", 2017, "Xăng 1.25 L", "Đỏ"),
+]
+
+
+def md5_hex(value):
+    return hashlib.md5(value.encode("utf-8")).hexdigest()
+
+
+@pytest.fixture
+def baseline_dw():
+    """DW tạo bằng schema bản đầu (business_key VARCHAR(64) MD5 hex) đã có dữ liệu."""
+    conn = mysql.connector.connect(**config.DB_CONFIG_NO_DB)
+    cursor = conn.cursor()
+    cursor.execute(f"DROP DATABASE IF EXISTS {config.DW_DB_NAME}")
+    db_migrations.run_script(cursor, os.path.join(FIXTURES_DIR, "dw_schema_baseline.sql"), logger)
+
+    keys = {}
+    for table, (column, values) in SIMPLE_DIMENSIONS.items():
+        for value in values:
+            cursor.execute(f"INSERT INTO {table} (business_key, {column}) VALUES (%s, %s)", (md5_hex(value), value))
+        keys[table] = cursor.lastrowid
+    for ten_xe, nam, dong_co, mau in CARS:
+        cursor.execute("""
+            INSERT INTO dim_mau_xe (business_key, ten_xe, loai_xe_nam_sx, nam_san_xuat, dong_co, mau_ngoai_that,
+                                    mau_noi_that, so_cho_ngoi, so_cua)
+            VALUES (%s, %s, %s, %s, %s, %s, 'Đen', 5, 4)
+        """, (md5_hex(f"{ten_xe}_{nam}"), ten_xe, f"Cũ - {nam}", nam, dong_co, mau))
+        keys["dim_mau_xe"] = cursor.lastrowid
+    cursor.execute("""
+        INSERT INTO fact_danh_sach_xe (mau_xe_sk, vi_tri_sk, nguoi_ban_sk, xuat_xu_sk, tinh_trang_sk, kieu_dang_sk,
+                                       gia_xe, so_km, ngay_dang, luot_xem, link_xe, loaded_at)
+        VALUES (%s, %s, %s, %s, %s, %s, 465000000, 12000, '2026-10-01', 5021,
+                'https://bonbanh.com/xe-kia-morning-si-2017-5123402', '2026-10-02 03:00:00')
+    """, (keys["dim_mau_xe"], keys["dim_vi_tri"], keys["dim_nguoi_ban"], keys["dim_xuat_xu"],
+          keys["dim_tinh_trang"], keys["dim_kieu_dang"]))
+    try:
+        yield cursor, keys
+    finally:
+        # DW mới tinh như lần chạy đầu (schema hiện tại, checksum ghi lại)
+        cursor.execute(f"DROP DATABASE IF EXISTS {config.DW_DB_NAME}")
+        db_migrations.apply_scripts(db_migrations.DW_SCRIPTS, logger, force=True)
+        cursor.close()
+        conn.close()
+
+
+def column_type(cursor, table, column):
+    cursor.execute("""
+        SELECT COLUMN_TYPE FROM information_schema.COLUMNS
+        WHERE TABLE_SCHEMA = %s AND TABLE_NAME = %s AND COLUMN_NAME = %s
+    """, (config.DW_DB_NAME, table, column))
+    row = cursor.fetchone()
+    return row[0].decode() if isinstance(row[0], bytes) else row[0]
+
+
+def unique_columns(cursor, table):
+    cursor.execute("""
+        SELECT COLUMN_NAME FROM information_schema.STATISTICS
+        WHERE TABLE_SCHEMA = %s AND TABLE_NAME = %s AND NON_UNIQUE = 0 AND INDEX_NAME <> 'PRIMARY'
+    """, (config.DW_DB_NAME, table))
+    return {row[0] for row in cursor.fetchall()}
+
+
+def test_varchar_business_keys_migrate_to_binary_keeping_surrogate_keys(baseline_dw):
+    cursor, keys = baseline_dw
+    db_migrations.run_script(cursor, config.DW_SQL_SCHEMA_FILE, logger)
+    # Chạy lại trên DW đã migrate: không đổi gì, không lỗi
+    db_migrations.run_script(cursor, config.DW_SQL_SCHEMA_FILE, logger)
+
+    for table, (column, values) in SIMPLE_DIMENSIONS.items():
+        assert column_type(cursor, table, "business_key") == "binary(16)"
+        assert "business_key" in unique_columns(cursor, table)
+        cursor.execute(f"SELECT surrogate_key, business_key, {column} FROM {table} ORDER BY surrogate_key")
+        rows = cursor.fetchall()
+        # Cùng giá trị MD5, dạng 16 byte = md5().digest() của dw_python_loader.md5_key; surrogate_key giữ nguyên
+        assert [(bytes(bk), value) for _, bk, value in rows] == [
+            (hashlib.md5(value.encode("utf-8")).digest(), value) for value in values]
+        assert rows[-1][0] == keys[table]
+
+    # dim_mau_xe: SCD2 (nhiều phiên bản / key → không còn UNIQUE), động cơ / màu chuyển sang fact
+    assert column_type(cursor, "dim_mau_xe", "business_key") == "binary(16)"
+    assert "business_key" not in unique_columns(cursor, "dim_mau_xe")
+    cursor.execute("SELECT surrogate_key, business_key, is_current, attr_hash IS NOT NULL FROM dim_mau_xe "
+                   "ORDER BY surrogate_key")
+    assert [(bytes(bk), current, hashed) for _, bk, current, hashed in cursor.fetchall()] == [
+        (hashlib.md5(f"{ten_xe}_{nam}".encode("utf-8")).digest(), 1, 1) for ten_xe, nam, _, _ in CARS]
+
+    cursor.execute("""
+        SELECT f.mau_xe_sk, f.dong_co, f.mau_ngoai_that, f.link_hash, f.snapshot_date, f.is_current,
+               d.business_key
+        FROM fact_danh_sach_xe f JOIN dim_mau_xe d ON d.surrogate_key = f.mau_xe_sk
+    """)
+    mau_xe_sk, dong_co, mau, link_hash, snapshot_date, is_current, business_key = cursor.fetchone()
+    assert (mau_xe_sk, dong_co, mau) == (keys["dim_mau_xe"], "Xăng 1.25 L", "Đỏ")
+    assert bytes(link_hash) == hashlib.md5(b"https://bonbanh.com/xe-kia-morning-si-2017-5123402").digest()
+    assert (snapshot_date, is_current) == (date(2026, 10, 2), 1)
+    assert bytes(business_key) == hashlib.md5("Kia Morning Si_2017".encode("utf-8")).digest()
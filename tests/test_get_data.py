@@ -0,0 +1,31 @@
+import glob
+import os
+
+import config
+from conftest import LIST_ORDER, read_csv_rows, run_get_data
+
+def run_crawl(base_url, workdir):
+    run_get_data(base_url, workdir)
+    files = glob.glob(os.path.join(workdir, "data", "bonbanh_raw_*.csv"))
+    assert len(files) == 1
+    return read_csv_rows(files[0])
+
+
+def test_crawl_keeps_listing_order_and_csv_columns(fixture_server, tmp_path):
+    rows = run_crawl(fixture_server, tmp_path)
+
+    assert rows[0] == config.CSV_COLUMNS
+    records = [dict(zip(config.CSV_COLUMNS, row)) for row in rows[1:]]
+    # Chi tiết tải song song nhưng CSV vẫn theo đúng thứ tự danh sách, qua nhiều trang
+    assert [r["Link xe"] for r in records] == [f"{fixture_server}/{href}" for href in LIST_ORDER]
+    assert all(len(row) == len(config.CSV_COLUMNS) for row in rows[1:])
+
+    first = records[0]
+    assert first["Loại xe + Năm SX"] == "Cũ - 2019"
+    assert first["Tên xe"] == "Toyota Vios 1.5G"
+    assert first["Giá xe_raw"] == "465 Triệu"
+    assert first["Ngày đăng"] == "12/10/2026"
+    assert first["Lượt xem"] == "1234"
+    assert first["Số Km đã đi:"] == "45,000 Km"
+    assert records[3]["Lượt xem"] == ""
+
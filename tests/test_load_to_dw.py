@@ -0,0 +1,159 @@
+import importlib
+import os
+import sys
+import threading
+from datetime import date, datetime
+
+import pytest
+from mysql.connector import Error
+
+import config
+
+STARTED_AT = datetime(2026, 10, 18, 3, 0, 0)
+MARK = 10
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+        self.rowcount = 0
+        self._result = None
+
+    def callproc(self, name, args):
+        self.conn.log.append(("callproc", name))
+        if name in self.conn.fail_procs:
+            raise Error(f"{name} lỗi")
+        self.conn.proc = name
+
+    def execute(self, sql, params=None):
+        self.conn.log.append(("execute", " ".join(sql.split()), params))
+        if "NOW()" in sql:
+            self._result = (STARTED_AT,)
+        elif "MAX(surrogate_key)" in sql:
+            self._result = (MARK,)
+        else:
+            self._result = (1,)
+
+    def fetchone(self):
+        return self._result
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    """Connection giả: ghi lại các câu lệnh; gọi procedure trong fail_procs → lỗi,
+    commit sau procedure trong dw.fail_commit → lỗi."""
+
+    def __init__(self, dw, fail_procs=()):
+        self.dw = dw
+        self.fail_procs = set(fail_procs)
+        self.log = []
+        self.proc = None
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def commit(self):
+        if self.proc in self.dw.fail_commit:
+            # Lỗi sau khi các dimension khác đã commit xong (trường hợp cần hoàn tác)
+            self.dw.others_committed.wait(timeout=5)
+            raise Error(f"commit {self.proc} lỗi")
+        if self.proc and self.proc.startswith("sp_load_dim_"):
+            with self.dw.lock:
+                self.dw.committed.append(self.proc)
+                if len(self.dw.committed) == 6 - len(self.dw.fail_commit):
+                    self.dw.others_committed.set()
+        self.log.append(("commit",))
+
+    def rollback(self):
+        self.log.append(("rollback",))
+
+    def close(self):
+        pass
+
+
+class FakeDW:
+    """6 connection của pool load dimension; committed = các sp_load_dim_* đã commit."""
+
+    def __init__(self, fail_commit=(), fail_procs=()):
+        self.fail_commit = set(fail_commit)
+        self.fail_procs = set(fail_procs)
+        self.committed = []
+        self.lock = threading.Lock()
+        self.others_committed = threading.Event()
+
+    def pool(self, **kwargs):
+        dw = self
+
+        class Pool:
+            def get_connection(self):
+                return FakeConnection(dw, dw.fail_procs)
+        return Pool()
+
+
+@pytest.fixture
+def load_to_dw(tmp_path, monkeypatch):
+    # Import ghi file log theo cwd → import trong tmp_path (config chỉ tạo logs/ lần import đầu)
+    monkeypatch.chdir(tmp_path)
+    os.makedirs(config.LOG_DIR, exist_ok=True)
+    monkeypatch.delitem(sys.modules, "load_to_dw", raising=False)
+    module = importlib.import_module("load_to_dw")
+    yield module
+    sys.modules.pop("load_to_dw", None)
+
+
+def undo_deletes(conn):
+    return [entry[2] for entry in conn.log
+            if entry[0] == "execute" and entry[1].startswith("DELETE FROM dim_")]
+
+
+def test_commit_failure_undoes_dimensions_already_committed(load_to_dw, monkeypatch):
+    dw = FakeDW(fail_commit={"sp_load_dim_kieu_dang"})
+    monkeypatch.setattr(load_to_dw.mysql.connector.pooling, "MySQLConnectionPool", dw.pool)
+    conn = FakeConnection(dw)
+
+    with pytest.raises(Error, match="commit sp_load_dim_kieu_dang"):
+        load_to_dw.load_parallel(conn, conn.cursor(), None, None, date(2026, 10, 18))
+
+    # 5 dimension còn lại đã qua barrier và commit trước khi dim_kieu_dang lỗi
+    assert sorted(dw.committed) == sorted(f"sp_load_{t}" for t in load_to_dw.DIMENSION_TABLES
+                                          if t != "dim_kieu_dang")
+    assert ("callproc", "sp_load_fact") not in conn.log
+    # Hoàn tác: xoá key mới của cả 6 dimension theo mốc, mở lại phiên bản dim_mau_xe bị đóng, rồi commit
+    assert undo_deletes(conn) == [(MARK,)] * len(load_to_dw.DIMENSION_TABLES)
+    assert any(entry[0] == "execute" and entry[1].startswith("UPDATE dim_mau_xe SET is_current = 1")
+               and entry[2] == (STARTED_AT,) for entry in conn.log)
+    assert conn.log[-1] == ("commit",)
+
+
+def test_failure_before_barrier_commits_nothing(load_to_dw, monkeypatch):
+    dw = FakeDW(fail_procs={"sp_load_dim_vi_tri"})
+    monkeypatch.setattr(load_to_dw.mysql.connector.pooling, "MySQLConnectionPool", dw.pool)
+    conn = FakeConnection(dw)
+
+    with pytest.raises(Error, match="sp_load_dim_vi_tri lỗi"):
+        load_to_dw.load_parallel(conn, conn.cursor(), None, None, date(2026, 10, 18))
+    assert dw.committed == []
+    assert ("callproc", "sp_load_fact") not in conn.log
+
+
+def test_fact_failure_undoes_all_dimensions(load_to_dw, monkeypatch):
+    dw = FakeDW()
+    monkeypatch.setattr(load_to_dw.mysql.connector.pooling, "MySQLConnectionPool", dw.pool)
+    conn = FakeConnection(dw, fail_procs={"sp_load_fact"})
+
+    with pytest.raises(Error, match="sp_load_fact lỗi"):
+        load_to_dw.load_parallel(conn, conn.cursor(), None, None, date(2026, 10, 18))
+    assert len(dw.committed) == len(load_to_dw.DIMENSION_TABLES)
+    assert undo_deletes(conn) == [(MARK,)] * len(load_to_dw.DIMENSION_TABLES)
+
+
+def test_successful_load_returns_delta_rows_without_undo(load_to_dw, monkeypatch):
+    dw = FakeDW()
+    monkeypatch.setattr(load_to_dw.mysql.connector.pooling, "MySQLConnectionPool", dw.pool)
+    conn = FakeConnection(dw)
+
+    assert load_to_dw.load_parallel(conn, conn.cursor(), None, None, date(2026, 10, 18)) == 1
+    assert len(dw.committed) == len(load_to_dw.DIMENSION_TABLES)
+    assert undo_deletes(conn) == []